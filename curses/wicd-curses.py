@@ -129,12 +129,16 @@ class WiredComboBox(ComboBox):
         return self.theList[self.get_focus()[1]] if self.theList and len(self.theList) > 0 else None
 
 
+# The network properties a NetLabel shows, fetched with GetNetworksBulk.
+NETLABEL_PROPS = ['quality', 'strength', 'essid', 'bssid', 'encryption',
+                  'encryption_method', 'mode', 'channel']
+
 class NetLabel(urwid.WidgetWrap):
     """ Wireless network label. """
-    def __init__(self, i, is_active):
+    def __init__(self, i, is_active, network, display_type):
         # Pick which strength measure to use based on what the daemon says
         # gap allocates more space to the first module
-        if daemon.GetSignalDisplayType() == 0:
+        if display_type == 0:
             strenstr = 'quality'
             gap = 4  # Allow for 100%
         else:
@@ -142,17 +146,16 @@ class NetLabel(urwid.WidgetWrap):
             gap = 7  # -XX dbm = 7
         self.id = i
         # All of that network property stuff
-        self.stren = daemon.FormatSignalForPrinting(
-                str(wireless.GetWirelessProperty(self.id, strenstr)))
-        self.essid = wireless.GetWirelessProperty(self.id, 'essid')
-        self.bssid = wireless.GetWirelessProperty(self.id, 'bssid')
+        self.stren = daemon.FormatSignalForPrinting(str(network[strenstr]))
+        self.essid = network['essid']
+        self.bssid = network['bssid']
 
-        if wireless.GetWirelessProperty(self.id, 'encryption'):
-            self.encrypt = wireless.GetWirelessProperty(self.id, 'encryption_method')
+        if network['encryption']:
+            self.encrypt = network['encryption_method']
         else:
             self.encrypt = _('Unsecured')
-        self.mode = wireless.GetWirelessProperty(self.id, 'mode')
-        self.channel = wireless.GetWirelessProperty(self.id, 'channel')
+        self.mode = network['mode']
+        self.channel = network['channel']
         theString = '  %-*s %25s %9s %17s %6s %4s' % (
             gap, self.stren, self.essid, self.encrypt, self.bssid, self.mode,
             self.channel)
@@ -654,11 +657,16 @@ class appGUI():
 def gen_network_list():
     wiredL = wired.GetWiredProfileList()
     wlessL = []
-    for network_id in range(0, wireless.GetNumberOfNetworks()):
-        is_active = wireless.GetCurrentSignalStrength("") != 0 and \
-                    wireless.GetCurrentNetworkID(wireless.GetIwconfig()) == network_id and \
-                    wireless.GetWirelessIP('') is not None
-        label = NetLabel(network_id, is_active)
+    networks = wireless.GetNetworksBulk(NETLABEL_PROPS)
+    active_id = -1
+    if networks and wireless.GetCurrentSignalStrength("") != 0 and \
+       wireless.GetWirelessIP('') is not None:
+        active_id = wireless.GetCurrentNetworkID(wireless.GetIwconfig())
+    display_type = daemon.GetSignalDisplayType()
+    for network_id, values in enumerate(networks):
+        network = dict(zip(NETLABEL_PROPS, values))
+        label = NetLabel(network_id, network_id == active_id, network,
+                         display_type)
         wlessL.append(label)
     return (wiredL, wlessL)
 
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd wireless access point record
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Compact records for the wireless networks found by scans.
+
+class AccessPoint() -- A scanned network usable like the old scan dicts.
+signal_key() -- Sort key ordering networks by their signal.
+strongest_first() -- Order networks by their signal.
+
+"""
+
+# Fields every scan fills in, plus the scan table bookkeeping.  They
+# are kept in slots, everything else goes to a dict made on demand.
+FIELDS = ('bssid', 'essid', 'hidden', 'channel', 'bitrates', 'mode',
+          'encryption', 'encryption_method', 'quality', 'strength',
+          'first_seen', 'last_seen')
+
+_fields = frozenset(FIELDS)
+
+# Networks mostly announce one of a handful of rate sets.
+_bitrates = {}
+_MAX_BITRATE_SETS = 1024
+
+
+def share_bitrates(bitrates):
+    """ Returns a list equal to bitrates, shared between access points.
+
+    The returned list must not be modified.
+
+    """
+    key = tuple(bitrates)
+    shared = _bitrates.get(key)
+    if shared is None:
+        if len(_bitrates) >= _MAX_BITRATE_SETS:
+            _bitrates.clear()
+        shared = _bitrates[key] = list(key)
+    return shared
+
+
+def signal_key(network):
+    """ Returns a sort key ordering networks by their signal.
+
+    The strength in dBm is used when the scan reported one, -1 meaning
+    it didn't; iw and nl80211 scans report no quality, only 101.
+    Works on the dicts the frontends build from GetNetworksBulk too,
+    where the values a network lacks are "".
+
+    """
+    try:
+        dbm = float(network.get('strength'))
+    except (TypeError, ValueError):
+        dbm = -1
+    if dbm != -1:
+        return (1, dbm)
+    try:
+        return (0, float(network.get('quality', 0)))
+    except (TypeError, ValueError):
+        return (0, 0.0)
+
+
+def strongest_first(networks):
+    """ Returns (index, network) pairs, the strongest network first. """
+    return sorted(enumerate(networks), key=lambda n: signal_key(n[1]),
+                  reverse=True)
+
+
+class AccessPoint(object):
+    """ A wireless network found by a scan.
+
+    Supports the dict operations the daemon and the connection code
+    use on networks.  The settings of a saved profile are merged in by
+    a loader given to defer_profile(), which only runs once something
+    asks for a key the scan didn't fill in, or iterates the network.
+
+    """
+    __slots__ = FIELDS + ('_overlay', '_loader')
+
+    def __init__(self, fields=None):
+        """ Initialize the access point.
+
+        Keyword arguments:
+        fields -- optional dict of initial keys and values
+
+        """
+        self._overlay = None
+        self._loader = None
+        if fields:
+            for key, value in fields.items():
+                self[key] = value
+
+    def defer_profile(self, loader):
+        """ Have loader(self) merge the profile in once it is needed. """
+        self._loader = loader
+
+    def _load(self):
+        """ Run the pending profile loader, if any. """
+        loader = self._loader
+        if loader is not None:
+            self._loader = None
+            loader(self)
+
+    def _needs_load(self, key):
+        """ Returns True if the profile may provide the given key. """
+        if self._loader is None:
+            return False
+        if key not in _fields:
+            return True
+        # Hidden networks get their essid from the profile.
+        return not hasattr(self, key) or (key == 'essid' and
+                                          getattr(self, 'hidden', False))
+
+    def __getitem__(self, key):
+        if self._needs_load(key):
+            self._load()
+        if key in _fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._overlay is None:
+            raise KeyError(key)
+        return self._overlay[key]
+
+    def __setitem__(self, key, value):
+        if key in _fields:
+            setattr(self, key, value)
+            return
+        if self._needs_load(key):
+            self._load()
+        if self._overlay is None:
+            self._overlay = {}
+        self._overlay[key] = value
+
+    def __delitem__(self, key):
+        if self._needs_load(key):
+            self._load()
+        if key in _fields:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        elif self._overlay is None:
+            raise KeyError(key)
+        else:
+            del self._overlay[key]
+
+    def __contains__(self, key):
+        if self._needs_load(key):
+            self._load()
+        if key in _fields:
+            return hasattr(self, key)
+        return self._overlay is not None and key in self._overlay
+
+    def get(self, key, default=None):
+        """ Returns the value of key, or default if it isn't set. """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """ Returns a list of the keys that are set. """
+        self._load()
+        keys = [key for key in FIELDS if hasattr(self, key)]
+        if self._overlay:
+            keys.extend(self._overlay)
+        return keys
+
+    def items(self):
+        """ Returns a list of (key, value) pairs. """
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        """ Returns a list of the values that are set. """
+        return [self[key] for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        fields = dict((key, getattr(self, key)) for key in FIELDS
+                      if hasattr(self, key))
+        fields.update(self._overlay or {})
+        return 'AccessPoint(%r)' % fields
@@ -32,6 +32,7 @@ class WirelessInterface() -- Control a wireless network interface.
 
 from wicd import misc
 from wicd import wpath
+from wicd.accesspoint import AccessPoint
 from wicd.wnettools import GetDefaultGateway, GetWiredInterfaces, \
 GetWirelessInterfaces, IsValidWpaSuppDriver, BaseWirelessInterface, \
 BaseWiredInterface, BaseInterface, GetWpaSupplicantDrivers, wep_pattern, \
@@ -43,12 +44,6 @@ try:
 except ImportError:
     print("WARNING: python-iwscan not found, falling back to using iwlist scan.")
     IWSCAN_AVAIL = False
-try:
-    import wpactrl
-    WPACTRL_AVAIL = True
-except ImportError:
-    print("WARNING: python-wpactrl not found, falling back to using wpa_cli.")
-    WPACTRL_AVAIL = False
 
 import re
 import os
@@ -68,7 +63,6 @@ network information whenever possible.  This makes it fast,
 but it may not work properly on all systems.
 
 (Optional) Dependencies:
-python-wpactrl (http://projects.otaku42.de/wiki/PythonWpaCtrl)
 python-iwscan (http://projects.otaku42.de/browser/python-iwscan/)"""
 
 RALINK_DRIVER = 'ralink legacy'
@@ -100,17 +94,17 @@ def get_iw_ioctl_result(iface, call):
 
     """
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    buff = array.array('c', '\0' * 32)
+    buff = array.array('B', bytes(32))
     addr, length = buff.buffer_info()
     arg = struct.pack('Pi', addr, length)
-    data = (iface + '\0' * 16)[:16] + arg
+    data = struct.pack('16s', iface.encode()) + arg
     try:
-        result = fcntl.ioctl(s.fileno(), call, data)
-    except IOError:
-        return None
+        fcntl.ioctl(s.fileno(), call, data)
     except OSError:
         return None
-    return buff.tostring()
+    finally:
+        s.close()
+    return buff.tobytes()
 
 def NeedsExternalCalls(*args, **kargs):
     """ Return False, since this backend doesn't use any external apps. """
@@ -119,6 +113,8 @@ def NeedsExternalCalls(*args, **kargs):
 
 class Interface(BaseInterface):
     """ Control a network interface. """
+    use_rtnetlink = True
+
     def __init__(self, iface, verbose=False):
         """ Initialise the object.
 
@@ -131,11 +127,6 @@ class Interface(BaseInterface):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.Check()
 
-    def CheckWirelessTools(self):
-        """ Check for the existence needed wireless tools """
-        if not WPACTRL_AVAIL:
-            BaseInterface.CheckWirelessTools(self)
-
     @neediface("")
     def GetIP(self, ifconfig=""):
         """ Get the IP address of the interface.
@@ -297,9 +288,26 @@ class WirelessInterface(Interface, BaseWirelessInterface):
             return []
         return [_f for _f in [self._parse_ap(cell) for cell in results] if _f]
 
+    @neediface([])
+    def IterNetworks(self, essid=None, max_age=None):
+        """ Scan for wireless networks, yielding them as they are found.
+
+        python-iwscan only hands out complete scans, so this streams
+        only when falling back to iw.  The kernel's scan cache is read
+        with iw scan dump if max_age is given.
+
+        """
+        if not IWSCAN_AVAIL:
+            return BaseWirelessInterface.IterNetworks(self, essid, max_age)
+        if max_age is not None and misc.Noneify(essid) is None:
+            cached = self.GetCachedNetworks(max_age)
+            if cached is not None:
+                return iter(cached)
+        return iter(self.GetNetworks(essid))
+
     def _parse_ap(self, cell):
         """ Parse a single cell from the python-iwscan list. """
-        ap = {}
+        ap = AccessPoint()
         try:
             ap['essid'] = misc.to_unicode(cell['essid'])
         except UnicodeError:
@@ -349,96 +357,6 @@ class WirelessInterface(Interface, BaseWirelessInterface):
 
         return ap
 
-    def _connect_to_wpa_ctrl_iface(self):
-        """ Connect to the wpa ctrl interface. """
-        ctrl_iface = '/var/run/wpa_supplicant'
-        socket_loc = os.path.join(ctrl_iface, self.iface)
-        if os.path.exists(socket_loc):
-            try:
-                return wpactrl.WPACtrl(socket_loc)
-            except wpactrl.error as e:
-                print(("Couldn't open ctrl_interface: %s" % e))
-                return None
-        else:
-            print(("Couldn't find a wpa_supplicant ctrl_interface for iface %s" \
-                % self.iface))
-            return None
-
-    def ValidateAuthentication(self, auth_time):
-        """ Validate WPA authentication.
-
-            Validate that the wpa_supplicant authentication
-            process was successful.
-
-            NOTE: It's possible this could return False,
-            though in reality wpa_supplicant just isn't
-            finished yet.
-
-            Keyword arguments:
-            auth_time -- The time at which authentication began.
-
-            Returns:
-            True if wpa_supplicant authenticated succesfully,
-            False otherwise.
-
-        """
-        if not WPACTRL_AVAIL:
-            # If we don't have python-wpactrl, use the slow version.
-            return BaseWirelessInterface.ValidateAuthentication(self, auth_time)
-        
-        # Right now there's no way to do this for ralink drivers
-        if self.wpa_driver == RALINK_DRIVER:
-            return True
-
-        wpa = self._connect_to_wpa_ctrl_iface()
-        if not wpa:
-            print("Failed to open ctrl interface")
-            return False
-
-        MAX_TIME = 35
-        MAX_DISCONNECTED_TIME = 3
-        disconnected_time = 0
-        while (time.time() - auth_time) < MAX_TIME:
-            try:
-                status = wpa.request("STATUS").split("\n")
-            except:
-                print("wpa_supplicant status query failed.")
-                return False
-
-            if self.verbose:
-                print(('wpa_supplicant ctrl_interface status query is %s' \
-                    % str(status)))
-
-            try:
-                [result] = [l for l in status if l.startswith("wpa_state=")]
-            except ValueError:
-                return False
-
-            if result.endswith("COMPLETED"):
-                return True
-            elif result.endswith("DISCONNECTED"):
-                disconnected_time += 1
-                if disconnected_time > MAX_DISCONNECTED_TIME:
-                    # Force a rescan to get wpa_supplicant moving again.
-                    wpa.request("SCAN")
-                    MAX_TIME += 5
-            else:
-                disconnected_time = 0
-            time.sleep(1)
-
-        print('wpa_supplicant authentication may have failed.')
-        return False
-
-    @neediface(False)
-    def StopWPA(self):
-        """ Terminates wpa_supplicant using its ctrl interface. """
-        if not WPACTRL_AVAIL:
-            return BaseWirelessInterface.StopWPA(self)
-        wpa = self._connect_to_wpa_ctrl_iface()
-        if not wpa:
-            return
-        wpa.request("TERMINATE")
-
     def _AuthenticateRalinkLegacy(self, network):
         """ Authenticate with the specified wireless network.
 
@@ -545,7 +463,9 @@ class WirelessInterface(Interface, BaseWirelessInterface):
 
         """
         buff = get_iw_ioctl_result(self.iface, SIOCGIWSTATS)
-        strength = ord(buff[2])
+        if not buff:
+            return None
+        strength = buff[2]
         max_strength = self._get_max_strength()
         if strength not in ['', None] and max_strength:
             return 100 * int(strength) // int(max_strength)
@@ -556,10 +476,10 @@ class WirelessInterface(Interface, BaseWirelessInterface):
 
     def _get_max_strength(self):
         """ Gets the maximum possible strength from the wireless driver. """
-        buff = array.array('c', '\0' * 700)
+        buff = array.array('B', bytes(700))
         addr, length = buff.buffer_info()
         arg = struct.pack('Pi', addr, length)
-        iwfreq = (self.iface + '\0' * 16)[:16] + arg
+        iwfreq = struct.pack('16s', self.iface.encode()) + arg
         try:
             result = fcntl.ioctl(self.sock.fileno(), SIOCGIWRANGE, iwfreq)
         except IOError as e:
@@ -569,7 +489,7 @@ class WirelessInterface(Interface, BaseWirelessInterface):
         # This defines the iwfreq struct, used to get signal strength.
         fmt = "iiihb6ii4B4Bi32i2i2i2i2i3h8h2b2bhi8i2b3h2i2ihB17x" + 32 * "ihbb"
         size = struct.calcsize(fmt)
-        data = buff.tostring()
+        data = buff.tobytes()
         data = data[0:size]
         values = struct.unpack(fmt, data)
         return values[12]
@@ -586,7 +506,7 @@ class WirelessInterface(Interface, BaseWirelessInterface):
         if not buff:
             return None
 
-        return str((ord(buff[3]) - 256))
+        return str(buff[3] - 256)
 
     @neediface("")
     def GetCurrentNetwork(self, iwconfig=None):
@@ -600,4 +520,4 @@ class WirelessInterface(Interface, BaseWirelessInterface):
         if not buff:
             return None
 
-        return buff.strip('\x00')
+        return buff.strip(b'\x00').decode('utf-8', 'replace')
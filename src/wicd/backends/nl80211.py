@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" nl80211 network interface control tools for wicd.
+
+This module implements functions to control and obtain information from
+network interfaces.  Wireless scans are triggered and read over a
+generic netlink nl80211 socket instead of running iw.
+
+class Interface() -- Control a network interface.
+class WiredInterface() -- Control a wired network interface.
+class WirelessInterface() -- Control a wireless network interface.
+
+"""
+
+import errno
+import select
+import socket
+import time
+
+from wicd import misc
+from wicd import netlink
+from wicd.accesspoint import AccessPoint, share_bitrates
+from wicd.wnettools import GetDefaultGateway, GetWiredInterfaces, \
+GetWirelessInterfaces, IsValidWpaSuppDriver, BaseWirelessInterface, \
+BaseWiredInterface, BaseInterface, GetWpaSupplicantDrivers, neediface, \
+RALINK_DRIVER
+
+NAME = "nl80211"
+UPDATE_INTERVAL = 5
+DESCRIPTION = """nl80211 backend
+
+This backend works like the external backend, but talks to the
+kernel over a netlink socket to scan for wireless networks instead
+of running and parsing iw, and to set addresses and routes instead of
+running ifconfig, ip and route.  It falls back to the external tools
+if netlink is not available.  The state of the interfaces is read
+from procfs, sysfs and ioctls instead of ifconfig and iwconfig.
+"""
+
+# Got these from /usr/include/linux/nl80211.h
+NL80211_CMD_GET_SCAN = 32
+NL80211_CMD_TRIGGER_SCAN = 33
+NL80211_CMD_NEW_SCAN_RESULTS = 34
+NL80211_CMD_SCAN_ABORTED = 35
+
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_SCAN_SSIDS = 45
+NL80211_ATTR_BSS = 47
+
+NL80211_BSS_BSSID = 1
+NL80211_BSS_FREQUENCY = 2
+NL80211_BSS_CAPABILITY = 5
+NL80211_BSS_INFORMATION_ELEMENTS = 6
+NL80211_BSS_SIGNAL_MBM = 7
+NL80211_BSS_SIGNAL_UNSPEC = 8
+NL80211_BSS_SEEN_MS_AGO = 10
+NL80211_BSS_BEACON_IES = 11
+
+# Capability bits and information element ids from IEEE 802.11
+WLAN_CAPABILITY_ESS = 0x01
+WLAN_CAPABILITY_IBSS = 0x02
+WLAN_CAPABILITY_PRIVACY = 0x10
+
+WLAN_EID_SSID = 0
+WLAN_EID_SUPP_RATES = 1
+WLAN_EID_DS_PARAMS = 3
+WLAN_EID_RSN = 48
+WLAN_EID_EXT_SUPP_RATES = 50
+WLAN_EID_VENDOR_SPECIFIC = 221
+
+WPA_OUI_TYPE = b'\x00\x50\xf2\x01'
+IE_VERSION_1 = b'\x01\x00'
+
+# BSS membership selectors share the rates IE with the real rates.
+MEMBERSHIP_SELECTORS = frozenset((0xfa, 0xfb, 0xfe, 0xff))
+
+# Seconds to wait for the kernel to finish a triggered scan.
+SCAN_TIMEOUT = 10
+
+
+def NeedsExternalCalls(*args, **kargs):
+    """ Return False, since the interface state is read natively. """
+    return False
+
+
+def parse_ies(data):
+    """ Split raw 802.11 information elements.
+
+    Keyword arguments:
+    data -- the information elements as bytes
+
+    Returns:
+    A dict mapping element ids to their payload, keeping the first
+    occurrence, and the list of vendor specific payloads.
+
+    """
+    ies = {}
+    vendor = []
+    offset = 0
+    end = len(data)
+    while offset + 2 <= end:
+        eid = data[offset]
+        length = data[offset + 1]
+        value = data[offset + 2:offset + 2 + length]
+        if eid == WLAN_EID_VENDOR_SPECIFIC:
+            vendor.append(value)
+        elif eid not in ies:
+            ies[eid] = value
+        offset += 2 + length
+    return ies, vendor
+
+
+class Interface(BaseInterface):
+    """ Control a network interface. """
+    use_rtnetlink = True
+    use_procfs = True
+
+    def __init__(self, iface, verbose=False):
+        """ Initialize the object.
+
+        Keyword arguments:
+        iface -- the name of the interface
+        verbose -- whether to print every command run
+
+        """
+        BaseInterface.__init__(self, iface, verbose)
+        self.Check()
+
+
+class WiredInterface(Interface, BaseWiredInterface):
+    """ Control a wired network interface. """
+    def __init__(self, iface, verbose=False):
+        """ Initialise the wired network interface class.
+
+        Keyword arguments:
+        iface -- name of the interface
+        verbose -- print all commands
+
+        """
+        BaseWiredInterface.__init__(self, iface, verbose)
+        Interface.__init__(self, iface, verbose)
+
+
+class WirelessInterface(Interface, BaseWirelessInterface):
+    """ Control a wireless network interface. """
+    def __init__(self, iface, verbose=False, wpa_driver='wext'):
+        """ Initialise the wireless network interface class.
+
+        Keyword arguments:
+        iface -- name of the interface
+        verbose -- print all commands
+
+        """
+        BaseWirelessInterface.__init__(self, iface, verbose, wpa_driver)
+        Interface.__init__(self, iface, verbose)
+        self.nl = None
+
+    def _open_nl80211(self):
+        """ Open the nl80211 socket if it isn't open yet.
+
+        Returns:
+        True if nl80211 can be used, False otherwise.
+
+        """
+        if self.nl is None:
+            try:
+                self.nl = netlink.GenericNetlinkSocket('nl80211')
+            except (OSError, KeyError) as e:
+                print('WARNING: nl80211 not available, falling back ' +
+                      'to iw scan: %s' % e)
+                self.nl = False
+        return bool(self.nl)
+
+    @neediface([])
+    def GetNetworks(self, essid=None):
+        """ Get a list of available wireless networks.
+
+        Returns:
+        A list containing available wireless networks.
+
+        """
+        if self.wpa_driver == RALINK_DRIVER or not self._open_nl80211():
+            # Ralink legacy cards need iwpriv for the encryption info.
+            return BaseWirelessInterface.GetNetworks(self, essid)
+
+        access_points = {}
+        for entry in self._iter_scan(essid):
+            # Normally we only get duplicate bssids with hidden
+            # networks.  If we hit this, we only want the entry
+            # with the real essid to be in the network list.
+            if (entry['bssid'] not in access_points
+                or not entry['hidden']):
+                access_points[entry['bssid']] = entry
+
+        return list(access_points.values())
+
+    @neediface(None)
+    def GetCachedNetworks(self, max_age):
+        """ Get the networks the kernel remembers from earlier scans.
+
+        Keyword arguments:
+        max_age -- seconds the freshest cached network may be old
+
+        Returns:
+        A list of the cached networks, or None if the cache is empty
+        or older than max_age.
+
+        """
+        if self.wpa_driver == RALINK_DRIVER or not self._open_nl80211():
+            return BaseWirelessInterface.GetCachedNetworks(self, max_age)
+
+        access_points = {}
+        age = None
+        try:
+            ifindex = socket.if_nametoindex(self.iface)
+            for data in self._dump_scan(ifindex):
+                seen = netlink.parse_attrs(data).get(NL80211_BSS_SEEN_MS_AGO)
+                if seen is not None:
+                    bss_age = netlink.u32.unpack(seen)[0] / 1000.0
+                    if age is None or bss_age < age:
+                        age = bss_age
+                entry = self._parse_bss(data)
+                if entry is not None:
+                    if (entry['bssid'] not in access_points
+                        or not entry['hidden']):
+                        access_points[entry['bssid']] = entry
+        except OSError as e:
+            print('ERROR: nl80211 scan dump failed: %s' % e)
+            return None
+        if age is None or age > max_age:
+            return None
+        return list(access_points.values())
+
+    @neediface([])
+    def IterNetworks(self, essid=None, max_age=None):
+        """ Scan for wireless networks, yielding them as they are found.
+
+        Keyword arguments:
+        essid -- the essid of a hidden network to scan for, or None
+        max_age -- if given, use the kernel's scan cache instead of
+                   scanning, unless it is older than max_age seconds
+
+        Returns:
+        An iterator over the available wireless networks.
+
+        """
+        if self.wpa_driver == RALINK_DRIVER or not self._open_nl80211():
+            return BaseWirelessInterface.IterNetworks(self, essid, max_age)
+        if max_age is not None and misc.Noneify(essid) is None:
+            cached = self.GetCachedNetworks(max_age)
+            if cached is not None:
+                return iter(cached)
+        return self._iter_scan(essid)
+
+    def _iter_scan(self, essid=None):
+        """ Scan and parse every BSS as the dump delivers it. """
+        try:
+            ifindex = socket.if_nametoindex(self.iface)
+            self._scan(ifindex, misc.Noneify(essid))
+            for bss in self._dump_scan(ifindex):
+                entry = self._parse_bss(bss)
+                if entry is not None:
+                    yield entry
+        except OSError as e:
+            print('ERROR: nl80211 scan failed: %s' % e)
+
+    def _scan(self, ifindex, essid=None):
+        """ Trigger a scan and wait for the kernel to finish it.
+
+        Keyword arguments:
+        ifindex -- the index of the interface to scan on
+        essid -- a hidden essid to probe for, or None
+
+        """
+        events = netlink.NetlinkSocket(netlink.NETLINK_GENERIC)
+        try:
+            # Join before triggering, or the results event may be missed.
+            events.add_membership(self.nl.mcast_groups['scan'])
+            attrs = [netlink.pack_attr(NL80211_ATTR_IFINDEX,
+                                       netlink.u32.pack(ifindex))]
+            if essid is not None:
+                print('Passing hidden essid to nl80211 scan: ' + essid)
+                attrs.append(netlink.pack_nested(NL80211_ATTR_SCAN_SSIDS,
+                    [netlink.pack_attr(1, essid.encode('utf-8'))]))
+            try:
+                for _ in self.nl.genl_request(NL80211_CMD_TRIGGER_SCAN,
+                                              netlink.NLM_F_ACK, attrs):
+                    pass
+            except OSError as e:
+                # Somebody else, most likely wpa_supplicant, is already
+                # scanning.  Its results will do just as well.
+                if e.errno != errno.EBUSY:
+                    raise
+            self._wait_for_scan(events, ifindex)
+        finally:
+            events.close()
+
+    def _wait_for_scan(self, events, ifindex):
+        """ Wait for the scan on ifindex to complete or abort. """
+        deadline = time.time() + SCAN_TIMEOUT
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print('nl80211 scan did not finish in %d seconds' %
+                      SCAN_TIMEOUT)
+                return
+            if not select.select([events], [], [], remaining)[0]:
+                continue
+            for msg_type, _, _, payload in events.recv():
+                if msg_type != self.nl.family_id:
+                    continue
+                cmd = payload[0]
+                if cmd not in (NL80211_CMD_NEW_SCAN_RESULTS,
+                               NL80211_CMD_SCAN_ABORTED):
+                    continue
+                attrs = netlink.parse_attrs(payload, netlink.genlmsghdr.size)
+                if attrs.get(NL80211_ATTR_IFINDEX) == \
+                   netlink.u32.pack(ifindex):
+                    if cmd == NL80211_CMD_SCAN_ABORTED:
+                        print('nl80211 scan was aborted')
+                    return
+
+    def _dump_scan(self, ifindex):
+        """ Dump the scan results of the interface.
+
+        Yields:
+        The packed NL80211_ATTR_BSS attributes, as they are received.
+
+        """
+        attrs = [netlink.pack_attr(NL80211_ATTR_IFINDEX,
+                                   netlink.u32.pack(ifindex))]
+        for _, reply in self.nl.genl_request(NL80211_CMD_GET_SCAN,
+                                             netlink.NLM_F_DUMP, attrs):
+            if NL80211_ATTR_BSS in reply:
+                yield reply[NL80211_ATTR_BSS]
+
+    def _parse_bss(self, data):
+        """ Parse a single NL80211_ATTR_BSS attribute.
+
+        Keyword arguments:
+        data -- the packed nested BSS attributes
+
+        Returns:
+        A dictionary containing the cell networks properties, or None
+        if the BSS does not describe a usable network.
+
+        """
+        bss = netlink.parse_attrs(data)
+        ies = bss.get(NL80211_BSS_INFORMATION_ELEMENTS) or \
+            bss.get(NL80211_BSS_BEACON_IES)
+        if not ies or NL80211_BSS_BSSID not in bss:
+            return None
+        ies, vendor = parse_ies(ies)
+
+        # Only use BSSes that have an ESSID.
+        if WLAN_EID_SSID not in ies:
+            return None
+
+        ap = AccessPoint()
+        # We (well, DBus) don't support ESSIDs with null bytes in it.
+        essid = ies[WLAN_EID_SSID].replace(b'\x00', b'')
+        try:
+            ap['essid'] = essid.decode('utf-8')
+        except UnicodeDecodeError:
+            ap['essid'] = essid.decode('latin-1')
+
+        if ap['essid'] in ['Hidden', '<hidden>', ""]:
+            ap['hidden'] = True
+            ap['essid'] = "<hidden>"
+        else:
+            ap['hidden'] = False
+
+        # Channel - For cards that don't have a channel number,
+        # convert the frequency.
+        ds_params = ies.get(WLAN_EID_DS_PARAMS)
+        if ds_params:
+            ap['channel'] = str(ds_params[0])
+        else:
+            freq = bss.get(NL80211_BSS_FREQUENCY)
+            if freq is not None:
+                freq = str(netlink.u32.unpack_from(freq)[0])
+            ap['channel'] = self._FreqToChannel(freq)
+
+        # Bit Rate, in units of 500 kb/s with the basic rate flag on top
+        rates = ies.get(WLAN_EID_SUPP_RATES, b'') + \
+            ies.get(WLAN_EID_EXT_SUPP_RATES, b'')
+        rates = [r & 0x7f for r in rates if r not in MEMBERSHIP_SELECTORS]
+        if rates:
+            ap['bitrates'] = share_bitrates(['%d.%d' % (r // 2, 5 * (r & 1))
+                                             for r in sorted(rates)])
+        else:
+            ap['bitrates'] = None
+
+        # BSSID
+        ap['bssid'] = ':'.join('%02x' % b for b in bss[NL80211_BSS_BSSID])
+
+        # Mode
+        capability = bss.get(NL80211_BSS_CAPABILITY)
+        if capability is None:
+            print('Invalid network mode string, ignoring!')
+            return None
+        capability, = netlink.u16.unpack_from(capability)
+        if capability & WLAN_CAPABILITY_ESS:
+            ap['mode'] = 'ESS'
+        elif capability & WLAN_CAPABILITY_IBSS:
+            ap['mode'] = 'IBSS'
+        else:
+            print('Invalid network mode string, ignoring!')
+            return None
+
+        if capability & WLAN_CAPABILITY_PRIVACY:
+            # Encryption - Default to WEP
+            ap['encryption'] = True
+            ap['encryption_method'] = 'WEP'
+
+            wpa = any(ie.startswith(WPA_OUI_TYPE) and
+                      ie[4:6] == IE_VERSION_1 for ie in vendor)
+            rsn = ies.get(WLAN_EID_RSN, b'')[:2] == IE_VERSION_1
+
+            if rsn:
+                if wpa:
+                    # we are in the WPA_IE case
+                    ap['encryption_method'] = 'WPA'
+                else:
+                    ap['encryption_method'] = 'WPA2'
+            elif wpa:
+                ap['encryption_method'] = 'WPA'
+        else:
+            ap['encryption'] = False
+
+        # Link Quality and Signal Strength.  Drivers report either dBm
+        # (in units of 0.01 dBm) or an unspecified 0-100 value.
+        ap['quality'] = 101
+        ap['strength'] = -1
+        if NL80211_BSS_SIGNAL_MBM in bss:
+            mbm, = netlink.s32.unpack_from(bss[NL80211_BSS_SIGNAL_MBM])
+            ap['strength'] = '%.2f' % (mbm / 100.0)
+        elif NL80211_BSS_SIGNAL_UNSPEC in bss:
+            ap['quality'] = bss[NL80211_BSS_SIGNAL_UNSPEC][0]
+
+        return ap
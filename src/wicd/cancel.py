@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd cancellation tokens
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Stops what a connection thread is waiting for when it is cancelled.
+
+A connection thread makes its CancelToken current with scope().  While
+it is, sleep() waits on the token instead of sleeping, the commands
+run through the runner and the reads of sockets and pipes select() on
+the token too, and the processes handed to the caller are terminated
+when the token is cancelled.  All of them raise Cancelled then.
+
+class Cancelled() -- Raised by what was waiting when cancelled.
+class CancelToken() -- Cancels the waits of a thread.
+scope() -- Make a token current for the thread.
+current() -- The token of the thread, or None.
+sleep() -- Sleep, unless cancelled.
+wait_readable() -- Wait for a file descriptor, unless cancelled.
+class LineReader() -- Read the lines of a pipe, unless cancelled.
+
+"""
+
+import os
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+READ_SIZE = 4096
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """ The token of the thread was cancelled. """
+
+
+class CancelToken(object):
+    """ Cancels the waits of the thread it is current for. """
+    def __init__(self):
+        """ Initialize a token that isn't cancelled. """
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = []
+        # Written to when cancelled, so select() can wait on it.  It
+        # is only made once a select() needs it.
+        self._reader = self._writer = None
+
+    @property
+    def cancelled(self):
+        """ True once cancel() was called. """
+        return self._event.is_set()
+
+    def fileno(self):
+        """ Returns a descriptor that is readable once cancelled. """
+        with self._lock:
+            if self._reader is None:
+                self._reader, self._writer = socket.socketpair()
+                if self._event.is_set():
+                    self._writer.send(b'\0')
+            return self._reader.fileno()
+
+    def cancel(self):
+        """ Cancel the token and terminate the processes it watches. """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            processes = self._processes
+            self._processes = []
+            if self._writer is not None:
+                self._writer.send(b'\0')
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+    def close(self):
+        """ Free the descriptor of fileno(); cancel() still works. """
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._writer.close()
+                self._reader = self._writer = None
+
+    def wait(self, seconds):
+        """ Wait until cancelled or seconds passed; True if cancelled. """
+        return self._event.wait(seconds)
+
+    def check(self):
+        """ Raise Cancelled if the token was cancelled. """
+        if self._event.is_set():
+            raise Cancelled()
+
+    def watch(self, process):
+        """ Terminate a subprocess.Popen when cancelled. """
+        with self._lock:
+            if not self._event.is_set():
+                self._processes = [p for p in self._processes
+                                   if p.poll() is None]
+                self._processes.append(process)
+                return
+        process.terminate()
+
+
+@contextmanager
+def scope(token):
+    """ Make token the current one of the thread in a with statement. """
+    previous = getattr(_local, 'token', None)
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def current():
+    """ Returns the token current for the thread, or None. """
+    return getattr(_local, 'token', None)
+
+
+def sleep(seconds):
+    """ Sleep, returning early if the current token is cancelled.
+
+    Raises Cancelled if it was.
+
+    """
+    token = current()
+    if token is None:
+        time.sleep(seconds)
+    elif token.wait(seconds):
+        raise Cancelled()
+
+
+def wait_readable(fds, timeout=None):
+    """ select() file descriptors and the current token.
+
+    Keyword arguments:
+    fds -- the file descriptors or objects with a fileno() to wait for
+    timeout -- seconds to wait at most, or None to wait until one is
+               readable
+
+    Returns:
+    The readable ones of fds, empty if none was in time.
+
+    Raises Cancelled if the current token is cancelled.
+
+    """
+    token = current()
+    if token is None:
+        ready, _, _ = select.select(fds, [], [], timeout)
+        return ready
+    token.check()
+    ready, _, _ = select.select(list(fds) + [token], [], [], timeout)
+    if token in ready:
+        raise Cancelled()
+    return ready
+
+
+class LineReader(object):
+    """ Reads the lines of a pipe, stopping when cancelled.
+
+    The pipe is read with os.read() once select() found it readable,
+    so nothing is left in a buffer select() can't see.
+
+    """
+    def __init__(self, pipe):
+        """ Read from pipe, a file object or file descriptor. """
+        self.fd = pipe if isinstance(pipe, int) else pipe.fileno()
+        self.buffer = b''
+        self.eof = False
+
+    def readline(self):
+        """ Read a line.
+
+        Returns:
+        The line as a string, with its newline, or '' at the end.
+
+        Raises Cancelled if the current token is cancelled.
+
+        """
+        while b'\n' not in self.buffer and not self.eof:
+            wait_readable([self.fd])
+            data = os.read(self.fd, READ_SIZE)
+            if data:
+                self.buffer += data
+            else:
+                self.eof = True
+        line, newline, self.buffer = self.buffer.partition(b'\n')
+        return (line + newline).decode('utf-8', 'replace')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd capability registry
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Remembers what the installed tools can do.
+
+Which programs are installed and what they support doesn't change
+while wicd runs, unless packages are installed or removed.  Each probe
+runs once and its result is kept until forget() is called.
+
+memoize() -- Run a probe once and remember its result.
+find() -- Find the path of a program.
+ping_supports_deadline() -- Whether ping knows -w.
+wpa_supplicant_drivers() -- The drivers wpa_supplicant was built with.
+valid_wpa_driver() -- Whether wpa_supplicant accepts a driver.
+dhclient_version() -- The version banner of dhclient.
+probe_all() -- Run every probe at once.
+forget() -- Forget every result, eg. after packages changed.
+snapshot() -- The results found so far.
+
+"""
+
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from wicd import misc
+from wicd import runner
+
+# The programs looked for by the interfaces' Check* methods and the
+# tools they run.
+PROGRAMS = ('dhclient', 'dhcpcd', 'pump', 'udhcpc', 'mii-tool', 'ethtool',
+            'wpa_cli', 'wpa_supplicant', 'wpa_passphrase', 'ip', 'route',
+            'ping', 'gksudo', 'kdesu', 'ktsuss')
+
+_results = {}
+
+
+def memoize(key, probe):
+    """ Run a probe unless its result is known already.
+
+    Keyword arguments:
+    key -- what the result is remembered as
+    probe -- a function without arguments returning the result
+
+    Returns:
+    The result of the probe.
+
+    """
+    try:
+        return _results[key]
+    except KeyError:
+        return _results.setdefault(key, probe())
+
+
+def find(program):
+    """ Returns the path of program, or None if it isn't installed. """
+    return memoize(('path', program), lambda: runner.which(program))
+
+
+def ping_supports_deadline():
+    """ Returns True if ping is the iputils one, which knows -w. """
+    return memoize('ping_deadline',
+                   lambda: "iputils" in misc.Run(["ping", "-V"]))
+
+
+def _probe_wpa_drivers():
+    """ Parse the drivers out of wpa_supplicant's help. """
+    output = misc.Run(["wpa_supplicant", "-h"])
+    try:
+        output = output.split("drivers:")[1].split("options:")[0].strip()
+    except IndexError:
+        print("Warning: Couldn't get list of valid wpa_supplicant drivers")
+        return ("",)
+    patt = re.compile(r"(\S+)\s+=.*")
+    drivers = patt.findall(output) or [""]
+    # We cannot use the "wired" driver for wireless interfaces.
+    if 'wired' in drivers:
+        drivers.remove('wired')
+    return tuple(drivers)
+
+
+def wpa_supplicant_drivers():
+    """ Returns a tuple of the drivers wpa_supplicant supports. """
+    return memoize('wpa_drivers', _probe_wpa_drivers)
+
+
+def valid_wpa_driver(driver):
+    """ Returns True if wpa_supplicant accepts the given driver. """
+    def probe():
+        output = misc.Run(["wpa_supplicant", "-D%s" % driver, "-iolan19",
+                           "-c/etc/abcd%sdefzz.zconfz" %
+                           random.randint(1, 1000)])
+        return not "Unsupported driver" in output
+    return memoize(('wpa_driver', driver), probe)
+
+
+def dhclient_version():
+    """ Returns what dhclient --version prints, or '' without dhclient. """
+    def probe():
+        path = find("dhclient")
+        if not path:
+            return ""
+        return misc.Run([path, "--version"], include_stderr=True).strip()
+    return memoize('dhclient_version', probe)
+
+
+def probe_all(programs=PROGRAMS):
+    """ Run every probe in parallel and wait for them.
+
+    Keyword arguments:
+    programs -- the programs to look for
+
+    Returns:
+    The snapshot() of the results.
+
+    """
+    probes = [ping_supports_deadline, wpa_supplicant_drivers,
+              dhclient_version]
+    probes += [lambda program=program: find(program) for program in programs]
+    with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+        for future in [executor.submit(probe) for probe in probes]:
+            future.result()
+    return snapshot()
+
+
+def forget():
+    """ Forget every result, so the next use probes again. """
+    _results.clear()
+    runner.forget_paths()
+
+
+def snapshot():
+    """ Returns the results found so far.
+
+    Returns:
+    A dict mapping 'path:<program>' to the program's path, or '' if it
+    isn't installed, 'wpa_driver:<driver>' to whether wpa_supplicant
+    accepts the driver, and the other probes' names to their results.
+
+    """
+    found = {}
+    for key, value in list(_results.items()):
+        if isinstance(key, tuple):
+            key = '%s:%s' % key
+        if value is None:
+            value = ''
+        elif isinstance(value, tuple):
+            value = list(value)
+        found[key] = value
+    return found
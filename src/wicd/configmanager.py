@@ -71,6 +71,8 @@ class ConfigManager(RawConfigParser):
         self.config = config
         self.debug = debug
         self.mrk_ws = mark_whitespace
+        # Bumped on every change, so users can tell when to reread.
+        self.generation = 0
 
         # this is really weird hack to write ourself to the file.
         # we need a much better approach to handle config files 
@@ -120,6 +122,7 @@ class ConfigManager(RawConfigParser):
                 value = "%(ws)s%(value)s%(ws)s" % {"value" : value,
                                                    "ws" : self.mrk_ws}
         RawConfigParser.set(self, section, str(option), value)
+        self.generation += 1
         if write:
             self.write()
 
@@ -204,6 +207,19 @@ class ConfigManager(RawConfigParser):
         """
         if self.has_section(section):
             RawConfigParser.remove_section(self, section)
+            self.generation += 1
+
+    def add_section(self, section):
+        """ Wrapper around the ConfigParser.add_section() method. """
+        RawConfigParser.add_section(self, section)
+        self.generation += 1
+
+    def remove_option(self, section, option):
+        """ Wrapper around the ConfigParser.remove_option() method. """
+        removed = RawConfigParser.remove_option(self, section, option)
+        if removed:
+            self.generation += 1
+        return removed
             
     def reload(self):
         """ Re-reads the config file, in case it was edited out-of-band. """
@@ -217,6 +233,7 @@ class ConfigManager(RawConfigParser):
         """
         if os.path.exists(path):
             RawConfigParser.readfp(self, codecs.open(path, 'r', 'utf-8'))
+            self.generation += 1
 
         path_d = path + ".d"
         files = []
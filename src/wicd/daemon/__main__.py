@@ -45,6 +45,7 @@ import time
 import getopt
 import signal
 import atexit
+import threading
 from subprocess import Popen
 from operator import itemgetter
 
@@ -55,8 +56,17 @@ import dbus
 # wicd specific libraries
 from wicd import networking
 from wicd import misc
+from wicd import runner
+from wicd import capabilities
 from wicd import wnettools
+from wicd.accesspoint import strongest_first
 from wicd.misc import noneToBlankString, _status_dict
+from wicd.daemon.bsstable import BssTable
+from wicd.daemon import scancoordinator
+from wicd.daemon.profileindex import ProfileIndex
+from wicd.daemon.scansnapshot import save_snapshot, load_snapshot
+from wicd.daemon.signalfilter import SignalFilter, QUALITY_BUCKETS, DBM_BUCKETS
+from wicd.daemon.timings import PhaseTimings
 from wicd.logfile import ManagedStdio
 from wicd.configmanager import ConfigManager
 
@@ -81,8 +91,11 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
 
         self.config = ConfigManager.get_manager_config()
         self._debug_mode = bool(self.config.get("Settings", "debug_mode"))
+        # The interfaces ask which tools there are, find out all at once.
+        capabilities.probe_all()
         self.wifi = networking.Wireless(debug=self._debug_mode)
         self.wired = networking.Wired(debug=self._debug_mode)
+        self.monitor_timings = PhaseTimings()
         self.wired_bus = WiredDaemon(bus, self, wired=self.wired)
         self.wireless_bus = WirelessDaemon(bus, self, wifi=self.wifi)
         self.forced_disconnect = False
@@ -107,6 +120,10 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
         self.wired_bus.connect_mode = 1
         self.dns_dom = None
         self.signal_display_type = 0
+        self.signal_filter = SignalFilter()
+        self.monitor_poll_min = 2
+        self.monitor_poll_max = 30
+        self.monitor_poll_backoff = 2.0
         self.dns1 = None
         self.dns2 = None
         self.dns3 = None
@@ -123,7 +140,9 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
         self.ReadConfig()
         self.DaemonStarting()
 
-        # Scan since we just got started
+        # Start out with the networks of the last run until the
+        # scan since we just got started is done.
+        self.wireless_bus._load_snapshot()
         if not args.auto_connect:
             print("--no-autoconnect detected, not autoconnecting...")
             self.SetForcedDisconnect(True)
@@ -165,6 +184,9 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
         # Set it to a blank string, otherwise a network card named "None" will be searched
         self.wifi.wireless_interface = noneToBlankString(interface)
         self.config.set("Settings", "wireless_interface", interface, write=True)
+        # Networks seen on another interface are of no use anymore.
+        self.wireless_bus.bss_table.clear()
+        self.wireless_bus.scans.invalidate()
 
     @dbus.service.method('org.wicd.daemon')
     def SetWPADriver(self, driver):
@@ -173,6 +195,26 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
         self.wifi.wpa_driver = driver
         self.config.set("Settings", "wpa_driver", driver, write=True)
 
+    @dbus.service.method('org.wicd.daemon')
+    def SetKeepSupplicant(self, value):
+        """ Sets whether wpa_supplicant is kept running between connections.
+
+        If this is True, one wpa_supplicant runs per wireless interface
+        and is switched between networks over its control interface,
+        instead of being restarted for every connection.
+
+        """
+        value = misc.to_bool(value)
+        print('setting keep wpa_supplicant to', value)
+        self.wifi.keep_supplicant = value
+        self.config.set("Settings", "keep_wpa_supplicant", int(value),
+                        write=True)
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetKeepSupplicant(self):
+        """ Returns whether wpa_supplicant is kept running. """
+        return bool(self.wifi.keep_supplicant)
+
     @dbus.service.method('org.wicd.daemon')
     def SetUseGlobalDNS(self, use):
         """ Sets a boolean which determines if global DNS is enabled. """
@@ -405,12 +447,248 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
         else:
             return False
 
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sv}')
+    def GetMonitorSnapshot(self):
+        """ Returns everything the connection monitor checks on a tick.
+
+        Gathering it in one call saves the monitor a D-Bus round trip
+        for every value.  The wireless link is read from a single
+        iwconfig call, or straight from the driver when the backend
+        needs no external calls.  Like the monitor, it stops probing
+        once the state is known: while suspended, while connecting
+        and while a wired connection is active.
+
+        Returns:
+        A dict of the values.  Those not probed are empty strings,
+        False, 0 or -1.  'signal' is the smoothed signal strength in
+        the display type's unit, changing only by enough to announce.
+
+        """
+        snapshot = {
+            'suspended': bool(self.suspended),
+            'connecting': False,
+            'wired_connecting': False,
+            'prefer_wired': bool(self.prefer_wired),
+            'forced_disconnect': bool(self.forced_disconnect),
+            'auto_reconnect': bool(self.auto_reconnect),
+            'gui_open': bool(self.gui_open),
+            'signal_display_type': int(self.signal_display_type),
+            'poll_min': self.monitor_poll_min,
+            'poll_max': self.monitor_poll_max,
+            'poll_backoff': self.monitor_poll_backoff,
+            'wired_interface': self.GetWiredInterface(),
+            'wireless_interface': self.GetWirelessInterface(),
+            'wired_ip': '',
+            'plugged_in': False,
+            'wireless_ip': '',
+            'bssid': '',
+            'essid': '',
+            'quality': 0,
+            'dbm': 0,
+            'signal': 0,
+            'network_id': -1,
+            'bitrate': '',
+        }
+        if snapshot['suspended']:
+            return snapshot
+
+        timings = self.monitor_timings
+        for phase, probe in (('connecting', self._probe_connecting),
+                             ('wired', self._probe_wired),
+                             ('wireless', self._probe_wireless)):
+            with timings.time(phase):
+                if probe(snapshot):
+                    break
+        return snapshot
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sa(su)}')
+    def GetMonitorTimings(self):
+        """ Returns the latency histograms of the monitor's tick phases.
+
+        The daemon times the connecting, wired and wireless probes of
+        GetMonitorSnapshot().  A monitor running in the daemon adds
+        the snapshot, publish and whole tick phases.
+
+        Returns:
+        A dict mapping each phase to (bucket, count) pairs.
+
+        """
+        return self.monitor_timings.buckets()
+
+    def DumpMonitorTimings(self, *args):
+        """ Print the monitor's tick phase histograms to the log. """
+        print('Connection monitor tick timings:')
+        print(self.monitor_timings.format())
+        print('External command timings:')
+        print(runner.timings.format())
+        print('Connection step timings:')
+        print(networking.timings.format())
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sv}')
+    def GetCapabilities(self):
+        """ Returns what the installed tools were found to support.
+
+        Returns:
+        A dict mapping 'path:<program>' to each program's path, or ''
+        if it isn't installed, and the other probes to their results.
+
+        """
+        return capabilities.snapshot()
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sv}')
+    def ReprobeCapabilities(self):
+        """ Probe the installed tools again, eg. after packages changed.
+
+        Returns:
+        The capabilities found, like GetCapabilities().
+
+        """
+        print('Probing the installed tools again')
+        capabilities.forget()
+        found = capabilities.probe_all()
+        for controller in (self.wifi, self.wired):
+            if controller.iface:
+                controller.iface.Check()
+        return found
+
+    def PackagesChanged(self, *args):
+        """ Probe the tools again once back on the main loop.
+
+        Installed as the SIGHUP handler, which package manager hooks
+        can send after installing or removing packages.
+
+        """
+        def reprobe():
+            self.ReprobeCapabilities()
+            return False
+        gobject.idle_add(reprobe)
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sa(su)}')
+    def GetCommandTimings(self):
+        """ Returns the latency histograms of the external commands run.
+
+        Returns:
+        A dict mapping each program name to (bucket, count) pairs.
+
+        """
+        return runner.timings.buckets()
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sa(su)}')
+    def GetConnectTimings(self):
+        """ Returns the latency histograms of the steps of connecting.
+
+        Returns:
+        A dict mapping each strategy and step, eg. resume:reassociate
+        or full:set_ip_address, and each whole strategy to (bucket,
+        count) pairs.
+
+        """
+        return networking.timings.buckets()
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{sv}')
+    def GetLastConnectTimeline(self):
+        """ Returns what happened during the last connection attempt.
+
+        Returns:
+        A dict with the 'type', 'name' and 'bssid' of the network, the
+        'started' and 'finished' times and the 'result' of the attempt,
+        its 'steps' as (step, strategy, start, end, result, commands)
+        structs, with commands as (program, exit status, seconds)
+        structs, and the 'statuses' it went through as (time, status)
+        structs.  Unknown exit statuses and seconds are -1.  Empty if
+        there was no attempt yet.
+
+        """
+        timeline = networking.timelines.last()
+        if timeline is None:
+            return {}
+        return self._timeline_for_dbus(timeline)
+
+    @dbus.service.method('org.wicd.daemon', out_signature='aa{sv}')
+    def GetConnectTimelines(self):
+        """ Returns the timelines of the last connection attempts.
+
+        Returns:
+        A list of dicts like GetLastConnectTimeline(), oldest first.
+
+        """
+        return [self._timeline_for_dbus(timeline)
+                for timeline in networking.timelines.all()]
+
+    def _timeline_for_dbus(self, timeline):
+        """ Convert a Timeline to the types D-Bus can't guess. """
+        info = timeline.as_dict()
+        steps = []
+        for step in info['steps']:
+            commands = [(command, -1 if returncode is None else returncode,
+                         -1.0 if elapsed is None else float(elapsed))
+                        for command, returncode, elapsed in step['commands']]
+            steps.append(dbus.Struct((step['step'], step['strategy'],
+                                      step['start'], step['end'],
+                                      step['result'],
+                                      dbus.Array(commands,
+                                                 signature='(sid)')),
+                                     signature='ssddsa(sid)'))
+        info['steps'] = dbus.Array(steps, signature='(ssddsa(sid))')
+        info['statuses'] = dbus.Array(info['statuses'], signature='(ds)')
+        return info
+
+    def _probe_connecting(self, snapshot):
+        """ Fill in a connection being made; True if there is one. """
+        if self.wired_bus.CheckIfWiredConnecting():
+            snapshot['connecting'] = snapshot['wired_connecting'] = True
+            return True
+        wireless = self.wireless_bus
+        if wireless.CheckIfWirelessConnecting():
+            snapshot['connecting'] = True
+            snapshot['essid'] = misc.noneToBlankString(
+                wireless.GetCurrentNetwork())
+            return True
+        return False
+
+    def _probe_wired(self, snapshot):
+        """ Fill in the wired link; True if it is the active one. """
+        wired = self.wired_bus
+        wired_ip = misc.noneToBlankString(wired.GetWiredIP(""))
+        snapshot['wired_ip'] = wired_ip
+        if wired_ip or self.prefer_wired:
+            snapshot['plugged_in'] = bool(wired.CheckPluggedIn())
+        return bool(wired_ip and snapshot['plugged_in'])
+
+    def _probe_wireless(self, snapshot):
+        """ Fill in the wireless link; True if it has an address. """
+        wireless = self.wireless_bus
+        wireless_ip = misc.noneToBlankString(wireless.GetWirelessIP(""))
+        snapshot['wireless_ip'] = wireless_ip
+        if not wireless_ip:
+            return False
+        if self.NeedsExternalCalls():
+            iwconfig = self.wifi.GetIwconfig()
+        else:
+            iwconfig = ''
+        snapshot['bssid'] = misc.noneToBlankString(
+            self.wifi.GetBSSID(iwconfig))
+        snapshot['essid'] = misc.noneToBlankString(
+            wireless.GetCurrentNetwork(iwconfig))
+        snapshot['quality'] = wireless.GetCurrentSignalStrength(iwconfig)
+        snapshot['dbm'] = wireless.GetCurrentDBMStrength(iwconfig)
+        if self.signal_display_type == 0:
+            snapshot['signal'] = self.signal_filter.update(
+                snapshot['bssid'], snapshot['quality'], QUALITY_BUCKETS)
+        else:
+            snapshot['signal'] = self.signal_filter.update(
+                snapshot['bssid'], snapshot['dbm'], DBM_BUCKETS)
+        snapshot['network_id'] = wireless.GetCurrentNetworkID(iwconfig)
+        snapshot['bitrate'] = misc.noneToBlankString(
+            wireless.GetCurrentBitrate(iwconfig))
+        return True
+
     @dbus.service.method('org.wicd.daemon')
     def CancelConnect(self):
         """ Cancels the wireless connection attempt """
         print('canceling connection attempt')
         if self.wifi.connecting_thread:
-            self.wifi.connecting_thread.should_die = True
+            self.wifi.connecting_thread.cancel()
             self.wifi.ReleaseDHCP()
             # We have to actually kill dhcp if its still hanging
             # around.  It could still be trying to get a lease.
@@ -418,7 +696,7 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
             self.wifi.StopWPA()
             self.wifi.connecting_thread.connect_result = 'aborted'
         if self.wired.connecting_thread:
-            self.wired.connecting_thread.should_die = True
+            self.wired.connecting_thread.cancel()
             self.wired.ReleaseDHCP()
             self.wired.KillDHCP()
             self.wired.connecting_thread.connect_result = 'aborted'
@@ -488,8 +766,44 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
     def SetSignalDisplayType(self, value):
         """ Sets the signal display type and writes it the wicd config file. """
         self.config.set("Settings", "signal_display_type", value, write=True)
+        if int(value) != self.signal_display_type:
+            # The samples are in the other unit.
+            self.signal_filter.reset()
         self.signal_display_type = int(value)
 
+    @dbus.service.method('org.wicd.daemon')
+    def GetSignalWindow(self):
+        """ Returns the number of samples the signal is smoothed over. """
+        return self.signal_filter.window
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetSignalWindow(self, value):
+        """ Sets the number of samples the signal is smoothed over. """
+        self.config.set("Settings", "signal_window", int(value), write=True)
+        self.signal_filter.window = max(1, int(value))
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetSignalDelta(self):
+        """ Returns the smoothed signal change that is always announced. """
+        return self.signal_filter.delta
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetSignalDelta(self, value):
+        """ Sets the smoothed signal change that is always announced.
+
+        Smaller changes are only announced when the signal icon shown
+        by the frontends changes.
+
+        """
+        self.config.set("Settings", "signal_delta", int(value), write=True)
+        self.signal_filter.delta = int(value)
+
+    @dbus.service.method('org.wicd.daemon', out_signature='a{si}')
+    def GetSignalFilterStats(self):
+        """ Returns how many signal changes were announced and suppressed. """
+        return {'emitted': self.signal_filter.emitted,
+                'suppressed': self.signal_filter.suppressed}
+
     @dbus.service.method('org.wicd.daemon')
     def GetGUIOpen(self):
         """ Returns the value of gui_open.
@@ -574,6 +888,92 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
         self.config.set("Settings", "prefer_wired", bool(value), write=True)
         self.prefer_wired = bool(value)
 
+    @dbus.service.method('org.wicd.daemon')
+    def GetBssMaxAge(self):
+        """ Returns how long a network missing from scans is kept listed. """
+        return self.wireless_bus.bss_table.max_age
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetBssMaxAge(self, value):
+        """ Sets the seconds a network missing from scans is kept listed. """
+        self.config.set("Settings", "bss_max_age", int(value), write=True)
+        self.wireless_bus.bss_table.max_age = int(value)
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetScanFreshness(self):
+        """ Returns how long scan results are served without scanning. """
+        return self.wireless_bus.scans.freshness
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetScanFreshness(self, value):
+        """ Sets the seconds a scan request may be answered from cache. """
+        self.config.set("Settings", "scan_freshness", int(value), write=True)
+        self.wireless_bus.scans.freshness = int(value)
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetScanClientInterval(self):
+        """ Returns the minimum seconds between scans for one client. """
+        return self.wireless_bus.scans.client_interval
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetScanClientInterval(self, value):
+        """ Sets the minimum seconds between scans for one client. """
+        self.config.set("Settings", "scan_client_interval", int(value),
+                        write=True)
+        self.wireless_bus.scans.client_interval = int(value)
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetScanCacheMaxAge(self):
+        """ Returns the age up to which cached scans use the kernel cache. """
+        return self.wireless_bus.scan_cache_max_age
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetScanCacheMaxAge(self, value):
+        """ Sets the seconds the kernel's scan cache may be old.
+
+        Cached scans do a real scan if the kernel's cache is older.
+
+        """
+        self.config.set("Settings", "scan_cache_max_age", int(value),
+                        write=True)
+        self.wireless_bus.scan_cache_max_age = int(value)
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetMonitorPollMin(self):
+        """ Returns the shortest seconds between connection status polls. """
+        return self.monitor_poll_min
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetMonitorPollMin(self, value):
+        """ Sets the seconds between polls while the connection changes. """
+        self.config.set("Settings", "monitor_poll_min", int(value),
+                        write=True)
+        self.monitor_poll_min = max(1, int(value))
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetMonitorPollMax(self):
+        """ Returns the longest seconds between connection status polls. """
+        return self.monitor_poll_max
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetMonitorPollMax(self, value):
+        """ Sets the seconds the polls may back off to while stable. """
+        self.config.set("Settings", "monitor_poll_max", int(value),
+                        write=True)
+        self.monitor_poll_max = max(1, int(value))
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetMonitorPollBackoff(self):
+        """ Returns the factor the poll interval grows by while stable. """
+        return self.monitor_poll_backoff
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetMonitorPollBackoff(self, value):
+        """ Sets the factor the poll interval grows by while stable. """
+        self.config.set("Settings", "monitor_poll_backoff", float(value),
+                        write=True)
+        self.monitor_poll_backoff = float(value)
+
     @dbus.service.method('org.wicd.daemon')
     def GetShowNeverConnect(self):
         """ Returns True if show_never_connect is set
@@ -883,6 +1283,8 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
 
         self.SetWPADriver(app_conf.get("Settings", "wpa_driver",
           default="wext"))
+        self.SetKeepSupplicant(app_conf.get("Settings", "keep_wpa_supplicant",
+                                            default=False))
         self.SetAlwaysShowWiredInterface(app_conf.get("Settings",
                                                 "always_show_wired_interface",
                                                 default=False))
@@ -915,6 +1317,25 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
                                                 default=False))
         self.SetShowNeverConnect(app_conf.get("Settings", "show_never_connect", 
                                                 default=True))
+        self.SetBssMaxAge(app_conf.get("Settings", "bss_max_age", default=60))
+        self.SetScanFreshness(app_conf.get("Settings", "scan_freshness",
+                                           default=5))
+        self.SetScanClientInterval(app_conf.get("Settings",
+                                                "scan_client_interval",
+                                                default=10))
+        self.SetScanCacheMaxAge(app_conf.get("Settings", "scan_cache_max_age",
+                                             default=30))
+        self.SetSignalWindow(app_conf.get("Settings", "signal_window",
+                                          default=5))
+        self.SetSignalDelta(app_conf.get("Settings", "signal_delta",
+                                         default=5))
+        self.SetMonitorPollMin(app_conf.get("Settings", "monitor_poll_min",
+                                            default=2))
+        self.SetMonitorPollMax(app_conf.get("Settings", "monitor_poll_max",
+                                            default=30))
+        self.SetMonitorPollBackoff(app_conf.get("Settings",
+                                                "monitor_poll_backoff",
+                                                default=2.0))
         app_conf.write()
 
 
@@ -945,6 +1366,23 @@ class WicdDaemon(wicd.dbus.service.Object, wicd.log.LogAble):
 ###### Wireless Daemon #######
 ##############################
 
+def _bulk_value(value):
+    """ Prepare a network property to be sent as a D-Bus variant. """
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return dbus.Array([misc.to_unicode(v) for v in value], signature='s')
+    return misc.to_unicode(value)
+
+# Seconds between the deltas sent while a scan is still running.
+PARTIAL_SCAN_INTERVAL = 0.5
+
+# Seconds a synchronous Scan call waits for a scan it joined.
+SCAN_JOIN_TIMEOUT = 60
+
+# File in the run directory the last scan is kept in.
+SCAN_SNAPSHOT = 'scan-snapshot.json'
+
 class WirelessDaemon(dbus.service.Object, object):
     """ DBus interface for wireless connection operations. """
     def __init__(self, bus_name, daemon, wifi=None, debug=False):
@@ -955,9 +1393,15 @@ class WirelessDaemon(dbus.service.Object, object):
         self.daemon = daemon
         self.wifi = wifi
         self._debug_mode = debug
-        self._scanning = False
+        self.scans = scancoordinator.ScanCoordinator()
+        self.scan_cache_max_age = 30
+        self.bss_table = BssTable()
         self.LastScan = []
+        self.scan_stale = False
+        self.snapshot_path = os.path.join(wicd.config.rundir_path,
+                                          SCAN_SNAPSHOT)
         self.config = ConfigManager.get_wireless_config()
+        self.profiles = ProfileIndex(self.config)
 
     def get_debug_mode(self):
         """ Getter for the debug_mode property. """
@@ -973,45 +1417,152 @@ class WirelessDaemon(dbus.service.Object, object):
         """ Sets the ESSID of a hidden network for use with Scan(). """
         self.hidden_essid = str(misc.Noneify(essid))
 
-    @dbus.service.method('org.wicd.daemon.wireless')
-    def Scan(self, sync=False):
+    @dbus.service.method('org.wicd.daemon.wireless', sender_keyword='sender')
+    def Scan(self, sync=False, cached=False, sender=None):
         """ Scan for wireless networks.
 
         Scans for wireless networks, optionally using a (hidden) essid
         set with SetHiddenNetworkESSID.
 
         The sync keyword argument specifies whether the scan should
-        be done synchronously.
+        be done synchronously.  If cached is True, the networks are
+        read from the kernel's scan cache, and only scanned for if
+        that is older than the scan_cache_max_age setting.
+
+        Requests made while a scan is running share that scan.  If
+        the last scan is recent enough, or the client asked for a
+        scan very recently, no new scan is done and the end of scan
+        signal is sent right away.
+
+        Returns False if a scan for another hidden essid is running.
 
         """
-        if self._scanning:
+        action = self.scans.request(str(self.hidden_essid), sender)
+        if action == scancoordinator.BUSY:
             if self.debug_mode:
-                print("scan already in progress, skipping")
+                print("scan for another essid in progress, skipping")
             return False
+        if action == scancoordinator.CACHED:
+            if self.debug_mode:
+                print('using cached scan results')
+            self.SendEndScanSignal()
+            return True
+        if action == scancoordinator.JOIN:
+            if self.debug_mode:
+                print("scan already in progress, joining it")
+            if sync:
+                self.scans.wait(SCAN_JOIN_TIMEOUT)
+                # The scan thread's results wait for the main loop,
+                # which is blocked here.
+                self.LastScan = self.bss_table.networks()
+            return True
         if self.debug_mode:
             print('scanning start')
+        if cached:
+            max_age = self.scan_cache_max_age
+        else:
+            max_age = None
         self.SendStartScanSignal()
         if sync:
-            self._sync_scan()
+            self._sync_scan(max_age)
         else:
-            self._async_scan()
+            self._async_scan(max_age)
         return True
 
     @misc.threaded
-    def _async_scan(self):
+    def _async_scan(self, max_age=None):
         """ Run a scan in its own thread. """
-        self._sync_scan()
+        self._sync_scan(max_age)
 
-    def _sync_scan(self):
-        """ Run a scan and send a signal when its finished. """
-        scan = self.wifi.Scan(str(self.hidden_essid))
-        self.LastScan = scan
-        if self.debug_mode:
-            print('scanning done')
-            print('found ' + str(len(scan)) + ' networks')
-        for i, network in enumerate(scan):
-            self.ReadWirelessNetworkProfile(i)
-        self.SendEndScanSignal()
+    def _sync_scan(self, max_age=None):
+        """ Run a scan and send a signal when its finished.
+
+        The networks the scan found are put in LastScan and announced
+        with SendScanDeltaSignal at most every PARTIAL_SCAN_INTERVAL
+        seconds until the scan is done.  Both happen on the main loop,
+        so the D-Bus methods see the same LastScan throughout a call;
+        networks only go away at the end of the scan, so network ids
+        stay valid until then.
+
+        Keyword arguments:
+        max_age -- if given, read the kernel's scan cache instead, as
+                   long as it isn't older than max_age seconds
+
+        """
+        self._scan_delta = ([], [])
+        self._scan_delta_time = start = time.time()
+        self._scan_generation = self.bss_table.generation
+        try:
+            scan = self.wifi.Scan(str(self.hidden_essid),
+                                  callback=self._scan_found,
+                                  max_age=max_age)
+            # Every network of the scan went through _scan_found already.
+            removed = self.bss_table.expire(start)
+            save_snapshot(self.snapshot_path, self.wifi.wireless_interface,
+                          self.bss_table.networks())
+            if self.debug_mode:
+                print('scanning done')
+                print('found ' + str(len(scan)) + ' networks')
+            added, changed = self._scan_delta
+            self._on_main_loop(self._publish_scan, added, removed, changed,
+                               True)
+        finally:
+            self.scans.finish()
+            self._on_main_loop(self.SendEndScanSignal)
+
+    def _on_main_loop(self, func, *args):
+        """ Run func(*args) on the main loop, right away if this is it. """
+        if threading.current_thread() is threading.main_thread():
+            func(*args)
+            return
+        def call():
+            func(*args)
+            return False
+        gobject.idle_add(call)
+
+    def _publish_scan(self, added, removed, changed, done=False):
+        """ Update LastScan from the table and announce the delta. """
+        self.LastScan = self.bss_table.networks()
+        if done:
+            self.scan_stale = False
+        if added or removed or changed:
+            self.SendScanDeltaSignal(added, removed, changed)
+
+    def _load_snapshot(self):
+        """ Fill LastScan with the networks saved by the last scan.
+
+        The networks are marked stale until the next scan is done.
+
+        """
+        networks = load_snapshot(self.snapshot_path,
+                                 self.wifi.wireless_interface)
+        if not networks:
+            return
+        for network in networks:
+            network.defer_profile(self._read_profile)
+        self.bss_table.restore(networks)
+        self.LastScan = self.bss_table.networks()
+        self.scan_stale = True
+        print('loaded %d networks of the last scan' % len(self.LastScan))
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetScanIsStale(self):
+        """ Returns True if LastScan is still from the daemon's last run. """
+        return self.scan_stale
+
+    def _scan_found(self, network):
+        """ Publish a network found by a running scan. """
+        added, changed = self.bss_table.merge([network],
+                                              generation=self._scan_generation)
+        # Profiles are only read for networks somebody looks at.
+        network.defer_profile(self._read_profile)
+        self._scan_delta[0].extend(added)
+        self._scan_delta[1].extend(changed)
+        if time.time() - self._scan_delta_time >= PARTIAL_SCAN_INTERVAL:
+            self._on_main_loop(self._publish_scan, self._scan_delta[0], [],
+                               self._scan_delta[1])
+            self._scan_delta = ([], [])
+            self._scan_delta_time = time.time()
 
     @dbus.service.method('org.wicd.daemon.wireless')
     def GetIwconfig(self):
@@ -1023,6 +1574,14 @@ class WirelessDaemon(dbus.service.Object, object):
         """ Returns number of networks. """
         return len(self.LastScan)
 
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetNetworkIDForBSSID(self, bssid):
+        """ Returns the id of the network with the given BSSID, or -1. """
+        for x, network in enumerate(self.LastScan):
+            if network['bssid'] == bssid:
+                return x
+        return -1
+
     @dbus.service.method('org.wicd.daemon.wireless')
     def GetApBssid(self):
         """ Gets the MAC address for the active network. """
@@ -1091,6 +1650,28 @@ class WirelessDaemon(dbus.service.Object, object):
         value = misc.to_unicode(value)
         return value
 
+    @dbus.service.method('org.wicd.daemon.wireless', in_signature='as')
+    def GetNetworksBulk(self, props):
+        """ Retrieves the given properties of every network in one call.
+
+        Keyword arguments:
+        props -- list of the names of the properties to fetch
+
+        Returns:
+        An array holding a struct for every network, in network id
+        order.  Every struct holds the values of props in the given
+        order, with the properties a network lacks set to "".
+
+        """
+        if not props:
+            raise ValueError('no properties given')
+        signature = 'v' * len(props)
+        networks = dbus.Array(signature='(%s)' % signature)
+        for network in self.LastScan:
+            values = [_bulk_value(network.get(prop)) for prop in props]
+            networks.append(dbus.Struct(values, signature=signature))
+        return networks
+
     @dbus.service.method('org.wicd.daemon.wireless')
     def SetWirelessProperty(self, netid, prop, value):
         """ Sets property to value in network specified. """
@@ -1178,6 +1759,40 @@ class WirelessDaemon(dbus.service.Object, object):
     @dbus.service.method('org.wicd.daemon.wireless')
     def ConnectWireless(self, nid):
         """ Connects the the wireless network specified by i"""
+        self._prepare_connect(nid)
+        print('Connecting to wireless network ' + \
+            str(self.LastScan[nid]['essid']))
+        # disconnect to make sure that scripts are run
+        self.wifi.Disconnect()
+        self.daemon.wired_bus.wired.Disconnect()
+        self.daemon.SetForcedDisconnect(False)
+        self.wifi.Connect(self.LastScan[nid], debug=self.debug_mode)
+        self.daemon.UpdateState()
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def ResumeWireless(self, nid):
+        """ Reconnects to a wireless network the connection was lost to.
+
+        If nid is the access point connected to last, the connection
+        is resumed without tearing down its address, routes and DNS
+        servers, and only made from scratch if that fails.  Otherwise
+        this is ConnectWireless().
+
+        """
+        last = self.wifi.connecting_thread
+        if (not last or last.connect_result != 'success' or
+            last.network.get('bssid') != self.LastScan[nid].get('bssid')):
+            return self.ConnectWireless(nid)
+        self._prepare_connect(nid)
+        print('Resuming connection to wireless network ' + \
+            str(self.LastScan[nid]['essid']))
+        self.daemon.SetForcedDisconnect(False)
+        self.wifi.Connect(self.LastScan[nid], debug=self.debug_mode,
+                          resume=True)
+        self.daemon.UpdateState()
+
+    def _prepare_connect(self, nid):
+        """ Save the profile of a network and load its scripts. """
         self.SaveWirelessNetworkProfile(nid)
         # Will returned instantly, that way we don't hold up dbus.
         # CheckIfWirelessConnecting can be used to test if the connection
@@ -1191,14 +1806,6 @@ class WirelessDaemon(dbus.service.Object, object):
         self.wifi.bitrate = self.GetWirelessProperty(nid, 'bitrate')
         self.wifi.allow_lower_bitrates = self.GetWirelessProperty(nid,
                                                         'allow_lower_bitrates')
-        print('Connecting to wireless network ' + \
-            str(self.LastScan[nid]['essid']))
-        # disconnect to make sure that scripts are run
-        self.wifi.Disconnect()
-        self.daemon.wired_bus.wired.Disconnect()
-        self.daemon.SetForcedDisconnect(False)
-        self.wifi.Connect(self.LastScan[nid], debug=self.debug_mode)
-        self.daemon.UpdateState()
 
     @dbus.service.method('org.wicd.daemon.wireless')
     def CheckIfWirelessConnecting(self):
@@ -1235,20 +1842,18 @@ class WirelessDaemon(dbus.service.Object, object):
     @dbus.service.method('org.wicd.daemon.wireless')
     def ReadWirelessNetworkProfile(self, nid):
         """ Reads in wireless profile as the active network """
-        cur_network = self.LastScan[nid]
-        essid_key = "essid:%s" % cur_network["essid"]
-        bssid_key = cur_network["bssid"]
+        return self._read_profile(self.LastScan[nid])
 
-        if self.config.get(essid_key, 'use_settings_globally'):
-            section = essid_key
-        elif self.config.has_section(bssid_key):
-            section = bssid_key
-        else:
+    def _read_profile(self, cur_network):
+        """ Merges the saved profile settings into a network. """
+        profile = self.profiles.lookup(cur_network["essid"],
+                                       cur_network["bssid"])
+        if profile is None:
             return "500: Profile Not Found"
 
-        for x in self.config.options(section):
+        for x, value in profile.items():
             if x not in cur_network or x.endswith("script"):
-                cur_network[x] = misc.Noneify(self.config.get(section, x))
+                cur_network[x] = value
         for option in ['use_static_dns', 'use_global_dns', 'encryption',
                        'use_settings_globally']:
             cur_network[option] = bool(cur_network.get(option))
@@ -1256,8 +1861,7 @@ class WirelessDaemon(dbus.service.Object, object):
         # wireless networks now - but only read it if it is hidden.
         if cur_network["hidden"]:
             # check if there is an essid in the config file
-            # if there isn't, .get( will return None
-            stored_essid = self.config.get(section, 'essid')
+            stored_essid = profile.get('essid')
             if stored_essid:
                 # set the current network's ESSID to the stored one
                 cur_network['essid'] = stored_essid
@@ -1284,7 +1888,8 @@ class WirelessDaemon(dbus.service.Object, object):
 
         for x in cur_network:
             # There's no reason to save these to a configfile...
-            if x not in ['quality', 'strength', 'bitrates', 'has_profile']:
+            if x not in ['quality', 'strength', 'bitrates', 'has_profile',
+                         'first_seen', 'last_seen']:
                 self.config.set(bssid_key, x, cur_network[x])
                 if cur_network.get("use_settings_globally", False):
                     self.config.set(essid_key, x, cur_network[x])
@@ -1334,8 +1939,9 @@ class WirelessDaemon(dbus.service.Object, object):
 
     @dbus.service.method('org.wicd.daemon.wireless')
     def ReloadConfig(self):
-        """ Reloads the active config file. """
+        """ Reloads the active config file and probes the tools again. """
         self.config.reload()
+        self.daemon.ReprobeCapabilities()
 
     @dbus.service.method('org.wicd.daemon.wireless', out_signature='as')
     def GetWirelessInterfaces(self):
@@ -1367,13 +1973,24 @@ class WirelessDaemon(dbus.service.Object, object):
         signature='')
     def SendStartScanSignal(self):
         """ Emits a signal announcing a scan has started. """
-        self._scanning = True
+        pass
 
     @dbus.service.signal(dbus_interface='org.wicd.daemon.wireless', \
         signature='')
     def SendEndScanSignal(self):
         """ Emits a signal announcing a scan has finished. """
-        self._scanning = False
+        pass
+
+    @dbus.service.signal(dbus_interface='org.wicd.daemon.wireless', \
+        signature='asasas')
+    def SendScanDeltaSignal(self, added, removed, changed):
+        """ Emits a signal listing the BSSIDs a scan added, removed or changed.
+
+        Sent right before SendEndScanSignal, so clients can update
+        only those networks, looking them up with GetNetworkIDForBSSID.
+
+        """
+        pass
 
     def _wireless_autoconnect(self, fresh=True):
         """ Attempts to autoconnect to a wireless network. """
@@ -1382,10 +1999,18 @@ class WirelessDaemon(dbus.service.Object, object):
         if self.wifi.wireless_interface is None:
             print('Autoconnect failed because wireless interface returned None')
             return
-        if fresh:
-            self.Scan(sync=True)
+        if self.scan_stale:
+            # The networks of the last run are most likely still
+            # around, so try them while the first scan runs.
+            self.Scan()
+        else:
+            # Without a fresh scan, the kernel's scan cache still gives
+            # more recent results than our last scan, at little cost.
+            self.Scan(sync=True, cached=not fresh)
 
-        for x, network in enumerate(self.LastScan):
+        # LastScan is in the order networks were first seen, so try
+        # the best ones first.
+        for x, network in strongest_first(self.LastScan):
             if self.config.has_section(network['bssid']):
                 if self.debug_mode:
                     print(network["essid"] + ' has profile')
@@ -1670,8 +2295,9 @@ class WiredDaemon(dbus.service.Object, object):
 
     @dbus.service.method('org.wicd.daemon.wired')
     def ReloadConfig(self):
-        """ Reloads the active config file. """
+        """ Reloads the active config file and probes the tools again. """
         self.config.reload()
+        self.daemon.ReprobeCapabilities()
 
     @dbus.service.method('org.wicd.daemon.wired', out_signature='as')
     def GetWiredInterfaces(self):
@@ -1679,10 +2305,23 @@ class WiredDaemon(dbus.service.Object, object):
         return wnettools.GetWiredInterfaces()
 
 
-def spawn_monitor():
-    if not wicd.commandline.get_args().monitor_status:
+def spawn_monitor(the_daemon):
+    """ Starts the connection monitor.
+
+    The monitor runs on the daemon's main loop, unless it was asked to
+    run as a separate process talking to the daemon over D-Bus.
+
+    """
+    args = wicd.commandline.get_args()
+    if not args.monitor_status:
         return
 
+    if not args.monitor_process:
+        from wicd.daemon import monitor
+        return monitor.start(the_daemon, the_daemon.wired_bus,
+                             the_daemon.wireless_bus,
+                             the_daemon.monitor_timings)
+
     cmd = [sys.executable, "-m", "wicd.daemon.monitor"]
 
     if wicd.dbus.dbus_manager.bus._bus_type == wicd.dbus.dbus_manager.bus.TYPE_SESSION:
@@ -1702,12 +2341,18 @@ def daemon_main():
 
     print('wicd is version', wicd.pkg_helpers.get_version())
 
+    # The commands we run start from the root directory, and can be
+    # started faster from there.
+    os.chdir(runner.CWD)
+
     # Open the DBUS session
     bus = wicd.commandline.get_args().DBus()
     wicd_bus = dbus.service.BusName('org.wicd.daemon', bus=bus)
     the_daemon = WicdDaemon(wicd_bus, wicd.commandline.get_args())
+    signal.signal(signal.SIGUSR1, the_daemon.DumpMonitorTimings)
+    signal.signal(signal.SIGHUP, the_daemon.PackagesChanged)
 
-    spawn_monitor()
+    the_monitor = spawn_monitor(the_daemon)
 
     # Enter the main loop
     mainloop = gobject.MainLoop()
@@ -1769,6 +2414,9 @@ def main():
     parser.add_argument('-n', '--no-poll', dest='monitor_status', action='store_false', default=True,
                         help=u"Don't monitor network status")
 
+    parser.add_argument('-m', '--monitor-process', dest='monitor_process', action='store_true', default=False,
+                        help=u"Monitor network status from a separate process")
+
     parser.add_argument('-e', '--no-stderr', dest='redirect_stderr', action='store_false', default=True,
                         help=u"Don't redirect stderr")
 
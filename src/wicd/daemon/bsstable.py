@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd wireless scan table
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Persistent table of the BSSes found by wireless scans.
+
+The table is shared by the scan thread and the main loop, so it is
+locked.
+
+class BssTable() -- Scan results keyed by BSSID, aged out over time.
+
+"""
+
+import threading
+import time
+from bisect import bisect_right
+
+from wicd.daemon.signalfilter import QUALITY_BUCKETS, DBM_BUCKETS
+
+# The fields filled in by the scan itself.  Profile settings merged
+# into a network later on don't make a BSS count as changed.  The
+# signal jitters from scan to scan, so it only counts as changed when
+# it shows another signal icon.
+SCAN_FIELDS = ('essid', 'hidden', 'channel', 'bitrates', 'mode',
+               'encryption', 'encryption_method')
+
+
+def signal_buckets(network):
+    """ Returns the signal icons of the quality and strength of network. """
+    buckets = []
+    for field, bounds in (('quality', QUALITY_BUCKETS),
+                          ('strength', DBM_BUCKETS)):
+        try:
+            value = float(network.get(field))
+        except (TypeError, ValueError):
+            value = None
+        # A strength of -1 and a quality of 101 mean unknown.
+        if value is None or value in (-1, 101):
+            buckets.append(None)
+        else:
+            buckets.append(bisect_right(bounds, value))
+    return tuple(buckets)
+
+
+class BssEntry(object):
+    """ A network in the table and the scan data it was last seen with. """
+    __slots__ = ('network', 'fields')
+
+    def __init__(self, network):
+        self.network = network
+        self.fields = (tuple(network.get(field) for field in SCAN_FIELDS) +
+                       signal_buckets(network))
+
+
+class BssTable(object):
+    """ Scan results keyed by BSSID.
+
+    Networks keep their position in the table for as long as they are
+    seen, so network ids of the table stay valid across scans.  A BSS
+    missing from a scan is kept until it hasn't been seen for max_age
+    seconds.  clear() starts a new generation; networks of a scan of
+    an older one, found on another interface, aren't merged.
+
+    """
+    def __init__(self, max_age=0):
+        """ Initialize the table.
+
+        Keyword arguments:
+        max_age -- seconds to keep a BSS that is missing from scans
+
+        """
+        self.max_age = max_age
+        self.entries = {}
+        self.generation = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self.entries)
+
+    def __contains__(self, bssid):
+        with self._lock:
+            return bssid in self.entries
+
+    def update(self, networks, now=None):
+        """ Merge the results of a scan into the table.
+
+        Keyword arguments:
+        networks -- list of network dicts as returned by a scan
+        now -- the time of the scan, defaults to the current time
+
+        Returns:
+        A tuple of lists of the added, removed and changed BSSIDs.
+
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            added, changed = self.merge(networks, now)
+            return added, self.expire(now), changed
+
+    def merge(self, networks, now=None, generation=None):
+        """ Add or refresh networks without aging out any others.
+
+        Every network gets the time it was first and last seen stored
+        in its 'first_seen' and 'last_seen' keys.
+
+        Keyword arguments:
+        networks -- list of network dicts found by a scan
+        now -- the time they were found, defaults to the current time
+        generation -- the generation the scan started in, the current
+                      one if None
+
+        Returns:
+        A tuple of lists of the added and changed BSSIDs, empty if the
+        table was cleared since the scan started.
+
+        """
+        if now is None:
+            now = time.time()
+        added = []
+        changed = []
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return added, changed
+            entries = self.entries
+            for network in networks:
+                bssid = network['bssid']
+                entry = BssEntry(network)
+                old = entries.get(bssid)
+                if old is None:
+                    network['first_seen'] = now
+                    added.append(bssid)
+                else:
+                    network['first_seen'] = old.network['first_seen']
+                    if old.fields != entry.fields:
+                        changed.append(bssid)
+                network['last_seen'] = now
+                entries[bssid] = entry
+        return added, changed
+
+    def restore(self, networks):
+        """ Add networks that already carry their seen times.
+
+        Used for networks of an earlier run of the daemon, which age
+        out as usual unless a scan finds them again.
+
+        Keyword arguments:
+        networks -- list of networks with 'first_seen' and 'last_seen'
+
+        """
+        with self._lock:
+            for network in networks:
+                if 'first_seen' in network and 'last_seen' in network:
+                    self.entries[network['bssid']] = BssEntry(network)
+
+    def expire(self, now=None):
+        """ Remove the networks not seen for more than max_age seconds.
+
+        Returns:
+        A list of the removed BSSIDs.
+
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            removed = [bssid for bssid, entry in self.entries.items()
+                       if now - entry.network['last_seen'] > self.max_age]
+            for bssid in removed:
+                del self.entries[bssid]
+        return removed
+
+    def networks(self):
+        """ Returns the networks in the table, in table order. """
+        with self._lock:
+            return [entry.network for entry in self.entries.values()]
+
+    def clear(self):
+        """ Forget all networks and start a new generation. """
+        with self._lock:
+            self.entries.clear()
+            self.generation += 1
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd rtnetlink link watcher
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Watches rtnetlink for link, address and route changes.
+
+class LinkWatcher() -- Calls back when the kernel reports a change.
+
+"""
+
+import errno
+
+from gi.repository import GLib as gobject
+
+from wicd import netlink
+
+RTNL_GROUPS = (netlink.RTMGRP_LINK | netlink.RTMGRP_IPV4_IFADDR |
+               netlink.RTMGRP_IPV4_ROUTE)
+
+RTNL_EVENTS = frozenset([netlink.RTM_NEWLINK, netlink.RTM_DELLINK,
+                         netlink.RTM_NEWADDR, netlink.RTM_DELADDR,
+                         netlink.RTM_NEWROUTE, netlink.RTM_DELROUTE])
+
+# Milliseconds to wait for the rest of a burst of events, eg. a link
+# going down takes its addresses and routes with it.
+SETTLE_TIME = 200
+
+
+class LinkWatcher(object):
+    """ Calls back when a link, an address or a route changes.
+
+    The rtnetlink socket is watched from the GLib main loop.  A burst
+    of events results in a single callback once it has settled.
+
+    """
+    def __init__(self, callback, sock=None):
+        """ Initialize the watcher.
+
+        Keyword arguments:
+        callback -- function called without arguments on changes
+        sock -- the NetlinkSocket to read, by default a new one
+                subscribed to the link, address and route groups
+
+        """
+        if sock is None:
+            sock = netlink.NetlinkSocket(netlink.NETLINK_ROUTE, RTNL_GROUPS)
+        sock.setblocking(False)
+        self.sock = sock
+        self.callback = callback
+        self.watch_id = None
+        self.settle_id = None
+
+    def handle_events(self):
+        """ Read every pending datagram.
+
+        Returns:
+        True if any of them reported a change, False otherwise.
+
+        """
+        changed = False
+        while True:
+            try:
+                messages = self.sock.recv()
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # Events were dropped, so assume the worst.
+                changed = True
+                continue
+            for msg_type, _, _, _ in messages:
+                if msg_type in RTNL_EVENTS:
+                    changed = True
+        return changed
+
+    def start(self):
+        """ Start watching the socket from the main loop. """
+        self.watch_id = gobject.io_add_watch(self.sock.fileno(),
+                                             gobject.IO_IN, self._on_readable)
+
+    def _on_readable(self, fd, condition):
+        """ Read the events and schedule the callback if needed. """
+        if self.handle_events() and self.settle_id is None:
+            self.settle_id = gobject.timeout_add(SETTLE_TIME, self._settled)
+        return True
+
+    def _settled(self):
+        """ Run the callback once the events have settled. """
+        self.settle_id = None
+        self.callback()
+        return False
+
+    def close(self):
+        """ Stop watching and close the socket. """
+        if self.watch_id is not None:
+            gobject.source_remove(self.watch_id)
+            self.watch_id = None
+        if self.settle_id is not None:
+            gobject.source_remove(self.settle_id)
+            self.settle_id = None
+        self.sock.close()
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
-""" monitor -- connection monitoring process
+""" monitor -- connection monitoring
 
-This process is spawned as a child of the daemon, and is responsible
-for monitoring connection status and initiating autoreconnection
-when appropriate.
+Monitors the connection status and initiates autoreconnection when
+appropriate.  The monitor runs on the daemon's main loop, calling the
+daemon objects directly, or is spawned as a child process of the daemon
+talking to it over D-Bus.
 
 """
 #
@@ -25,24 +26,22 @@ when appropriate.
 #
 
 from gi.repository import GLib as gobject
+import signal
 import time
 
 from dbus import DBusException
 
 from wicd import wpath
 from wicd import misc
+from wicd.daemon.linkwatch import LinkWatcher
+from wicd.daemon.pollbackoff import PollBackoff
+from wicd.daemon.timings import PhaseTimings
 
 import wicd.dbus
 
-misc.RenameProcess("wicd-monitor")
-
 if __name__ == '__main__':
     wpath.chdir(__file__)
 
-daemon   = wicd.dbus.dbus_manager.ifaces["daemon"]
-wired    = wicd.dbus.dbus_manager.ifaces["wired"]
-wireless = wicd.dbus.dbus_manager.ifaces["wireless"]
-
 mainloop = None
 
 def diewithdbus(func):
@@ -58,7 +57,7 @@ def diewithdbus(func):
             print(("Caught exception %s" % str(e)))
             if not hasattr(self, "__lost_dbus_count"):
                 self.__lost_dbus_count = 0
-            if self.__lost_dbus_count > 3:
+            if self.__lost_dbus_count > 3 and mainloop is not None:
                 mainloop.quit()
             self.__lost_dbus_count += 1
             return True
@@ -70,8 +69,25 @@ def diewithdbus(func):
 
 class ConnectionStatus(object):
     """ Class for monitoring the computer's connection status. """
-    def __init__(self):
-        """ Initialize variables needed for the connection status methods. """
+    def __init__(self, daemon, wired, wireless, in_process=False,
+                 timings=None):
+        """ Initialize variables needed for the connection status methods.
+
+        Keyword arguments:
+        daemon -- the daemon interface, or the WicdDaemon itself
+        wired -- the wired interface, or the WiredDaemon itself
+        wireless -- the wireless interface, or the WirelessDaemon itself
+        in_process -- True if the daemon objects are called directly
+        timings -- the PhaseTimings to record the tick phases in
+
+        """
+        self.daemon = daemon
+        self.wired = wired
+        self.wireless = wireless
+        self.in_process = in_process
+        if timings is None:
+            timings = PhaseTimings()
+        self.timings = timings
         self.last_strength = -2
         self.last_state = misc.NOT_CONNECTED
         self.last_reconnect_time = time.time()
@@ -83,13 +99,25 @@ class ConnectionStatus(object):
         self.connection_lost_counter = 0
         self.reconnecting = False
         self.reconnect_tries = 0
+        # The network id and BSSID of the wireless connection, to
+        # resume it once it is lost, and whether that was started.
+        self.wireless_network = (-1, '')
+        self.resuming = False
         self.signal_changed = False
-        self.iwconfig = ""
+        self.state_changed = False
         self.trigger_reconnect = False
         self.__lost_dbus_count = 0
-        self._to_time = daemon.GetBackendUpdateInterval()
+        self._to_time = self.daemon.GetBackendUpdateInterval()
+        self.poll = PollBackoff(self._to_time, self._to_time)
         self.update_callback = None
-        
+        try:
+            self.link_watcher = LinkWatcher(
+                self._force_update_connection_status)
+            self.link_watcher.start()
+        except OSError as e:
+            print(('Could not watch rtnetlink, polling instead: %s' % e))
+            self.link_watcher = None
+
         self.add_poll_callback()
         bus = wicd.dbus.dbus_manager.bus
         bus.add_signal_receiver(self._force_update_connection_status, 
@@ -112,19 +140,56 @@ class ConnectionStatus(object):
 
         """
         gobject.source_remove(self.update_callback)
-        self.update_connection_status()
-        self.add_poll_callback()
+        try:
+            self._tick()
+        finally:
+            self.poll.reset()
+            self.add_poll_callback()
         
     def add_poll_callback(self):
-        """ Registers a polling call at a predetermined interval.
+        """ Registers a polling call at the current interval.
         
-        The polling interval is determined by the backend in use.
+        The interval backs off while nothing changes, between the
+        bounds set in the daemon's configuration.
         
         """
-        self.update_callback = misc.timeout_add(self._to_time,
-                                                self.update_connection_status)
+        self._poll_time = self.poll.interval
+        self.update_callback = misc.timeout_add(int(self._poll_time * 1000),
+                                                self._poll, milli=True)
+
+    def _tick(self):
+        """ Run an update, logging the errors it raises. """
+        try:
+            with self.timings.time('tick'):
+                self.update_connection_status()
+        except Exception as e:
+            # Keep polling; in the daemon's process nothing turns errors
+            # into the DBusExceptions diewithdbus handles.
+            print(('Updating the connection status failed: %s' % e))
+
+    def _poll(self):
+        """ Run a scheduled update, rescheduling if the interval changed. """
+        self._tick()
+        if self.state_changed or self.last_state == misc.CONNECTING:
+            self.poll.reset()
+        else:
+            self.poll.stable()
+        if self.poll.interval != self._poll_time:
+            self.add_poll_callback()
+            return False
+        return True
+
+    def _configure_poll(self, snapshot):
+        """ Apply the poll interval bounds of the daemon's settings. """
+        maximum = snapshot['poll_max']
+        if self.link_watcher is None:
+            # Without events only polling notices a lost link, so
+            # don't wait longer than the backend suggests.
+            maximum = min(maximum, self._to_time)
+        self.poll.configure(snapshot['poll_min'], maximum,
+                            snapshot['poll_backoff'])
     
-    def check_for_wired_connection(self, wired_ip):
+    def check_for_wired_connection(self, snapshot):
         """ Checks for a wired connection.
 
         Checks for two states:
@@ -137,25 +202,26 @@ class ConnectionStatus(object):
 
         """
         self.trigger_reconnect = False
-        if not wired_ip and daemon.GetPreferWiredNetwork():
-            if not daemon.GetForcedDisconnect() and wired.CheckPluggedIn():
+        wired_ip = snapshot['wired_ip']
+        if not wired_ip and snapshot['prefer_wired']:
+            if not snapshot['forced_disconnect'] and snapshot['plugged_in']:
                 self.trigger_reconnect = True
 
-        elif wired_ip and wired.CheckPluggedIn():
+        elif wired_ip and snapshot['plugged_in']:
             # Only change the interface if it's not already set for wired
             if not self.still_wired:
-                daemon.SetCurrentInterface(daemon.GetWiredInterface())
+                self.daemon.SetCurrentInterface(snapshot['wired_interface'])
                 self.still_wired = True
             return True
         # Wired connection isn't active
         elif wired_ip and self.still_wired:
             # If we still have an IP, but no cable is plugged in 
             # we should disconnect to clear it.
-            wired.DisconnectWired()
+            self.wired.DisconnectWired()
         self.still_wired = False
         return False
 
-    def check_for_wireless_connection(self, wireless_ip):
+    def check_for_wireless_connection(self, snapshot):
         """ Checks for an active wireless connection.
 
         Checks for an active wireless connection.  Also notes
@@ -168,39 +234,37 @@ class ConnectionStatus(object):
         """
 
         # Make sure we have an IP before we do anything else.
-        if not wireless_ip:
+        if not snapshot['wireless_ip']:
             return False
 
-        if daemon.NeedsExternalCalls():
-            self.iwconfig = wireless.GetIwconfig()
-        else:
-            self.iwconfig = ''
         # Reset this, just in case.
         self.tried_reconnect = False
-        bssid = wireless.GetApBssid()
-        if not bssid:
+        if not snapshot['bssid']:
             return False
 
-        wifi_signal = self._get_printable_sig_strength(always_positive=True)
+        wifi_signal = self._get_printable_sig_strength(snapshot,
+                                                       always_positive=True)
         if wifi_signal <= 0:
             # If we have no signal, increment connection loss counter.
             # If we haven't gotten any signal 4 runs in a row (12 seconds),
             # try to reconnect.
             self.connection_lost_counter += 1
             print((self.connection_lost_counter))
-            if self.connection_lost_counter >= 4 and daemon.GetAutoReconnect():
-                wireless.DisconnectWireless()
+            if (self.connection_lost_counter >= 4 and
+                snapshot['auto_reconnect']):
+                self.wireless.DisconnectWireless()
                 self.connection_lost_counter = 0
                 return False
         else:  # If we have a signal, reset the counter
             self.connection_lost_counter = 0
 
-        if (wifi_signal != self.last_strength or
+        # The daemon smooths the signal it announces.
+        if (snapshot['signal'] != self.last_strength or
             self.network != self.last_network):
-            self.last_strength = wifi_signal
+            self.last_strength = snapshot['signal']
             self.last_network = self.network
             self.signal_changed = True
-            daemon.SetCurrentInterface(daemon.GetWirelessInterface())    
+            self.daemon.SetCurrentInterface(snapshot['wireless_interface'])
 
         return True
 
@@ -213,32 +277,31 @@ class ConnectionStatus(object):
         reconnection process if necessary.
 
         """
-        wired_ip = None
-        wifi_ip = None
+        with self.timings.time('snapshot'):
+            snapshot = self.daemon.GetMonitorSnapshot()
+        self._configure_poll(snapshot)
 
-        if daemon.GetSuspend():
+        if snapshot['suspended']:
             print("Suspended.")
             state = misc.SUSPENDED
-            return self.update_state(state)
+            return self.update_state(state, snapshot)
 
         # Determine what our current state is.
         # Are we currently connecting?
-        if daemon.CheckIfConnecting():
+        if snapshot['connecting']:
             state = misc.CONNECTING
-            return self.update_state(state)
+            return self.update_state(state, snapshot)
 
-        daemon.SendConnectResultsIfAvail()
+        self.daemon.SendConnectResultsIfAvail()
 
         # Check for wired.
-        wired_ip = wired.GetWiredIP("")
-        wired_found = self.check_for_wired_connection(wired_ip)
+        wired_found = self.check_for_wired_connection(snapshot)
         if wired_found:
-            return self.update_state(misc.WIRED, wired_ip=wired_ip)
+            return self.update_state(misc.WIRED, snapshot)
 
         # Check for wireless
-        wifi_ip = wireless.GetWirelessIP("")
         self.signal_changed = False
-        wireless_found = self.check_for_wireless_connection(wifi_ip)
+        wireless_found = self.check_for_wireless_connection(snapshot)
         if wireless_found:
             if self.trigger_reconnect:
                 # If we made it here, that means we want to switch
@@ -249,74 +312,80 @@ class ConnectionStatus(object):
 
                 # Don't trigger it if the gui is open, because autoconnect
                 # is disabled while it's open.
-                if not daemon.GetGUIOpen():
+                if not snapshot['gui_open']:
                     print('Killing wireless connection to switch to wired...')
-                    wireless.DisconnectWireless()
-                    daemon.AutoConnect(False, reply_handler=lambda *a:None,
-                                       error_handler=lambda *a:None)
-                    return self.update_state(misc.NOT_CONNECTED)
-            return self.update_state(misc.WIRELESS, wifi_ip=wifi_ip)
+                    self.wireless.DisconnectWireless()
+                    self._auto_connect(False)
+                    return self.update_state(misc.NOT_CONNECTED, snapshot)
+            self.wireless_network = (snapshot['network_id'], snapshot['bssid'])
+            return self.update_state(misc.WIRELESS, snapshot)
 
         state = misc.NOT_CONNECTED
-        if self.last_state == misc.WIRELESS:
-            from_wireless = True
-        else:
-            from_wireless = False
-            self.auto_reconnect(from_wireless)
-        return self.update_state(state)
+        self.auto_reconnect(self.last_state == misc.WIRELESS)
+        return self.update_state(state, snapshot)
+
+    def update_state(self, state, snapshot):
+        """ Set the current connection state.
+
+        Keyword arguments:
+        state -- the new connection state
+        snapshot -- the dict returned by GetMonitorSnapshot()
+
+        """
+        with self.timings.time('publish'):
+            return self._publish_state(state, snapshot)
 
-    def update_state(self, state, wired_ip=None, wifi_ip=None):
-        """ Set the current connection state. """
+    def _publish_state(self, state, snapshot):
+        """ Tell the daemon about the state, announcing changes. """
         # Set our connection state/info.
-        iwconfig = self.iwconfig
         if state == misc.NOT_CONNECTED:
             info = [""]
         elif state == misc.SUSPENDED:
             info = [""]
         elif state == misc.CONNECTING:
-            if wired.CheckIfWiredConnecting():
+            if snapshot['wired_connecting']:
                 info = ["wired"]
             else:
-                info = ["wireless",
-                  misc.noneToBlankString(wireless.GetCurrentNetwork(iwconfig))]
+                info = ["wireless", str(snapshot['essid'])]
         elif state == misc.WIRELESS:
             self.reconnect_tries = 0
-            info = [str(wifi_ip),
-                misc.noneToBlankString(wireless.GetCurrentNetwork(iwconfig)),
-                str(self._get_printable_sig_strength()),
-                str(wireless.GetCurrentNetworkID(iwconfig)),
-                misc.noneToBlankString(wireless.GetCurrentBitrate(iwconfig))]
+            info = [str(snapshot['wireless_ip']), str(snapshot['essid']),
+                    str(snapshot['signal']),
+                    str(snapshot['network_id']), str(snapshot['bitrate'])]
         elif state == misc.WIRED:
             self.reconnect_tries = 0
-            info = [str(wired_ip)]
+            info = [str(snapshot['wired_ip'])]
         else:
             print('ERROR: Invalid state!')
             return True
 
-        daemon.SetConnectionStatus(state, info)
+        self.daemon.SetConnectionStatus(state, info)
 
         # Send a D-Bus signal announcing status has changed if necessary.
-        if (state != self.last_state or (state == misc.WIRELESS and 
-                                         self.signal_changed)):
-            daemon.EmitStatusChanged(state, info)
+        self.state_changed = (state != self.last_state or
+                              (state == misc.WIRELESS and self.signal_changed))
+        if self.state_changed:
+            self.daemon.EmitStatusChanged(state, info)
 
+        # A resumed connection keeps its address, routes and DNS
+        # servers; it tears them down itself if resuming fails.
         if (state != self.last_state) and (state == misc.NOT_CONNECTED) and \
-            (not daemon.GetForcedDisconnect()):
-            daemon.Disconnect()
+            (not self.resuming) and (not self.daemon.GetForcedDisconnect()):
+            self.daemon.Disconnect()
             # Disconnect() sets forced disconnect = True
             # so we'll revert that
-            daemon.SetForcedDisconnect(False)
+            self.daemon.SetForcedDisconnect(False)
+        self.resuming = False
         self.last_state = state
         return True
 
-    def _get_printable_sig_strength(self, always_positive=False):
+    def _get_printable_sig_strength(self, snapshot, always_positive=False):
         """ Get the correct signal strength format. """
         try:
-            if daemon.GetSignalDisplayType() == 0:
-                signal = wireless.GetCurrentSignalStrength(self.iwconfig)
-                wifi_signal = int(signal)
+            if snapshot['signal_display_type'] == 0:
+                wifi_signal = int(snapshot['quality'])
             else:
-                signal = wireless.GetCurrentDBMStrength(self.iwconfig)
+                signal = snapshot['dbm']
                 if always_positive:
                     # because dBm is negative, add 99 to the signal. This way,
                     # if the signal drops below -99, wifi_signal will == 0, and
@@ -348,29 +417,42 @@ class ConnectionStatus(object):
             return
 
         self.reconnecting = True
-        daemon.SetCurrentInterface('')
+        self.daemon.SetCurrentInterface('')
 
-        if daemon.ShouldAutoReconnect():
+        if self.daemon.ShouldAutoReconnect():
             print('Starting automatic reconnect process')
             self.last_reconnect_time = time.time()
             self.reconnect_tries += 1
 
             # If we just lost a wireless connection, try to connect to that
-            # network again.  Otherwise just call Autoconnect.
-            cur_net_id = wireless.GetCurrentNetworkID(self.iwconfig)
+            # network again.  Otherwise just call Autoconnect.  The link
+            # is gone, so look the network up by the BSSID it had.
+            cur_net_id, bssid = self.wireless_network
+            if from_wireless and bssid:
+                found = self.wireless.GetNetworkIDForBSSID(bssid)
+                if found > -1:
+                    cur_net_id = found
             if from_wireless and cur_net_id > -1:
-                # make sure disconnect scripts are run
-                # before we reconnect
-                print('Disconnecting from network')
-                wireless.DisconnectWireless()
+                # Rejoining the access point we dropped from keeps the
+                # connection; the disconnect scripts only run if that
+                # fails and it is made from scratch.
                 print(('Trying to reconnect to last used wireless ' + \
                       'network'))
-                wireless.ConnectWireless(cur_net_id)
+                self.wireless.ResumeWireless(cur_net_id)
+                self.resuming = True
             else:
-                daemon.AutoConnect(True, reply_handler=reply_handle,
-                                   error_handler=err_handle)
+                self._auto_connect(True)
         self.reconnecting = False
 
+    def _auto_connect(self, fresh):
+        """ Start an autoconnect without waiting for it to finish. """
+        if self.in_process:
+            # Run it from the main loop once this update is done.
+            gobject.idle_add(self.daemon.AutoConnect, fresh)
+        else:
+            self.daemon.AutoConnect(fresh, reply_handler=reply_handle,
+                                    error_handler=err_handle)
+
 def reply_handle():
     """ Just a dummy function needed for asynchronous dbus calls. """
     pass
@@ -379,15 +461,36 @@ def err_handle(error):
     """ Just a dummy function needed for asynchronous dbus calls. """
     pass
 
+def start(daemon, wired, wireless, timings=None):
+    """ Starts the connection monitor on the daemon's main loop.
+
+    Keyword arguments:
+    daemon -- the WicdDaemon
+    wired -- the WiredDaemon
+    wireless -- the WirelessDaemon
+    timings -- the PhaseTimings to record the tick phases in
+
+    Returns:
+    The ConnectionStatus instance.
+
+    """
+    return ConnectionStatus(daemon, wired, wireless, in_process=True,
+                            timings=timings)
+
 def main():
-    """ Starts the connection monitor. 
+    """ Starts the connection monitor process. 
 
     Starts a ConnectionStatus instance, sets the status to update
     an amount of time determined by the active backend.
 
     """
     global mainloop
-    monitor = ConnectionStatus()
+    misc.RenameProcess("wicd-monitor")
+    ifaces = wicd.dbus.dbus_manager.ifaces
+    monitor = ConnectionStatus(ifaces["daemon"], ifaces["wired"],
+                               ifaces["wireless"])
+    signal.signal(signal.SIGUSR1,
+                  lambda *args: print(monitor.timings.format()))
     mainloop = gobject.MainLoop()
     mainloop.run()
 
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd monitor poll backoff
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Adapts the connection monitor's poll interval to how things change.
+
+class PollBackoff() -- Exponential backoff of a poll interval.
+
+"""
+
+
+class PollBackoff(object):
+    """ Exponential backoff of the connection monitor's poll interval.
+
+    The interval grows by factor after every poll that found nothing
+    changed, up to maximum, and drops back to minimum on a change.
+
+    """
+    def __init__(self, minimum, maximum, factor=2.0):
+        """ Initialize the backoff at its minimum interval.
+
+        Keyword arguments:
+        minimum -- the shortest interval in seconds
+        maximum -- the longest interval in seconds
+        factor -- what the interval is multiplied by when stable
+
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.interval = minimum
+
+    def configure(self, minimum, maximum, factor):
+        """ Change the bounds, keeping the interval within them. """
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.factor = max(1.0, factor)
+        self.interval = min(max(self.interval, self.minimum), self.maximum)
+
+    def reset(self):
+        """ Poll at the minimum interval again.
+
+        Returns:
+        The interval.
+
+        """
+        self.interval = self.minimum
+        return self.interval
+
+    def stable(self):
+        """ Back off after a poll that found nothing changed.
+
+        Returns:
+        The interval.
+
+        """
+        self.interval = min(self.interval * self.factor, self.maximum)
+        return self.interval
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd wireless profile index
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Index of the saved wireless profiles by BSSID and ESSID.
+
+class ProfileIndex() -- Decoded wireless profiles, rebuilt on config changes.
+
+"""
+
+from wicd import misc
+
+
+class ProfileIndex(object):
+    """ The decoded profiles of a wireless config, for fast matching.
+
+    Profiles are decoded once and kept until the config changes,
+    which is noticed by the generation counter of the ConfigManager.
+
+    """
+    def __init__(self, config):
+        """ Initialize the index.
+
+        Keyword arguments:
+        config -- the ConfigManager of the wireless profiles
+
+        """
+        self.config = config
+        self.generation = None
+        self.bssids = {}
+        self.essids = {}
+
+    def _rebuild(self):
+        """ Decode every profile of the config. """
+        config = self.config
+        bssids = {}
+        essids = {}
+        for section in config.sections():
+            profile = dict((option, misc.Noneify(config.get(section, option)))
+                           for option in config.options(section))
+            if section.startswith('essid:'):
+                # Only essid profiles used for every network sharing
+                # the essid matter for matching.
+                if profile.get('use_settings_globally'):
+                    essids[section[len('essid:'):]] = profile
+            else:
+                bssids[section] = profile
+        self.bssids = bssids
+        self.essids = essids
+        self.generation = config.generation
+
+    def lookup(self, essid, bssid):
+        """ Find the profile used by a network.
+
+        Keyword arguments:
+        essid -- the essid of the network
+        bssid -- the bssid of the network
+
+        Returns:
+        The profile dict, or None if the network has no saved profile.
+        The profile dict must not be modified.
+
+        """
+        if self.generation != self.config.generation:
+            self._rebuild()
+        return self.essids.get(essid) or self.bssids.get(bssid)
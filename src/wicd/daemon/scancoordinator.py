@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd wireless scan coordinator
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Decides which scan requests need the radio to scan.
+
+class ScanCoordinator() -- Coalesces scan requests of several clients.
+
+"""
+
+import threading
+import time
+
+# What a scan request should do.
+START = 'start'     # Run a hardware scan.
+JOIN = 'join'       # Wait for the scan already running.
+CACHED = 'cached'   # Use the results of the last scan.
+BUSY = 'busy'       # A scan for another essid is running.
+
+
+class ScanCoordinator(object):
+    """ Coalesces the scan requests of the daemon's clients.
+
+    A request made while a scan is running joins that scan.  If the
+    last scan finished less than freshness seconds ago, or the client
+    already had a scan in the last client_interval seconds, the cached
+    results are used instead of scanning again.
+
+    """
+    def __init__(self, freshness=0, client_interval=0):
+        """ Initialize the coordinator.
+
+        Keyword arguments:
+        freshness -- seconds the results of a scan are served from cache
+        client_interval -- minimum seconds between scans for one client
+
+        """
+        self.freshness = freshness
+        self.client_interval = client_interval
+        self.scanning = False
+        self.essid = None
+        self.finished = None
+        self.clients = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+
+    def request(self, essid=None, client=None, now=None):
+        """ Decide what to do about a scan request.
+
+        Keyword arguments:
+        essid -- the hidden essid to scan for, if any
+        client -- the name of the requesting client, None for the daemon
+        now -- the time of the request, defaults to the current time
+
+        Returns:
+        START if the caller must run a scan and call finish() when
+        it is done, JOIN, CACHED or BUSY otherwise.
+
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if self.scanning:
+                if essid != self.essid:
+                    return BUSY
+                self._scanned_for(client, now)
+                return JOIN
+            if self._is_fresh(essid, now) or self._is_limited(client, now):
+                return CACHED
+            self._scanned_for(client, now)
+            self.scanning = True
+            self.essid = essid
+            self._done.clear()
+            return START
+
+    def _is_fresh(self, essid, now):
+        """ Returns True if the last scan for essid can be reused. """
+        return (self.finished is not None and essid == self.essid and
+                now - self.finished < self.freshness)
+
+    def _is_limited(self, client, now):
+        """ Returns True if client had a scan too recently. """
+        last = self.clients.get(client)
+        return (client is not None and last is not None and
+                now - last < self.client_interval)
+
+    def _scanned_for(self, client, now):
+        """ Remember client got a scan, forgetting clients long gone. """
+        if client is None:
+            return
+        for name, last in list(self.clients.items()):
+            if now - last >= self.client_interval:
+                del self.clients[name]
+        self.clients[client] = now
+
+    def finish(self, now=None):
+        """ Mark the running scan as done, waking up the joined callers. """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self.scanning = False
+            self.finished = now
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """ Wait for the running scan to finish.
+
+        Returns:
+        True if no scan is running anymore, False on timeout.
+
+        """
+        return self._done.wait(timeout)
+
+    def invalidate(self):
+        """ Make the next request scan, whatever the last scan found. """
+        with self._lock:
+            self.finished = None
+            self.clients.clear()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd wireless scan snapshot
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Keeps the last scan on disk, so a restarted daemon starts with it.
+
+save_snapshot() -- Atomically write the scanned networks to a file.
+load_snapshot() -- Read the networks of a snapshot back.
+
+"""
+
+import json
+import os
+
+from wicd.accesspoint import AccessPoint, FIELDS, share_bitrates
+
+SNAPSHOT_VERSION = 1
+
+# The essid scans give networks that don't broadcast theirs.
+HIDDEN_ESSID = '<hidden>'
+ESSID = FIELDS.index('essid')
+HIDDEN = FIELDS.index('hidden')
+
+
+def save_snapshot(path, interface, networks):
+    """ Atomically write the scan fields of networks to path.
+
+    Only what the scan found is written, never any profile settings.
+    The slots are read directly, so no pending profile is loaded, and
+    hidden networks are written with the essid the scan reported
+    rather than the one their profile filled in.
+
+    Keyword arguments:
+    path -- the file to write the snapshot to
+    interface -- the wireless interface the networks were found on
+    networks -- list of the scanned networks
+
+    """
+    rows = []
+    for network in networks:
+        row = [getattr(network, field, None) for field in FIELDS]
+        if row[ESSID] is not None and row[HIDDEN]:
+            row[ESSID] = HIDDEN_ESSID
+        rows.append(row)
+    snapshot = {'version': SNAPSHOT_VERSION, 'interface': interface,
+                'fields': FIELDS, 'networks': rows}
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except (IOError, OSError) as e:
+        print('Could not save the scan snapshot: %s' % e)
+
+
+def load_snapshot(path, interface):
+    """ Read the networks of a snapshot written by save_snapshot().
+
+    Keyword arguments:
+    path -- the snapshot file
+    interface -- the wireless interface in use
+
+    Returns:
+    A list of AccessPoints, empty if there is no usable snapshot of
+    the interface.
+
+    """
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (IOError, OSError, ValueError):
+        return []
+    if (not isinstance(snapshot, dict) or
+        snapshot.get('version') != SNAPSHOT_VERSION or
+        snapshot.get('interface') != interface):
+        return []
+    fields = snapshot.get('fields', [])
+    networks = []
+    for row in snapshot.get('networks', []):
+        ap = AccessPoint()
+        for field, value in zip(fields, row):
+            if field in FIELDS and value is not None:
+                ap[field] = value
+        if 'bssid' not in ap:
+            continue
+        if ap.get('bitrates'):
+            ap['bitrates'] = share_bitrates(ap['bitrates'])
+        networks.append(ap)
+    return networks
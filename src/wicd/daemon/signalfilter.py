@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd signal strength filter
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Smooths the signal strength of the connected network.
+
+class SignalFilter() -- Median filter with hysteresis per BSSID.
+
+"""
+
+from bisect import bisect_right
+from collections import deque
+
+# The lowest value of each signal icon the frontends show but the
+# weakest, for the signal as a percentage and in dBm.
+QUALITY_BUCKETS = (26, 51, 76)
+DBM_BUCKETS = (-80, -70, -60)
+
+# BSSIDs samples are kept for; the oldest is forgotten first.
+MAX_BSSIDS = 16
+
+
+class SignalFilter(object):
+    """ Smooths signal samples and decides when a change is worth telling.
+
+    The published value of a BSSID is the median of its last window
+    samples.  It is only updated when the median moves by delta or
+    more, or crosses into the range of another signal icon, so a
+    noisy signal does not announce a change on every sample.
+
+    """
+    def __init__(self, window=5, delta=5):
+        """ Initialize the filter.
+
+        Keyword arguments:
+        window -- the number of samples the median is taken of
+        delta -- the change of the median that is always published
+
+        """
+        self.window = window
+        self.delta = delta
+        self.samples = {}
+        self.published = {}
+        self.emitted = 0
+        self.suppressed = 0
+
+    def reset(self):
+        """ Forget every sample, eg. when the signal's unit changes. """
+        self.samples.clear()
+        self.published.clear()
+
+    def update(self, bssid, value, buckets=()):
+        """ Add a sample of the signal of a BSSID.
+
+        Keyword arguments:
+        bssid -- the BSSID the sample was taken of
+        value -- the signal strength
+        buckets -- the lowest value of each but the lowest icon range
+
+        Returns:
+        The signal strength to publish.
+
+        """
+        samples = self.samples.get(bssid)
+        if samples is None or samples.maxlen != self.window:
+            if samples is None and len(self.samples) >= MAX_BSSIDS:
+                oldest = next(iter(self.samples))
+                del self.samples[oldest]
+                self.published.pop(oldest, None)
+            samples = deque(samples or (), maxlen=self.window)
+            self.samples[bssid] = samples
+        samples.append(value)
+        smoothed = sorted(samples)[len(samples) // 2]
+
+        last = self.published.get(bssid)
+        if smoothed == last:
+            return last
+        if (last is None or abs(smoothed - last) >= self.delta or
+            bisect_right(buckets, smoothed) != bisect_right(buckets, last)):
+            self.published[bssid] = smoothed
+            self.emitted += 1
+            return smoothed
+        self.suppressed += 1
+        return last
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd connection timelines
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" What happened during a connection attempt, step by step.
+
+Each attempt gets a Timeline of its steps with their start and end
+times, their results and the external commands they ran.  Only the
+program of a command is kept, not its arguments, as those can hold a
+wireless key and timelines are readable by any D-Bus client.  The
+number of steps, commands and statuses kept is bounded, so a looping
+attempt can't grow without limit; what is dropped is counted.
+
+class Timeline() -- The steps of one connection attempt.
+class TimelineRing() -- The timelines of the last attempts.
+
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+# Bounds of what a Timeline keeps.
+MAX_STEPS = 64
+MAX_COMMANDS = 16
+MAX_STATUSES = 32
+
+# The number of attempts a TimelineRing keeps.
+HISTORY = 16
+
+
+class Timeline(object):
+    """ The steps of one connection attempt. """
+    def __init__(self, nettype, name, bssid):
+        """ Start the timeline of an attempt.
+
+        Keyword arguments:
+        nettype -- 'wired' or 'wireless'
+        name -- the essid or wired profile connected to
+        bssid -- the BSSID connected to, or 'wired'
+
+        """
+        self.nettype = nettype
+        self.name = name
+        self.bssid = bssid
+        self.started = time.time()
+        self.finished = None
+        self.result = ''
+        self.steps = []
+        self.statuses = deque(maxlen=MAX_STATUSES)
+        self.dropped_steps = 0
+        self.dropped_commands = 0
+        self._active = []
+        self._lock = threading.Lock()
+
+    def start_step(self, name, strategy):
+        """ Record that a step started.
+
+        Keyword arguments:
+        name -- the name of the step, eg. set_ip_address
+        strategy -- the strategy the step belongs to, eg. full
+
+        Returns:
+        The step, for end_step(), or None if there is no room left.
+
+        """
+        with self._lock:
+            if len(self.steps) >= MAX_STEPS:
+                self.dropped_steps += 1
+                step = None
+            else:
+                step = {'step': name, 'strategy': strategy,
+                        'start': time.time(), 'end': 0.0, 'result': '',
+                        'commands': []}
+                self.steps.append(step)
+            self._active.append(step)
+        return step
+
+    def end_step(self, step, result):
+        """ Record that the step start_step() returned ended. """
+        with self._lock:
+            if self._active:
+                self._active.pop()
+            if step is not None:
+                step['end'] = time.time()
+                step['result'] = result
+
+    def command(self, args, returncode, elapsed):
+        """ Record a command run by the step running now.
+
+        Keyword arguments:
+        args -- the program and its arguments
+        returncode -- its exit status, or None if unknown
+        elapsed -- the seconds it ran, or None if unknown
+
+        """
+        with self._lock:
+            step = self._active[-1] if self._active else None
+            if step is None:
+                return
+            if len(step['commands']) >= MAX_COMMANDS:
+                self.dropped_commands += 1
+                return
+            step['commands'].append((os.path.basename(str(args[0])),
+                                     returncode, elapsed))
+
+    def status(self, status):
+        """ Record a status the attempt went through. """
+        self.statuses.append((time.time(), status))
+
+    def finish(self, result):
+        """ Record that the attempt ended with result. """
+        self.finished = time.time()
+        self.result = result or ''
+
+    def as_dict(self):
+        """ Returns the timeline as a dict of plain values.
+
+        Times are seconds since the epoch; an end of 0 means the step
+        or the attempt hasn't ended.  Commands are (program, exit status,
+        seconds) tuples, with None for what isn't known.
+
+        """
+        with self._lock:
+            steps = [dict(step, commands=list(step['commands']))
+                     for step in self.steps]
+        return {'type': self.nettype, 'name': self.name,
+                'bssid': self.bssid, 'started': self.started,
+                'finished': self.finished or 0.0, 'result': self.result,
+                'steps': steps, 'statuses': list(self.statuses),
+                'dropped_steps': self.dropped_steps,
+                'dropped_commands': self.dropped_commands}
+
+
+class TimelineRing(object):
+    """ The timelines of the last connection attempts. """
+    def __init__(self, size=HISTORY):
+        """ Initialize an empty ring keeping size timelines. """
+        self.timelines = deque(maxlen=size)
+
+    def start(self, nettype, name, bssid):
+        """ Start and keep the Timeline of a new attempt.
+
+        The oldest one is dropped if the ring is full.
+
+        """
+        timeline = Timeline(nettype, name, bssid)
+        self.timelines.append(timeline)
+        return timeline
+
+    def last(self):
+        """ Returns the Timeline of the last attempt, or None. """
+        try:
+            return self.timelines[-1]
+        except IndexError:
+            return None
+
+    def all(self):
+        """ Returns the kept timelines, oldest first. """
+        return list(self.timelines)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd phase timings
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Latency histograms of the phases of recurring work.
+
+class Histogram() -- Counts durations in fixed buckets.
+class PhaseTimings() -- A Histogram per named phase.
+
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds of the buckets in seconds; slower ones land in a last,
+# open bucket.
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _format_seconds(seconds):
+    """ Returns a duration as a short string, eg. 5ms or 1s. """
+    if seconds < 1:
+        return '%gms' % (seconds * 1000)
+    return '%gs' % seconds
+
+
+class Histogram(object):
+    """ Counts durations in fixed buckets. """
+    def __init__(self, bounds=BUCKETS):
+        """ Initialize the histogram.
+
+        Keyword arguments:
+        bounds -- ascending upper bounds of the buckets in seconds
+
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """ Count a duration. """
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def count(self):
+        """ Returns the number of durations counted. """
+        return sum(self.counts)
+
+    def buckets(self):
+        """ Returns a list of (label, count) tuples, fastest first. """
+        labels = ['<=' + _format_seconds(bound) for bound in self.bounds]
+        labels.append('>' + _format_seconds(self.bounds[-1]))
+        return list(zip(labels, self.counts))
+
+
+class PhaseTimings(object):
+    """ Latency histograms of the named phases of recurring work. """
+    def __init__(self, bounds=BUCKETS):
+        """ Initialize without any phases; they appear when timed. """
+        self.bounds = bounds
+        self.histograms = {}
+
+    def record(self, phase, seconds):
+        """ Count a duration of phase. """
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = Histogram(self.bounds)
+        histogram.add(seconds)
+
+    @contextmanager
+    def time(self, phase):
+        """ Time the body of a with statement as phase. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def buckets(self):
+        """ Returns a dict mapping each phase to its Histogram.buckets(). """
+        return dict((phase, histogram.buckets())
+                    for phase, histogram in self.histograms.items())
+
+    def format(self):
+        """ Returns the histograms as lines of text for the log. """
+        lines = []
+        for phase, histogram in self.histograms.items():
+            count = histogram.count()
+            buckets = ' '.join('%s:%d' % bucket
+                               for bucket in histogram.buckets() if bucket[1])
+            lines.append('%s: n=%d mean=%s max=%s %s' % (
+                phase, count, _format_seconds(histogram.total / count),
+                _format_seconds(histogram.max), buckets))
+        return '\n'.join(lines)
@@ -34,6 +34,27 @@ class WiCDDaemonNotFound(SystemExit, WiCDError):
         return u"Failed to connect to wicd daemon: {}".format(self.origin_exc)
         
 
+class WiCDCommandNotFound(WiCDError):
+    pass
+
+
+class WiCDPopenFailure(WiCDError):
+    pass
+
+
+class WiCDCommandFailure(WiCDError):
+    def __init__(self, cmd, returncode, out, err):
+        super(WiCDCommandFailure, self).__init__(cmd, returncode, out, err)
+        self.cmd = cmd
+        self.returncode = returncode
+        self.out = out
+        self.err = err
+
+    def __str__(self):
+        return u"Command {} failed with exit status {}: {}".format(
+            ' '.join(self.cmd), self.returncode, self.err.strip())
+
+
 class transform_exception(object):
     def __init__(self, in_exc_type, out_exc_type):
         self.in_exc_type  = in_exc_type
@@ -138,11 +138,10 @@ def main():
     if args.list_networks:
         if args.wireless:
             print('#\tBSSID\t\t\tChannel\tESSID')
-            for network_id in range(0, wireless.GetNumberOfNetworks()):
-                print(('%s\t%s\t%s\t%s' % (network_id,
-                    wireless.GetWirelessProperty(network_id, 'bssid'),
-                    wireless.GetWirelessProperty(network_id, 'channel'),
-                    wireless.GetWirelessProperty(network_id, 'essid'))))
+            networks = wireless.GetNetworksBulk(['bssid', 'channel', 'essid'])
+            for network_id, (bssid, channel, essid) in enumerate(networks):
+                print(('%s\t%s\t%s\t%s' % (network_id, bssid, channel,
+                                              essid)))
         elif args.wired:
             print('#\tProfile name')
             i = 0
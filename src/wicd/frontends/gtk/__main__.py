@@ -46,6 +46,7 @@ else:
 # Wicd specific imports
 from wicd import wpath
 from wicd import misc
+from wicd.accesspoint import signal_key
 from wicd.dbus import dbus_manager
 from .        import gui
 from .guiutil import error, can_use_notify
@@ -765,15 +766,14 @@ TX:'''))
                 gtk.main_iteration()
             if item.state != gtk.STATE_PRELIGHT:
                 return True
-            wireless.Scan(False)
+            # Hovering is no reason to disturb the radio, the kernel's
+            # scan cache will do unless it is old.
+            wireless.Scan(False, True)
             return False
 
         @catchdbus
         def populate_network_menu(self, data=None):
             """ Populates the network list submenu. """
-            def get_prop(net_id, prop):
-                return wireless.GetWirelessProperty(net_id, prop)
-
             net_menuitem = self.manager.get_widget("/Menubar/Menu/Connect/")
             submenu = net_menuitem.get_submenu()
             self._clear_menu(submenu)
@@ -782,7 +782,11 @@ TX:'''))
                 return
 
             is_connecting = daemon.CheckIfConnecting()
-            num_networks = wireless.GetNumberOfNetworks()
+            props = ['essid', 'never', 'quality', 'strength']
+            networks = [(x, dict(zip(props, values))) for x, values in
+                        enumerate(wireless.GetNetworksBulk(props))]
+            # Strongest networks first.
+            networks.sort(key=lambda n: signal_key(n[1]), reverse=True)
             [status, info] = daemon.GetConnectionStatus()
 
             if daemon.GetAlwaysShowWiredInterface() or \
@@ -797,13 +801,12 @@ TX:'''))
                 submenu.append(sep)
                 sep.show()
 
-            if num_networks > 0:
+            if networks:
                 skip_never_connect = not daemon.GetShowNeverConnect()
-                for x in range(0, num_networks):
-                    if skip_never_connect and \
-                      misc.to_bool(get_prop(x,"never")):
+                for x, network in networks:
+                    essid = network['essid']
+                    if skip_never_connect and misc.to_bool(network['never']):
                         continue
-                    essid = get_prop(x, "essid")
                     if status == misc.WIRELESS and info[1] == essid:
                         is_active = True
                     else:
@@ -696,14 +696,13 @@ class appGui(WicdGtkUi):
         printLine = False  # We don't print a separator by default.
         if self._wired_showing:
             printLine = True
-        num_networks = wireless.GetNumberOfNetworks()
+        networks = netentry.get_networks()
         instruct_label = self.wTree.get_object("label_instructions")
-        if num_networks > 0:
+        if networks:
             skip_never_connect = not daemon.GetShowNeverConnect()
             instruct_label.show()
-            for x in range(0, num_networks):
-                if skip_never_connect and \
-                  misc.to_bool(get_wireless_prop(x, 'never')):
+            for x, network in networks:
+                if skip_never_connect and misc.to_bool(network['never']):
                     continue
                 if printLine:
                     sep = gtk.HSeparator()
@@ -712,7 +711,7 @@ class appGui(WicdGtkUi):
                     sep.show()
                 else:
                     printLine = True
-                tempnet = WirelessNetworkEntry(x)
+                tempnet = WirelessNetworkEntry(x, network)
                 self.network_list.pack_start(tempnet, False, False)
                 tempnet.connect_button.connect("clicked",
                                                self.connect, "wireless", x,
@@ -31,6 +31,7 @@ import os
 
 import wicd.misc as misc
 import wicd.wpath as wpath
+from wicd.accesspoint import signal_key
 from   wicd.dbus  import dbus_manager
 from wicd.misc import noneToString, stringToNone, noneToBlankString, to_bool
 from .guiutil import error, LabelEntry, GreyLabel, LeftAlignedLabel
@@ -43,6 +44,26 @@ daemon = None
 wired = None
 wireless = None
 
+# The properties a WirelessNetworkEntry shows, fetched for all networks
+# at once with GetNetworksBulk.
+NETWORK_PROPS = ['essid', 'bssid', 'quality', 'strength', 'encryption',
+                 'encryption_method', 'channel', 'enctype', 'automatic',
+                 'never']
+
+
+def get_networks():
+    """ Fetch the networks to list, strongest first.
+
+    Returns:
+    A list of (network id, dict of the NETWORK_PROPS) tuples.
+
+    """
+    networks = [(x, dict(zip(NETWORK_PROPS, values)))
+                for x, values in
+                enumerate(wireless.GetNetworksBulk(NETWORK_PROPS))]
+    networks.sort(key=lambda n: signal_key(n[1]), reverse=True)
+    return networks
+
 
 def setup_dbus():
     """ Initialize DBus. """
@@ -510,10 +531,15 @@ class WiredSettingsDialog(AdvancedSettingsDialog):
 
 class WirelessSettingsDialog(AdvancedSettingsDialog):
     """ Wireless settings dialog. """
-    def __init__(self, networkID):
-        """ Build the wireless settings dialog. """
-        AdvancedSettingsDialog.__init__(
-            self, wireless.GetWirelessProperty(networkID, 'essid'))
+    def __init__(self, networkID, network):
+        """ Build the wireless settings dialog.
+
+        Keyword arguments:
+        networkID -- the id of the network
+        network -- dict of the NETWORK_PROPS of the network
+
+        """
+        AdvancedSettingsDialog.__init__(self, network['essid'])
         # So we can test if we are wired or wireless (for
         # change_encrypt_method())
         self.wired = False
@@ -557,8 +583,7 @@ class WirelessSettingsDialog(AdvancedSettingsDialog):
         activeID = -1  # Set the menu to this item when we are done
         for x, enc_type in enumerate(self.encrypt_types):
             self.combo_encryption.append_text(enc_type['name'])
-            if enc_type['type'] == \
-              wireless.GetWirelessProperty(networkID, "enctype"):
+            if enc_type['type'] == network['enctype']:
                 activeID = x
         self.combo_encryption.set_active(activeID)
         if activeID != -1:
@@ -997,17 +1022,23 @@ class WiredNetworkEntry(NetworkEntry):
 
 class WirelessNetworkEntry(NetworkEntry):
     """ Wireless network entry. """
-    def __init__(self, networkID):
-        """ Build the wireless network entry. """
+    def __init__(self, networkID, network):
+        """ Build the wireless network entry.
+
+        Keyword arguments:
+        networkID -- the id of the network
+        network -- dict of the NETWORK_PROPS of the network
+
+        """
         NetworkEntry.__init__(self)
 
         self.networkID = networkID
+        self.bssid = network['bssid']
         self.image.set_padding(0, 0)
         self.image.set_alignment(.5, .5)
         self.image.set_size_request(60, -1)
         self.image.show()
-        self.essid = noneToBlankString(
-            wireless.GetWirelessProperty(networkID, "essid"))
+        self.essid = noneToBlankString(network['essid'])
         self.lbl_strength = GreyLabel()
         self.lbl_encryption = GreyLabel()
         self.lbl_channel = GreyLabel()
@@ -1018,15 +1049,10 @@ class WirelessNetworkEntry(NetworkEntry):
         self.chkbox_neverconnect = gtk.CheckButton(
             _('Never connect to this network'))
 
-        self.set_signal_strength(
-            wireless.GetWirelessProperty(networkID, 'quality'),
-            wireless.GetWirelessProperty(networkID, 'strength')
-        )
-        self.set_encryption(
-            wireless.GetWirelessProperty(networkID, 'encryption'),
-            wireless.GetWirelessProperty(networkID, 'encryption_method')
-        )
-        self.set_channel(wireless.GetWirelessProperty(networkID, 'channel'))
+        self.set_signal_strength(network['quality'], network['strength'])
+        self.set_encryption(network['encryption'],
+                            network['encryption_method'])
+        self.set_channel(network['channel'])
         self.name_label.set_use_markup(True)
         self.name_label.set_label(
             "<b>%s</b>    %s    %s    %s" % (
@@ -1041,12 +1067,12 @@ class WirelessNetworkEntry(NetworkEntry):
         self.vbox_top.pack_start(self.chkbox_autoconnect, False, False)
         self.vbox_top.pack_start(self.chkbox_neverconnect, False, False)
 
-        if to_bool(self.format_entry(networkID, "automatic")):
+        if to_bool(noneToBlankString(network['automatic'])):
             self.chkbox_autoconnect.set_active(True)
         else:
             self.chkbox_autoconnect.set_active(False)
 
-        if to_bool(self.format_entry(networkID, "never")):
+        if to_bool(noneToBlankString(network['never'])):
             self.chkbox_autoconnect.set_sensitive(False)
             self.connect_button.set_sensitive(False)
             self.chkbox_neverconnect.set_active(True)
@@ -1059,7 +1085,7 @@ class WirelessNetworkEntry(NetworkEntry):
 
         # Show everything
         self.show_all()
-        self.advanced_dialog = WirelessSettingsDialog(networkID)
+        self.advanced_dialog = WirelessSettingsDialog(networkID, network)
         self.wifides = self.connect("destroy", self.destroy_called)
 
     def _escape(self, val):
@@ -1109,12 +1135,11 @@ class WirelessNetworkEntry(NetworkEntry):
 
     def update_connect_button(self, state, apbssid):
         """ Update the connection/disconnect button for this entry. """
-        if to_bool(self.format_entry(self.networkID, "never")):
+        if self.chkbox_neverconnect.get_active():
             self.connect_button.set_sensitive(False)
         if not apbssid:
             apbssid = wireless.GetApBssid()
-        if state == misc.WIRELESS and \
-           apbssid == wireless.GetWirelessProperty(self.networkID, "bssid"):
+        if state == misc.WIRELESS and apbssid == self.bssid:
             self.disconnect_button.show()
             self.connect_button.hide()
         else:
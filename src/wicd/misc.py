@@ -29,7 +29,7 @@ import re
 import string
 from gi.repository import GLib as gobject
 from threading import Thread
-from subprocess import Popen, STDOUT, PIPE, call
+from subprocess import Popen, STDOUT, PIPE, TimeoutExpired, call
 from subprocess import getoutput
 from itertools import repeat, chain, zip_longest
 from pipes import quote
@@ -39,6 +39,8 @@ from wicd.translations import _
 
 # wicd imports
 from . import wpath
+from . import cancel
+from . import runner
 
 # Connection state constants
 NOT_CONNECTED = 0
@@ -97,6 +99,7 @@ _status_dict = {
     'interface_down': _('Putting interface down...'),
     'interface_up': _('Putting interface up...'),
     'no_dhcp_offers': _('Connection Failed: No DHCP offers received.'),
+    'reassociating': _('Reassociating with the access point...'),
     'resetting_ip_address': _('Resetting IP address...'),
     'running_dhcp': _('Obtaining IP address...'),
     'setting_broadcast_address': _('Setting broadcast address...'),
@@ -113,7 +116,7 @@ class WicdError(Exception):
     
 
 def Run(cmd, include_stderr=False, return_pipe=False,
-        return_obj=False, return_retcode=True):
+        return_obj=False, return_retcode=True, timeout=None):
     """ Run a command.
 
     Runs the given command, returning either the output
@@ -128,7 +131,10 @@ def Run(cmd, include_stderr=False, return_pipe=False,
                   False, all that will be returned is
                   one output string from the command.
     return_obj - If True, Run will return the Popen object
-                 for the command that was run.
+                 for the command that was run.  It is terminated
+                 if the cancel token of the thread is cancelled.
+    timeout - Seconds after which the command is killed and
+              an empty string returned.
 
     """
     if not isinstance(cmd, list):
@@ -136,31 +142,36 @@ def Run(cmd, include_stderr=False, return_pipe=False,
         cmd = cmd.split()
     if include_stderr:
         err = STDOUT
-        fds = True
     else:
         err = None
-        fds = False
-    std_in = None
-    
-    # We need to make sure that the results of the command we run
-    # are in English, so we set up a temporary environment.
-    tmpenv = os.environ.copy()
-    tmpenv["LC_ALL"] = "C"
-    tmpenv["LANG"] = "C"
-    
+
+    if return_obj or return_pipe:
+        # The caller talks to the process itself.
+        try:
+            f = Popen([runner.which(cmd[0]) or cmd[0]] + cmd[1:],
+                      shell=False, stdout=PIPE, stdin=None, stderr=err,
+                      cwd='/', env=runner.ENV)
+        except OSError as e:
+            print(("Running command %s failed: %s" % (str(cmd), str(e))))
+            return ""
+        runner.notify(cmd)
+        token = cancel.current()
+        if token is not None:
+            token.watch(f)
+        if return_obj:
+            return f
+        return f.stdout
+
+    # The output of the commands we run is parsed, so they run in
+    # the C locale.
     try:
-        f = Popen(cmd, shell=False, stdout=PIPE, stdin=std_in, stderr=err,
-                  close_fds=fds, cwd='/', env=tmpenv)
+        return runner.run(cmd, stderr=err, timeout=timeout).out.decode()
     except OSError as e:
         print(("Running command %s failed: %s" % (str(cmd), str(e))))
-        return ""
-        
-    if return_obj:
-        return f
-    if return_pipe:
-        return f.stdout
-    else:
-        return f.communicate()[0].decode()
+    except TimeoutExpired:
+        print(("Running command %s timed out after %s seconds" %
+               (str(cmd), timeout)))
+    return ""
     
 def LaunchAndWait(cmd):
     """ Launches the given program with the given arguments, then blocks.
@@ -251,6 +262,7 @@ def ExecuteScript(script, verbose=False, extra_parameters=()):
     if verbose:
         print(("Executing %s with params %s" % (script, params)))
     ret = call('%s %s > /dev/null 2>&1' % (script, params), shell=True)
+    runner.notify([script] + extra_parameters, ret)
     if verbose:
         print(("%s returned %s" % (script, ret)))
 
@@ -284,11 +296,11 @@ def Noneify(variable, convert_to_bool=True):
             return True
     return variable
 
-def ParseEncryption(network):
-    """ Parse through an encryption template file
+def RenderEncryption(network):
+    """ Fill in the encryption template of a network.
 
-    Parses an encryption template, reading in a network's info
-    and creating a config file for it
+    Returns:
+    The wpa_supplicant config for the network.
 
     """
     enctemplate = open(wpath.encryption + network["enctype"])
@@ -325,6 +337,16 @@ def ParseEncryption(network):
                 config_file = ''.join([config_file, line])
             else:  # Just a regular entry.
                 config_file = ''.join([config_file, line])
+    return config_file
+
+def ParseEncryption(network):
+    """ Parse through an encryption template file
+
+    Parses an encryption template, reading in a network's info
+    and creating a config file for it
+
+    """
+    config_file = RenderEncryption(network)
 
     # Write the data to the files then chmod them so they can't be read 
     # by normal users.
@@ -568,17 +590,11 @@ def find_path(cmd):
     
     Search the all the paths in the environment variable PATH for
     the given file name, or return None if a full path for
-    the file can not be found.
+    the file can not be found.  The result is cached until
+    runner.forget_paths() is called.
     
     """
-    paths = os.getenv("PATH").split(':')
-    if not paths:
-        paths = ["/usr/local/sbin", "/usr/local/bin", "/usr/sbin", "/usr/bin",
-                 "/sbin", "/bin"]
-    for path in paths:
-        if os.path.exists(os.path.join(path, cmd)):
-            return os.path.join(path, cmd)
-    return None
+    return runner.which(cmd)
 
 def noneToBlankString(text):
     """ Converts NoneType or "None" to a blank string. """
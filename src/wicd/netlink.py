@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd netlink helpers
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Minimal netlink support for wicd.
+
+Packs and unpacks netlink messages and attributes using nothing but
+the standard library, so backends can talk to the kernel directly
+instead of running and parsing external programs.
+
+class NetlinkSocket() -- A netlink socket doing request/reply exchanges.
+class GenericNetlinkSocket() -- A NetlinkSocket bound to a genl family.
+class RouteNetlinkSocket() -- A NetlinkSocket changing addresses and routes.
+
+"""
+
+import os
+import socket
+import struct
+
+NETLINK_ROUTE = 0
+NETLINK_GENERIC = 16
+
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_ACK = 0x04
+NLM_F_DUMP = 0x300
+NLM_F_REPLACE = 0x100
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3fff
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+# rtnetlink multicast groups and the messages they deliver.
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+RTM_GETROUTE = 26
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_BROADCAST = 4
+
+RTA_OIF = 4
+RTA_GATEWAY = 5
+
+RT_TABLE_MAIN = 254
+RTPROT_BOOT = 3
+RT_SCOPE_UNIVERSE = 0
+RTN_UNICAST = 1
+
+# Large enough for the biggest dump chunk the kernel hands out.
+RECV_BUFSIZE = 65536
+
+nlmsghdr = struct.Struct('=LHHLL')
+genlmsghdr = struct.Struct('=BBH')
+ifaddrmsg = struct.Struct('=BBBBL')
+rtmsg = struct.Struct('=BBBBBBBBL')
+nlattr = struct.Struct('=HH')
+nlmsgerr = struct.Struct('=i')
+u16 = struct.Struct('=H')
+u32 = struct.Struct('=L')
+s32 = struct.Struct('=l')
+
+
+def pack_attr(attr_type, data):
+    """ Pack data into a netlink attribute.
+
+    Keyword arguments:
+    attr_type -- the attribute type
+    data -- the attribute payload as bytes
+
+    Returns:
+    The attribute, padded to a four byte boundary.
+
+    """
+    length = nlattr.size + len(data)
+    return nlattr.pack(length, attr_type) + data + \
+        b'\0' * (-length & 3)
+
+
+def pack_nested(attr_type, attrs):
+    """ Pack already packed attributes into a nested attribute. """
+    return pack_attr(attr_type | NLA_F_NESTED, b''.join(attrs))
+
+
+def parse_attrs(data, offset=0):
+    """ Parse a stream of netlink attributes.
+
+    Keyword arguments:
+    data -- bytes holding the attributes
+    offset -- where the first attribute starts
+
+    Returns:
+    A dict mapping the attribute type to its payload.  Nested
+    attributes are left packed; call parse_attrs() on them again.
+
+    """
+    attrs = {}
+    end = len(data)
+    unpack = nlattr.unpack_from
+    while offset + 4 <= end:
+        length, attr_type = unpack(data, offset)
+        if length < 4:
+            break
+        attrs[attr_type & NLA_TYPE_MASK] = data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+    return attrs
+
+
+def iter_messages(data):
+    """ Split a netlink datagram into its messages.
+
+    Yields:
+    (type, flags, seq, payload) tuples.
+
+    """
+    offset = 0
+    end = len(data)
+    while offset + nlmsghdr.size <= end:
+        length, msg_type, flags, seq, _ = nlmsghdr.unpack_from(data, offset)
+        if length < nlmsghdr.size or offset + length > end:
+            break
+        yield msg_type, flags, seq, data[offset + nlmsghdr.size:offset + length]
+        offset += (length + 3) & ~3
+
+
+def check_error(payload):
+    """ Raise OSError if an NLMSG_ERROR payload reports a failure. """
+    error, = nlmsgerr.unpack_from(payload)
+    if error:
+        raise OSError(-error, os.strerror(-error))
+
+
+class NetlinkSocket(object):
+    """ A netlink socket doing request/reply exchanges. """
+    def __init__(self, protocol, groups=0):
+        """ Open and bind the socket.
+
+        Keyword arguments:
+        protocol -- the netlink protocol, eg. NETLINK_ROUTE
+        groups -- bitmask of multicast groups to subscribe to
+
+        """
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                                  protocol)
+        self.sock.bind((0, groups))
+        self.seq = 0
+
+    def fileno(self):
+        """ Return the file descriptor of the socket. """
+        return self.sock.fileno()
+
+    def close(self):
+        """ Close the socket. """
+        self.sock.close()
+
+    def setblocking(self, flag):
+        """ Set whether recv() waits for a datagram to arrive. """
+        self.sock.setblocking(flag)
+
+    def add_membership(self, group):
+        """ Join a multicast group by its id. """
+        self.sock.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group)
+
+    def send(self, msg_type, flags, payload):
+        """ Send a request and return its sequence number. """
+        self.seq += 1
+        self.sock.send(nlmsghdr.pack(nlmsghdr.size + len(payload), msg_type,
+                                     flags | NLM_F_REQUEST, self.seq, 0)
+                       + payload)
+        return self.seq
+
+    def recv(self):
+        """ Receive one datagram and return its messages. """
+        return iter_messages(self.sock.recv(RECV_BUFSIZE))
+
+    def request(self, msg_type, flags, payload):
+        """ Send a request and collect the replies to it.
+
+        Keyword arguments:
+        msg_type -- the message type of the request
+        flags -- NLM_F_* flags besides NLM_F_REQUEST
+        payload -- the message body as bytes
+
+        Yields:
+        (type, payload) for every reply message.  Dumps end with
+        NLMSG_DONE, acked requests with their ack; a failure reported
+        by the kernel raises OSError.
+
+        """
+        seq = self.send(msg_type, flags, payload)
+        while True:
+            for reply_type, reply_flags, reply_seq, reply in self.recv():
+                if reply_seq != seq:
+                    continue
+                if reply_type == NLMSG_DONE:
+                    return
+                if reply_type == NLMSG_ERROR:
+                    check_error(reply)
+                    return
+                yield reply_type, reply
+                if not reply_flags & NLM_F_MULTI and not flags & NLM_F_ACK:
+                    return
+
+
+class GenericNetlinkSocket(NetlinkSocket):
+    """ A NetlinkSocket talking to one generic netlink family. """
+    def __init__(self, family):
+        """ Open the socket and resolve the family.
+
+        Keyword arguments:
+        family -- the name of the generic netlink family, eg. nl80211
+
+        Raises OSError if the family is not known to the kernel.
+
+        """
+        NetlinkSocket.__init__(self, NETLINK_GENERIC)
+        self.family_id = None
+        self.mcast_groups = {}
+        ctrl = genlmsghdr.pack(CTRL_CMD_GETFAMILY, 1, 0) + \
+            pack_attr(CTRL_ATTR_FAMILY_NAME, family.encode() + b'\0')
+        for _, reply in self.request(GENL_ID_CTRL, 0, ctrl):
+            attrs = parse_attrs(reply, genlmsghdr.size)
+            self.family_id, = u16.unpack_from(attrs[CTRL_ATTR_FAMILY_ID])
+            groups = parse_attrs(attrs.get(CTRL_ATTR_MCAST_GROUPS, b''))
+            for group in groups.values():
+                group = parse_attrs(group)
+                name = group[CTRL_ATTR_MCAST_GRP_NAME].rstrip(b'\0').decode()
+                self.mcast_groups[name], = \
+                    u32.unpack_from(group[CTRL_ATTR_MCAST_GRP_ID])
+
+    def genl_request(self, cmd, flags, attrs=(), version=1):
+        """ Send a command to the family and collect the replies.
+
+        Yields:
+        (cmd, attrs) for every reply, attrs as returned by parse_attrs().
+
+        """
+        payload = genlmsghdr.pack(cmd, version, 0) + b''.join(attrs)
+        for _, reply in self.request(self.family_id, flags, payload):
+            yield reply[0], parse_attrs(reply, genlmsghdr.size)
+
+
+class RouteNetlinkSocket(NetlinkSocket):
+    """ A NetlinkSocket changing the IPv4 addresses and routes of links.
+
+    Does what ifconfig, ip and route are run for without starting a
+    process for every change.  Every method raises OSError with the
+    error the kernel reported if a change fails.
+
+    """
+    def __init__(self):
+        """ Open the rtnetlink socket. """
+        NetlinkSocket.__init__(self, NETLINK_ROUTE)
+
+    def _change(self, msg_type, flags, payload):
+        """ Send a change and wait for the kernel to acknowledge it. """
+        for _ in self.request(msg_type, flags | NLM_F_ACK, payload):
+            pass
+
+    def addresses(self, ifindex):
+        """ Returns the IPv4 address messages of a link as a list. """
+        request = ifaddrmsg.pack(socket.AF_INET, 0, 0, 0, 0)
+        return [reply for _, reply in
+                self.request(RTM_GETADDR, NLM_F_DUMP, request)
+                if ifaddrmsg.unpack_from(reply)[4] == ifindex]
+
+    def set_address(self, ifindex, address, prefixlen, broadcast=None):
+        """ Replace the IPv4 addresses of a link by one address.
+
+        Keyword arguments:
+        ifindex -- the index of the link
+        address -- the address in dotted quad form
+        prefixlen -- the length of the network prefix in bits
+        broadcast -- the broadcast address in dotted quad form
+
+        """
+        for old in self.addresses(ifindex):
+            self._change(RTM_DELADDR, 0, old)
+        local = socket.inet_aton(address)
+        attrs = [pack_attr(IFA_LOCAL, local), pack_attr(IFA_ADDRESS, local)]
+        if broadcast:
+            attrs.append(pack_attr(IFA_BROADCAST,
+                                   socket.inet_aton(broadcast)))
+        self._change(RTM_NEWADDR, NLM_F_CREATE | NLM_F_REPLACE,
+                     ifaddrmsg.pack(socket.AF_INET, prefixlen, 0,
+                                    RT_SCOPE_UNIVERSE, ifindex) +
+                     b''.join(attrs))
+
+    def routes(self, ifindex):
+        """ Returns the main table IPv4 routes out of a link.
+
+        Returns:
+        A list of (prefix length, message) tuples, prefix length 0
+        being a default route.
+
+        """
+        request = rtmsg.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0, 0, 0)
+        routes = []
+        for _, reply in self.request(RTM_GETROUTE, NLM_F_DUMP, request):
+            _, dst_len, _, _, table, _, _, _, _ = rtmsg.unpack_from(reply)
+            oif = parse_attrs(reply, rtmsg.size).get(RTA_OIF)
+            if (table == RT_TABLE_MAIN and oif is not None and
+                u32.unpack(oif)[0] == ifindex):
+                routes.append((dst_len, reply))
+        return routes
+
+    def flush_routes(self, ifindex):
+        """ Delete every main table route out of a link. """
+        for _, route in self.routes(ifindex):
+            self._change(RTM_DELROUTE, 0, route)
+
+    def del_default_route(self, ifindex):
+        """ Delete the default routes out of a link. """
+        for dst_len, route in self.routes(ifindex):
+            if dst_len == 0:
+                self._change(RTM_DELROUTE, 0, route)
+
+    def add_default_route(self, ifindex, gateway):
+        """ Add a default route through gateway out of a link.
+
+        Keyword arguments:
+        ifindex -- the index of the link
+        gateway -- the gateway in dotted quad form
+
+        """
+        self._change(RTM_NEWROUTE, NLM_F_CREATE | NLM_F_EXCL,
+                     rtmsg.pack(socket.AF_INET, 0, 0, 0, RT_TABLE_MAIN,
+                                RTPROT_BOOT, RT_SCOPE_UNIVERSE, RTN_UNICAST,
+                                0) +
+                     pack_attr(RTA_GATEWAY, socket.inet_aton(gateway)) +
+                     pack_attr(RTA_OIF, u32.pack(ifindex)))
@@ -51,9 +51,13 @@ from signal import SIGTERM
 from functools import cmp_to_key
 
 # wicd imports 
+from . import cancel
 from . import misc
 from . import wpath
 from wicd.daemon.backend import BackendManager
+from wicd.daemon.timeline import TimelineRing
+from wicd.daemon.timings import PhaseTimings
+from . import runner
 from .translations import _
 
 if __name__ == '__main__':
@@ -62,16 +66,53 @@ if __name__ == '__main__':
 BACKEND = None
 BACKEND_MGR = BackendManager()
 
+# Seconds a resumed connection may take to come back before it is
+# made again from scratch.
+RESUME_TIMEOUT = 15
+
+# How long the steps of connecting took, by strategy and step, eg.
+# resume:reassociate, and the whole of each strategy.
+timings = PhaseTimings()
+
+# The timelines of the last connection attempts.
+timelines = TimelineRing()
+
 def abortable(func):
     """ Mark a method in a ConnectionThread as abortable. 
     
     This decorator runs a check that will abort the connection thread
-    if necessary before running a given method.
+    if necessary before running a given method, and aborts it too if
+    the method was cancelled.  It records how long the method took in
+    timings and adds it as a step to the timeline of the attempt.
     
     """
     def wrapper(self, *__args, **__kargs):
         self.abort_if_needed()
-        return func(self, *__args, **__kargs)
+        timeline = self.timeline
+        if timeline is not None:
+            step = timeline.start_step(func.__name__, self.strategy)
+        result = 'aborted'
+        start = time.perf_counter()
+        try:
+            ret = func(self, *__args, **__kargs)
+            if ret is not None:
+                result = str(ret)
+            elif self.should_die:
+                result = self.abort_reason or 'aborted'
+            else:
+                result = 'ok'
+            return ret
+        except cancel.Cancelled:
+            self.abort_if_needed()
+            raise
+        except Exception as e:
+            result = 'error: %s' % e
+            raise
+        finally:
+            timings.record('%s:%s' % (self.strategy, func.__name__),
+                           time.perf_counter() - start)
+            if timeline is not None:
+                timeline.end_step(step, result)
     
     wrapper.__name__ = func.__name__
     wrapper.__dict__ = func.__dict__
@@ -300,6 +341,11 @@ class ConnectThread(threading.Thread):
     is_connecting = None
     should_die = False
     lock = threading.Lock()
+    # The strategy the steps are timed as.
+    strategy = 'full'
+    # What the timeline of an attempt is recorded as.
+    nettype = 'wired'
+    timeline = None
 
     def __init__(self, network, interface_name, before_script, after_script, 
                  pre_disconnect_script, post_disconnect_script, gdns1,
@@ -333,6 +379,7 @@ class ConnectThread(threading.Thread):
         self._should_die = False
         self.abort_reason = ""
         self.connect_result = ""
+        self.token = cancel.CancelToken()
 
         self.global_dns_1 = gdns1
         self.global_dns_2 = gdns2
@@ -352,10 +399,20 @@ class ConnectThread(threading.Thread):
 
     def run(self):
         self.connect_result = "failed"
+        self.timeline = timelines.start(self.nettype,
+            self.network.get('essid') or self.network.get('profilename'),
+            self.network.get('bssid', 'wired'))
         try:
-            self._connect()
+            with runner.observe(self.timeline.command), \
+                 cancel.scope(self.token):
+                self._connect()
+        except cancel.Cancelled:
+            self.abort_if_needed()
+            raise
         finally:
             self.is_connecting = False
+            self.token.close()
+            self.timeline.finish(self.connect_result)
         
     def set_should_die(self, val):
         """ Setter for should_die property. """
@@ -381,6 +438,8 @@ class ConnectThread(threading.Thread):
             self.connecting_status = status
         finally:
             self.lock.release()
+        if self.timeline is not None:
+            self.timeline.status(status)
 
     def GetStatus(self):
         """ Get the threads current status message in a thread-safe way.
@@ -467,28 +526,37 @@ class ConnectThread(threading.Thread):
         else:
             # Run dhcp...
             self.SetStatus('running_dhcp')
-            if self.network.get('usedhcphostname') == None:
-                self.network['usedhcphostname'] = False
-            if self.network.get('dhcphostname') == None:
-                self.network['dhcphostname'] = os.uname()[1]
-            if self.network['usedhcphostname']:
-                hname = self.network['dhcphostname']
-                print(("Running DHCP with hostname", hname))
-            else:
-                hname = None
-                print("Running DHCP with NO hostname")
-            
-            # Check if a global DNS is configured. If it is, then let the DHCP know *not* to update resolv.conf
-            staticdns = False
-            if self.network.get('use_global_dns') or (self.network.get('use_static_dns') and (self.network.get('dns1') or self.network.get('dns2') or self.network.get('dns3'))):
-                staticdns = True
-
-            dhcp_status = iface.StartDHCP(hname, staticdns)
+            dhcp_status = self.start_dhcp(iface)
             if dhcp_status in ['no_dhcp_offers', 'dhcp_failed']:
                 if self.connect_result != "aborted":
                     self.abort_connection(dhcp_status)
                 return
 
+    def start_dhcp(self, iface):
+        """ Run the DHCP client with the network's settings.
+
+        Returns:
+        The result of iface.StartDHCP().
+
+        """
+        if self.network.get('usedhcphostname') == None:
+            self.network['usedhcphostname'] = False
+        if self.network.get('dhcphostname') == None:
+            self.network['dhcphostname'] = os.uname()[1]
+        if self.network['usedhcphostname']:
+            hname = self.network['dhcphostname']
+            print(("Running DHCP with hostname", hname))
+        else:
+            hname = None
+            print("Running DHCP with NO hostname")
+        
+        # Check if a global DNS is configured. If it is, then let the DHCP know *not* to update resolv.conf
+        staticdns = False
+        if self.network.get('use_global_dns') or (self.network.get('use_static_dns') and (self.network.get('dns1') or self.network.get('dns2') or self.network.get('dns3'))):
+            staticdns = True
+
+        return iface.StartDHCP(hname, staticdns)
+
     @abortable
     def flush_dns_addresses(self, iface):
         """ Flush the added DNS address(es).
@@ -523,6 +591,18 @@ class ConnectThread(threading.Thread):
                          self.network.get('dns_domain'),
                          self.network.get('search_domain'))
 
+    @abortable
+    def run_disconnect_scripts(self, nettype, name, mac):
+        """ Run the disconnection scripts like Controller.Disconnect(). """
+        for script_dir, script, msg in (
+                (wpath.predisconnectscripts, self.pre_disconnect_script,
+                 'pre-disconnection'),
+                (wpath.postdisconnectscripts, self.post_disconnect_script,
+                 'post-disconnection')):
+            misc.ExecuteScripts(script_dir, self.debug,
+                                extra_parameters=(nettype, name, mac))
+            self.run_script_if_needed(script, msg, mac, name)
+
     @abortable
     def release_dhcp_clients(self, iface):
         """ Release all running dhcp clients. """
@@ -539,6 +619,11 @@ class ConnectThread(threading.Thread):
         self.is_connecting = False
         print('exiting connection thread')
         
+    def cancel(self):
+        """ Abort the connection, stopping what it is waiting for. """
+        self.should_die = True
+        self.token.cancel()
+
     def abort_connection(self, reason=""):
         """ Schedule a connection abortion for the given reason. """
         self.abort_reason = reason
@@ -567,7 +652,7 @@ class ConnectThread(threading.Thread):
         self.SetStatus('interface_up')
         iface.Up()
         for x in range(0, 5):
-            time.sleep(2)
+            cancel.sleep(2)
             if iface.IsUp():
                 return
             self.abort_if_needed()
@@ -583,6 +668,7 @@ class Wireless(Controller):
         """ Initialize the class. """
         Controller.__init__(self, debug=debug)
         self._wpa_driver = None
+        self._keep_supplicant = False
         self._wireless_interface = None
         self.wiface = None 
         self.should_verify_ap = True
@@ -606,6 +692,16 @@ class Wireless(Controller):
         """ Getter for wpa_driver property. """
         return self._wpa_driver
     wpa_driver = property(get_wpa_driver, set_wpa_driver)
+
+    def set_keep_supplicant(self, value):
+        """ Setter for keep_supplicant property. """
+        self._keep_supplicant = value
+        if self.wiface:
+            self.wiface.SetKeepSupplicant(value)
+    def get_keep_supplicant(self):
+        """ Getter for keep_supplicant property. """
+        return self._keep_supplicant
+    keep_supplicant = property(get_keep_supplicant, set_keep_supplicant)
     
     def set_iface(self, value):
         """ Setter for iface property. """
@@ -627,12 +723,17 @@ class Wireless(Controller):
         if backend:
             self.wiface = backend.WirelessInterface(self.wireless_interface,
                                                     self.debug, self.wpa_driver)
+            self.wiface.SetKeepSupplicant(self.keep_supplicant)
 
-    def Scan(self, essid=None):
+    def Scan(self, essid=None, callback=None, max_age=None):
         """ Scan for available wireless networks.
 
         Keyword arguments:
         essid -- The essid of a hidden network
+        callback -- if given, called with every network as soon as
+                    the scan finds it
+        max_age -- if given, the kernel's scan cache is used instead
+                   of scanning, unless it is older than max_age seconds
 
         Returns:
         A list of available networks sorted by strength.
@@ -664,16 +765,30 @@ class Wireless(Controller):
             # sleep for a bit; scanning to fast will result in nothing
             time.sleep(1)
 
-        aps = wiface.GetNetworks(essid)
+        if callback is None and max_age is None:
+            aps = wiface.GetNetworks(essid)
+        else:
+            access_points = {}
+            for ap in wiface.IterNetworks(essid, max_age):
+                # Only keep the entry with the real essid of hidden
+                # networks, like GetNetworks() does.
+                if ap['bssid'] in access_points and ap['hidden']:
+                    continue
+                access_points[ap['bssid']] = ap
+                if callback is not None:
+                    callback(ap)
+            aps = list(access_points.values())
         aps.sort(key=cmp_to_key(comp), reverse=True)
         
         return aps
 
-    def Connect(self, network, debug=False):
+    def Connect(self, network, debug=False, resume=False):
         """ Spawn a connection thread to connect to the network.
 
         Keyword arguments:
         network -- network to connect to
+        resume -- whether to try rejoining the network without tearing
+                  the connection down first
 
         """
         if not self.wiface:
@@ -685,7 +800,7 @@ class Wireless(Controller):
             self.post_disconnect_script, self.global_dns_1,
             self.global_dns_2, self.global_dns_3, self.global_dns_dom,
             self.global_search_dom, self.wiface, self.should_verify_ap,
-            self.bitrate, self.allow_lower_bitrates, debug)
+            self.bitrate, self.allow_lower_bitrates, debug, resume)
         self.connecting_thread.setDaemon(True)
         self.connecting_thread.start()
         return True
@@ -719,7 +834,7 @@ class Wireless(Controller):
             return self.connecting_thread.network['essid']
         return self.wiface.GetCurrentNetwork(iwconfig)
     
-    def GetBSSID(self):
+    def GetBSSID(self, iwconfig=None):
         """ Get the BSSID of the current access point. 
         
         Returns:
@@ -727,7 +842,7 @@ class Wireless(Controller):
         None the BSSID can't be found.
         
         """
-        return self.wiface.GetBSSID()
+        return self.wiface.GetBSSID(iwconfig)
 
     def GetCurrentBitrate(self, iwconfig):
         """ Get the current bitrate of the interface. 
@@ -896,10 +1011,13 @@ class WirelessConnectThread(ConnectThread):
 
     """
 
+    nettype = 'wireless'
+
     def __init__(self, network, wireless, wpa_driver, before_script,
                  after_script, pre_disconnect_script, post_disconnect_script,
                  gdns1, gdns2, gdns3, gdns_dom, gsearch_dom, wiface, 
-                 should_verify_ap, bitrate, allow_lower_bitrates, debug=False):
+                 should_verify_ap, bitrate, allow_lower_bitrates, debug=False,
+                 resume=False):
         """ Initialise the thread with network information.
 
         Keyword arguments:
@@ -915,6 +1033,8 @@ class WirelessConnectThread(ConnectThread):
         gdns3 -- global DNS server 3
         bitrate -- chosen interface bitrate
         allow_lower_bitrates -- whether to allow lower bitrates or not
+        resume -- whether to try rejoining the network the connection
+                  was just lost to, keeping the address, routes and DNS
 
         """
         ConnectThread.__init__(self, network, wireless, before_script, 
@@ -925,6 +1045,7 @@ class WirelessConnectThread(ConnectThread):
         self.should_verify_ap = should_verify_ap
         self.bitrate = bitrate
         self.allow_lower_bitrates = allow_lower_bitrates
+        self.resume = resume
 
     def _connect(self):
         """ The main function of the connection thread.
@@ -939,10 +1060,27 @@ class WirelessConnectThread(ConnectThread):
         4. Associate with the WAP.
         5. Get/set IP address and DNS servers.
 
+        If the connection is resumed, _resume() is tried first, and
+        the steps above only run if it fails.
+
         """
         wiface = self.iface
         self.is_connecting = True
-        
+
+        if self.resume:
+            if self._resume(wiface):
+                self._connected(wiface)
+                return
+            print('Resuming the connection failed, reconnecting...')
+            self.run_disconnect_scripts('wireless', self.network['essid'],
+                                        self.network['bssid'])
+
+        with timings.time('full'):
+            self._full_connect(wiface)
+        self._connected(wiface)
+
+    def _full_connect(self, wiface):
+        """ Tear down the interface and connect from scratch. """
         # Run pre-connection script.
         self.run_global_scripts_if_needed(wpath.preconnectscripts,
                                           extra_parameters=('wireless',
@@ -972,8 +1110,7 @@ class WirelessConnectThread(ConnectThread):
             self.generate_psk_and_authenticate(wiface)
             
         # Associate.
-        wiface.Associate(self.network['essid'], self.network['channel'],
-                         self.network['bssid'])
+        self.associate(wiface)
 
         # Authenticate after association for Ralink legacy cards.
         if self.wpa_driver == 'ralink legacy':
@@ -982,11 +1119,7 @@ class WirelessConnectThread(ConnectThread):
                 
         # Validate Authentication.
         if self.network.get('enctype'):
-            self.SetStatus('validating_authentication')
-            if not wiface.ValidateAuthentication(time.time()):
-                print(("connect result is %s" % self.connect_result))
-                if not self.connect_result or self.connect_result == 'failed':
-                    self.abort_connection('bad_pass')
+            self.validate_authentication(wiface)
 
         # Set up gateway, IP address, and DNS servers.
         self.set_broadcast_address(wiface)
@@ -1003,12 +1136,89 @@ class WirelessConnectThread(ConnectThread):
         self.run_script_if_needed(self.after_script, 'post-connection', 
                                   self.network['bssid'], self.network['essid'])
 
+    @abortable
+    def associate(self, wiface):
+        """ Associate with the access point. """
+        wiface.Associate(self.network['essid'], self.network['channel'],
+                         self.network['bssid'])
+
+    @abortable
+    def validate_authentication(self, wiface):
+        """ Wait for wpa_supplicant to authenticate. """
+        self.SetStatus('validating_authentication')
+        if not wiface.ValidateAuthentication(time.time()):
+            print(("connect result is %s" % self.connect_result))
+            if not self.connect_result or self.connect_result == 'failed':
+                self.abort_connection('bad_pass')
+
+    def _connected(self, wiface):
+        """ Mark the connection as made. """
         self.SetStatus('done')
         print('Connecting thread exiting.')
         if self.debug:
             print(("IP Address is: " + str(wiface.GetIP())))
         self.connect_result = "success"
         self.is_connecting = False
+
+    def _resume(self, wiface):
+        """ Rejoin the network the connection was just lost to.
+
+        The address, routes and DNS servers are kept; the interface
+        only associates again, the authentication is validated and the
+        address revalidated, all within RESUME_TIMEOUT seconds.
+
+        Returns:
+        True if the connection is back, False if it has to be made
+        from scratch.
+
+        """
+        print('Resuming connection to ' + self.network['essid'])
+        deadline = time.time() + RESUME_TIMEOUT
+        self.strategy = 'resume'
+        try:
+            with timings.time('resume'):
+                return (self.reassociate(wiface) and
+                        self.revalidate_authentication(wiface, deadline) and
+                        self.revalidate_address(wiface, deadline) and
+                        time.time() < deadline)
+        finally:
+            self.strategy = 'full'
+
+    @abortable
+    def reassociate(self, wiface):
+        """ Associate again with the access point. """
+        self.SetStatus('reassociating')
+        return wiface.Reassociate(self.network)
+
+    @abortable
+    def revalidate_authentication(self, wiface, deadline):
+        """ Wait for the association to complete before the deadline. """
+        if self.network.get('enctype'):
+            self.SetStatus('validating_authentication')
+            return wiface.ValidateAuthentication(time.time(),
+                                                 deadline - time.time())
+        bssid = str(self.network.get('bssid')).upper()
+        while time.time() < deadline:
+            if str(wiface.GetBSSID()).upper() == bssid:
+                return True
+            cancel.sleep(0.5)
+            self.abort_if_needed()
+        return False
+
+    @abortable
+    def revalidate_address(self, wiface, deadline):
+        """ Check the address is still valid before the deadline.
+
+        A static address has to be still set; a lease is requested
+        again, which the DHCP clients do for the one they hold.
+
+        """
+        if time.time() >= deadline:
+            return False
+        if self.network.get('ip'):
+            return wiface.GetIP() == self.network['ip']
+        self.SetStatus('running_dhcp')
+        return self.start_dhcp(wiface) == 'success'
         
     @abortable
     def verify_association(self, iface):
@@ -1028,7 +1238,7 @@ class WirelessConnectThread(ConnectThread):
                 if retcode == 0: 
                     print("Successfully associated.")
                     break
-                time.sleep(1)
+                cancel.sleep(1)
             #TODO this should be in wnettools.py
             if retcode:
                 print("Connection Failed: Failed to ping the access point!")
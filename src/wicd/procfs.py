@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd procfs and sysfs readers
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Reads the state of interfaces without running any program.
+
+The files under /proc and /sys are opened once and read again from
+their start with pread(), and the socket for the ioctls is kept open,
+so polling an interface costs a few system calls instead of a fork of
+ifconfig, iwconfig or route.
+
+class PersistentFile() -- A file kept open and read from its start.
+read() -- Read a file through a PersistentFile.
+forget() -- Close every file and the socket.
+get_flags() -- The IFF_* flags of an interface.
+get_carrier() -- Whether an interface has a carrier.
+get_operstate() -- The operational state of an interface.
+get_default_gateway() -- The gateway of the default route.
+get_wireless_stats() -- The link quality and signal level of a wireless
+                        interface.
+get_ip() -- The IPv4 address of an interface.
+get_bssid() -- The access point a wireless interface is associated to.
+get_essid() -- The network a wireless interface is associated to.
+get_bitrate() -- The bitrate of a wireless interface.
+
+"""
+
+import array
+import fcntl
+import os
+import socket
+import struct
+
+ROUTE = '/proc/net/route'
+WIRELESS = '/proc/net/wireless'
+SYS_NET = '/sys/class/net/%s/%s'
+
+# Larger than any of the files read; a shorter read hits the end.
+READ_SIZE = 65536
+
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+
+# From linux/sockios.h and linux/wireless.h
+SIOCGIFADDR = 0x8915
+SIOCGIWAP = 0x8B15
+SIOCGIWESSID = 0x8B1B
+SIOCGIWRATE = 0x8B21
+IFNAMSIZ = 16
+IW_ESSID_MAX_SIZE = 32
+
+# The best link quality cfg80211 reports for drivers measuring the
+# signal in dBm; the others report a percentage.
+MAX_DBM_QUALITY = 70
+
+_files = {}
+_sock = None
+
+
+class PersistentFile(object):
+    """ A file that is kept open and read from its start every time. """
+    def __init__(self, path):
+        """ Initialize without opening the file yet.
+
+        Keyword arguments:
+        path -- the path of the file
+
+        """
+        self.path = path
+        self.fd = None
+
+    def close(self):
+        """ Close the file; the next read() opens it again. """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _read(self):
+        """ Read the whole file with pread(). """
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+        chunks = []
+        offset = 0
+        while True:
+            data = os.pread(self.fd, READ_SIZE, offset)
+            chunks.append(data)
+            if len(data) < READ_SIZE:
+                return b''.join(chunks).decode('utf-8', 'replace')
+            offset += len(data)
+
+    def read(self):
+        """ Read the file.
+
+        A file of an interface that was removed fails to read even if
+        the interface is back, so a failed read opens the file again.
+
+        Returns:
+        The contents of the file, or None if it can't be read.
+
+        """
+        for attempt in range(2):
+            try:
+                return self._read()
+            except OSError:
+                self.close()
+        return None
+
+
+def read(path):
+    """ Returns the contents of a file kept open, or None. """
+    persistent = _files.get(path)
+    if persistent is None:
+        persistent = _files[path] = PersistentFile(path)
+    return persistent.read()
+
+
+def forget():
+    """ Close every file and the socket kept open. """
+    global _sock
+    for persistent in _files.values():
+        persistent.close()
+    _files.clear()
+    if _sock is not None:
+        _sock.close()
+        _sock = None
+
+
+def _read_int(iface, name, base=10):
+    """ Returns an integer sysfs attribute of an interface, or None. """
+    value = read(SYS_NET % (iface, name))
+    try:
+        return int(value, base)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_flags(iface):
+    """ Returns the IFF_* flags of an interface, or None. """
+    return _read_int(iface, 'flags', 16)
+
+
+def get_carrier(iface):
+    """ Returns 1 if an interface has a carrier, 0 if not, or None. """
+    return _read_int(iface, 'carrier')
+
+
+def get_operstate(iface):
+    """ Returns the operational state of an interface, eg. 'up', or None. """
+    state = read(SYS_NET % (iface, 'operstate'))
+    if state is None:
+        return None
+    return state.strip()
+
+
+def get_default_gateway():
+    """ Find the gateway of the default route in /proc/net/route.
+
+    Returns:
+    The gateway in dotted quad form, '' if there is no default route,
+    or None if the routing table can't be read.
+
+    """
+    table = read(ROUTE)
+    if table is None:
+        return None
+    for line in table.splitlines()[1:]:
+        words = line.split()
+        if len(words) < 4 or words[1] != '00000000':
+            continue
+        if int(words[3], 16) & (RTF_UP | RTF_GATEWAY) == RTF_UP | RTF_GATEWAY:
+            return socket.inet_ntoa(struct.pack('<L', int(words[2], 16)))
+    return ''
+
+
+def get_wireless_stats(iface):
+    """ Find the signal of a wireless interface in /proc/net/wireless.
+
+    Returns:
+    A tuple of the link quality as a percentage and the signal level,
+    in dBm if the driver measures it so, or None if the interface
+    isn't listed.
+
+    """
+    stats = read(WIRELESS)
+    if stats is None:
+        return None
+    prefix = iface + ':'
+    for line in stats.splitlines()[2:]:
+        words = line.split()
+        if len(words) < 4 or words[0] != prefix:
+            continue
+        try:
+            link = int(float(words[2]))
+            level = int(float(words[3]))
+        except ValueError:
+            return None
+        if level < 0:
+            return min(100, 100 * link // MAX_DBM_QUALITY), level
+        return link, level
+    return None
+
+
+def _ioctl(iface, request, arg=b''):
+    """ Run an interface ioctl on the socket kept open.
+
+    Keyword arguments:
+    iface -- the name of the interface
+    request -- the ioctl request
+    arg -- the request's data after the interface name
+
+    Returns:
+    The data after the interface name the kernel filled in, or None if
+    the ioctl failed.
+
+    """
+    global _sock
+    if _sock is None:
+        _sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    ifreq = struct.pack('%ds' % IFNAMSIZ, iface.encode()) + \
+        arg.ljust(IFNAMSIZ, b'\0')
+    try:
+        return fcntl.ioctl(_sock.fileno(), request, ifreq)[IFNAMSIZ:]
+    except OSError:
+        return None
+
+
+def get_ip(iface):
+    """ Returns the IPv4 address of an interface, or None. """
+    result = _ioctl(iface, SIOCGIFADDR)
+    if result is None:
+        return None
+    return socket.inet_ntoa(result[4:8])
+
+
+def get_bssid(iface):
+    """ Returns the BSSID a wireless interface is associated to, or None. """
+    result = _ioctl(iface, SIOCGIWAP)
+    if result is None:
+        return None
+    bssid = result[2:8]
+    # Not associated; iwconfig shows these as Not-Associated.
+    if bssid in (b'\0' * 6, b'\xff' * 6, b'\x44' * 6):
+        return None
+    return ':'.join('%02X' % byte for byte in bssid)
+
+
+def get_essid(iface):
+    """ Returns the ESSID a wireless interface is associated to, or None. """
+    buff = array.array('B', bytes(IW_ESSID_MAX_SIZE + 1))
+    addr, length = buff.buffer_info()
+    result = _ioctl(iface, SIOCGIWESSID, struct.pack('PHH', addr, length, 0))
+    if result is None:
+        return None
+    _, length, _ = struct.unpack_from('PHH', result)
+    essid = buff.tobytes()[:length].rstrip(b'\0')
+    if not essid:
+        return None
+    return essid.decode('utf-8', 'replace')
+
+
+def get_bitrate(iface):
+    """ Returns the bitrate of a wireless interface like iwconfig, or None.
+
+    Returns:
+    The bitrate as a string, eg. '54 Mb/s'.
+
+    """
+    result = _ioctl(iface, SIOCGIWRATE)
+    if result is None:
+        return None
+    rate, = struct.unpack_from('i', result)
+    if rate <= 0:
+        return None
+    for scale, unit in ((1e9, 'Gb/s'), (1e6, 'Mb/s'), (1e3, 'kb/s')):
+        if rate >= scale:
+            return '%g %s' % (rate / scale, unit)
+    return '%d b/s' % rate
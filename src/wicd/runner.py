@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd command runner
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Runs external commands with as little overhead as possible.
+
+Commands are started with posix_spawn() in a fixed environment that
+forces the C locale, so their output can be parsed, and programs are
+looked up on the PATH only once.  Like subprocess does, they run from
+the root directory with the signals Python ignores set back to their
+defaults; posix_spawn() can't change the directory, so processes that
+aren't in the root directory, as the daemon is, fall back to
+subprocess.  Every command run is timed, and
+terminated if the cancel token of the thread is cancelled.
+
+which() -- Find the path of a program, caching the result.
+forget_paths() -- Forget the cached program paths.
+observe() -- Watch the commands a thread runs.
+notify() -- Tell the observer of the thread about a command.
+run() -- Run a command and collect its output.
+
+"""
+
+import errno
+import os
+import selectors
+import shutil
+import signal
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from subprocess import PIPE, STDOUT, Popen, TimeoutExpired
+
+from wicd import cancel
+from wicd.daemon.timings import PhaseTimings
+
+DEFAULT_PATH = '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'
+
+# The environment of every command: English output for parsing, and
+# the PATH for commands that run others.
+ENV = {'LANG': 'C', 'LC_ALL': 'C',
+       'PATH': os.environ.get('PATH') or DEFAULT_PATH}
+
+# The directory commands run in.
+CWD = '/'
+
+# Python ignores these, programs expect their default handlers.
+DEFAULT_SIGNALS = tuple(getattr(signal, name)
+                        for name in ('SIGPIPE', 'SIGXFSZ')
+                        if hasattr(signal, name))
+
+READ_SIZE = 65536
+
+# Seconds a cancelled command gets to exit before it is killed.
+TERMINATE_GRACE = 0.1
+
+CommandResult = namedtuple('CommandResult', 'returncode out err elapsed')
+
+# How long the commands took, by program name.
+timings = PhaseTimings()
+
+_paths = {}
+_observers = threading.local()
+
+
+def which(program):
+    """ Find the path of a program on the PATH.
+
+    The result is cached, whether the program was found or not, until
+    forget_paths() is called.
+
+    Returns:
+    The path, or None if the program wasn't found.
+
+    """
+    if os.sep in program:
+        return program
+    try:
+        return _paths[program]
+    except KeyError:
+        path = _paths[program] = shutil.which(program, path=ENV['PATH'])
+        return path
+
+
+def forget_paths():
+    """ Forget the cached program paths, eg. after packages changed. """
+    _paths.clear()
+
+
+@contextmanager
+def observe(callback):
+    """ Watch the commands the current thread runs.
+
+    Keyword arguments:
+    callback -- called as callback(args, returncode, elapsed) for every
+                command the thread runs in the body of the with
+                statement; returncode is None if the command timed out
+                or the caller waits for it, elapsed None if unknown
+
+    """
+    previous = getattr(_observers, 'callback', None)
+    _observers.callback = callback
+    try:
+        yield
+    finally:
+        _observers.callback = previous
+
+
+def notify(args, returncode=None, elapsed=None):
+    """ Tell the observer of the current thread about a command. """
+    callback = getattr(_observers, 'callback', None)
+    if callback is not None:
+        callback(args, returncode, elapsed)
+
+
+def _collect(fds, deadline):
+    """ Read the pipes until they are closed or the deadline passed.
+
+    The cancel token of the thread is waited for as well.
+
+    Returns:
+    A tuple of a dict mapping each fd to the bytes read from it, and
+    'timeout' if the deadline passed first, 'cancelled' if the token
+    was cancelled first or None.
+
+    """
+    chunks = dict((fd, []) for fd in fds)
+    token = cancel.current()
+    with selectors.DefaultSelector() as selector:
+        for fd in fds:
+            selector.register(fd, selectors.EVENT_READ)
+        if token is not None:
+            if token.cancelled:
+                return chunks, 'cancelled'
+            selector.register(token.fileno(), selectors.EVENT_READ)
+        while len(selector.get_map()) > (token is not None):
+            if deadline is None:
+                wait = None
+            else:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return chunks, 'timeout'
+            for key, _ in selector.select(wait):
+                if token is not None and key.fd == token.fileno():
+                    return chunks, 'cancelled'
+                data = os.read(key.fd, READ_SIZE)
+                if data:
+                    chunks[key.fd].append(data)
+                else:
+                    selector.unregister(key.fd)
+    return chunks, None
+
+
+def _spawn(path, args, out_w, err_w):
+    """ Start a command writing to the given descriptors.
+
+    Keyword arguments:
+    path -- the path of the program
+    args -- the program and its arguments
+    out_w -- the descriptor for the output
+    err_w -- the descriptor for the error output, None to inherit ours
+
+    Returns:
+    The pid of the command, and the Popen that started it if
+    posix_spawn() couldn't, which waitpid() results have to be handed
+    to.
+
+    """
+    if os.getcwd() == CWD:
+        actions = [(os.POSIX_SPAWN_DUP2, out_w, 1)]
+        if err_w is not None:
+            actions.append((os.POSIX_SPAWN_DUP2, err_w, 2))
+        return os.posix_spawn(path, args, ENV, file_actions=actions,
+                              setsigdef=DEFAULT_SIGNALS), None
+    process = Popen(args, executable=path, stdin=None, stdout=out_w,
+                    stderr=err_w, cwd=CWD, env=ENV, restore_signals=True)
+    return process.pid, process
+
+
+def _terminate(pid):
+    """ Terminate a child, killing it if it doesn't exit in time.
+
+    Returns:
+    The wait status of the child.
+
+    """
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + TERMINATE_GRACE
+    while time.monotonic() < deadline:
+        waited, status = os.waitpid(pid, os.WNOHANG)
+        if waited:
+            return status
+        time.sleep(0.005)
+    os.kill(pid, signal.SIGKILL)
+    return os.waitpid(pid, 0)[1]
+
+
+def run(args, stderr=None, timeout=None):
+    """ Run a command and collect its output.
+
+    Keyword arguments:
+    args -- the program and its arguments as a list
+    stderr -- None to leave stderr alone, STDOUT to merge it into the
+              output or PIPE to collect it separately
+    timeout -- seconds after which the command is killed
+
+    Returns:
+    A CommandResult of the exit status, the output and error output
+    as bytes, and the seconds the command took.
+
+    Raises:
+    OSError if the command couldn't be started, TimeoutExpired if it
+    was killed at the deadline, cancel.Cancelled if it was terminated
+    because the cancel token of the thread was cancelled.
+
+    """
+    token = cancel.current()
+    if token is not None:
+        token.check()
+    path = which(args[0])
+    if path is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT),
+                                args[0])
+    start = time.monotonic()
+    if timeout is None:
+        deadline = None
+    else:
+        deadline = start + timeout
+
+    pipes = []
+    try:
+        out_r, out_w = os.pipe()
+        pipes += [out_r, out_w]
+        err_w = None
+        if stderr == STDOUT:
+            err_w = out_w
+        elif stderr == PIPE:
+            err_r, err_w = os.pipe()
+            pipes += [err_r, err_w]
+        pid, process = _spawn(path, args, out_w, err_w)
+        # Only the child writes; close ours to see it finish.
+        for fd in pipes[1::2]:
+            os.close(fd)
+        del pipes[1::2]
+        chunks, stopped = _collect(pipes, deadline)
+    finally:
+        for fd in pipes:
+            os.close(fd)
+
+    if stopped == 'timeout':
+        os.kill(pid, signal.SIGKILL)
+    if stopped == 'cancelled':
+        status = _terminate(pid)
+    else:
+        _, status = os.waitpid(pid, 0)
+    if process is not None:
+        # Reaped already; keep Popen from waiting for it again.
+        process.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.monotonic() - start
+    timings.record(os.path.basename(path), elapsed)
+
+    out = b''.join(chunks[out_r])
+    if stderr == PIPE:
+        err = b''.join(chunks[err_r])
+    else:
+        err = b''
+    if stopped:
+        notify(args, None, elapsed)
+        if stopped == 'cancelled':
+            raise cancel.Cancelled()
+        raise TimeoutExpired(args, timeout, out, err)
+    returncode = os.waitstatus_to_exitcode(status)
+    notify(args, returncode, elapsed)
+    return CommandResult(returncode, out, err, elapsed)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd managed wpa_supplicant
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Keeps one wpa_supplicant running per wireless interface.
+
+Instead of killing wpa_supplicant and starting it again with a new
+config file for every connection, the networks are added to a running
+wpa_supplicant over its control interface and switched to with
+SELECT_NETWORK, which saves starting the process, initializing the
+driver and the first scan.
+
+parse_config() -- Split a wpa_supplicant config into its settings.
+class ManagedSupplicant() -- A wpa_supplicant kept running for an
+                             interface.
+get() -- The ManagedSupplicant of an interface.
+forget() -- Forget every ManagedSupplicant.
+
+"""
+
+import time
+
+from wicd import cancel
+from wicd import misc
+from wicd import wpactrl
+
+# Seconds to wait for the control interface of a started wpa_supplicant.
+START_TIMEOUT = 5
+
+# Global settings that can't be changed in a running wpa_supplicant,
+# or that it is started with.
+_fixed_settings = ('ctrl_interface', 'ctrl_interface_group')
+
+_supplicants = {}
+
+
+class SupplicantError(Exception):
+    """ wpa_supplicant refused a command. """
+
+
+def parse_config(config):
+    """ Split a wpa_supplicant config into its settings.
+
+    Keyword arguments:
+    config -- the config as written by misc.ParseEncryption()
+
+    Returns:
+    A tuple of a list of the global (key, value) settings and a list
+    of the networks, each a list of (key, value) settings.
+
+    """
+    settings = []
+    networks = []
+    network = None
+    for line in config.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if network is None and line.replace(' ', '') == 'network={':
+            network = []
+        elif network is not None and line == '}':
+            networks.append(network)
+            network = None
+        else:
+            key, sep, value = line.partition('=')
+            if not sep:
+                continue
+            if network is None:
+                settings.append((key.strip(), value.strip()))
+            else:
+                network.append((key.strip(), value.strip()))
+    return settings, networks
+
+
+class ManagedSupplicant(object):
+    """ A wpa_supplicant kept running for a wireless interface. """
+    def __init__(self, iface, driver=None, ctrl_dir=None):
+        """ Initialize without starting wpa_supplicant yet.
+
+        Keyword arguments:
+        iface -- the name of the interface
+        driver -- the driver for wpa_supplicant's -D, or None
+        ctrl_dir -- the directory of the control interface sockets,
+                    wpactrl.CTRL_DIR if None
+
+        """
+        self.iface = iface
+        self.driver = driver
+        self.ctrl_dir = ctrl_dir or wpactrl.CTRL_DIR
+        self.ctrl = None
+        # Maps a network's key to its id and settings in wpa_supplicant.
+        self.networks = {}
+
+    def _get_ctrl(self):
+        """ Returns the control interface, or None if it isn't running. """
+        ctrl = wpactrl.get_ctrl(self.iface, self.ctrl_dir)
+        if ctrl is not self.ctrl:
+            # A new wpa_supplicant knows none of our networks.
+            self.networks.clear()
+            self.ctrl = ctrl
+        return ctrl
+
+    def start(self):
+        """ Start wpa_supplicant unless it is running already.
+
+        A wpa_supplicant started for the interface by someone else is
+        used as well.
+
+        Returns:
+        The wpactrl.WpaCtrl of wpa_supplicant, or None if it didn't
+        start.
+
+        """
+        ctrl = self._get_ctrl()
+        if ctrl is not None:
+            return ctrl
+        self._spawn()
+        deadline = time.monotonic() + START_TIMEOUT
+        while True:
+            ctrl = self._get_ctrl()
+            if ctrl is not None or time.monotonic() >= deadline:
+                return ctrl
+            cancel.sleep(0.05)
+
+    def _spawn(self):
+        """ Run wpa_supplicant in the background without a config file. """
+        cmd = ['wpa_supplicant', '-B', '-i', self.iface, '-C', self.ctrl_dir]
+        if self.driver:
+            cmd.append('-D' + self.driver)
+        misc.Run(cmd)
+
+    def _request(self, command):
+        """ Send a command that has to be answered with OK.
+
+        Raises SupplicantError if it wasn't.
+
+        """
+        reply = self.ctrl.request(command)
+        if not reply.startswith('OK'):
+            raise SupplicantError('%s: %s' % (command, reply.strip()))
+        return reply
+
+    def _configure(self, key, settings):
+        """ Add a network, or update it if it was added before.
+
+        Keyword arguments:
+        key -- what the network is known as, eg. its BSSID
+        settings -- the network's (key, value) settings
+
+        Returns:
+        The id of the network in wpa_supplicant.
+
+        """
+        wanted = dict(settings)
+        known = self.networks.get(key)
+        if known is not None and set(known[1]) != set(wanted):
+            # Settings of another encryption can't be unset one by one.
+            del self.networks[key]
+            self._request('REMOVE_NETWORK %s' % known[0])
+            known = None
+        if known is None:
+            reply = self.ctrl.request('ADD_NETWORK').strip()
+            if not reply.isdigit():
+                raise SupplicantError('ADD_NETWORK: %s' % reply)
+            known = (reply, {})
+        network_id, current = known
+        # Remembered only once complete, so a failure starts over.
+        self.networks.pop(key, None)
+        for name, value in settings:
+            if current.get(name) != value:
+                self._request('SET_NETWORK %s %s %s' %
+                              (network_id, name, value))
+        self.networks[key] = (network_id, wanted)
+        return network_id
+
+    def connect(self, key, config):
+        """ Switch wpa_supplicant to a network.
+
+        Keyword arguments:
+        key -- what the network is known as, eg. its BSSID
+        config -- the network's config as made by misc.RenderEncryption()
+
+        Returns:
+        True if wpa_supplicant is connecting to the network, False if
+        it isn't running or the config has no network.
+
+        Raises SupplicantError if wpa_supplicant refused the config,
+        OSError if it went away.
+
+        """
+        settings, networks = parse_config(config)
+        if len(networks) != 1 or self.start() is None:
+            return False
+        for name, value in settings:
+            if name == 'ap_scan':
+                self._request('AP_SCAN %s' % value)
+            elif name not in _fixed_settings:
+                self._request('SET %s %s' % (name, value))
+        network_id = self._configure(key, networks[0])
+        self._request('SELECT_NETWORK %s' % network_id)
+        self._request('REASSOCIATE')
+        return True
+
+    def disconnect(self):
+        """ Disconnect, keeping wpa_supplicant and its networks.
+
+        Returns:
+        True if wpa_supplicant disconnected, False if it isn't running.
+
+        """
+        ctrl = self._get_ctrl()
+        if ctrl is None:
+            return False
+        try:
+            return ctrl.request('DISCONNECT').startswith('OK')
+        except OSError:
+            return False
+
+    def stop(self):
+        """ Terminate wpa_supplicant. """
+        ctrl = self._get_ctrl()
+        self.networks.clear()
+        if ctrl is not None:
+            try:
+                ctrl.request('TERMINATE')
+            except OSError:
+                pass
+
+
+def get(iface, driver=None, ctrl_dir=None):
+    """ Returns the ManagedSupplicant of an interface.
+
+    Keyword arguments:
+    iface -- the name of the interface
+    driver -- the driver for wpa_supplicant's -D, or None
+    ctrl_dir -- the directory of the control interface sockets,
+                wpactrl.CTRL_DIR if None
+
+    """
+    supplicant = _supplicants.get(iface)
+    if supplicant is None:
+        supplicant = _supplicants[iface] = ManagedSupplicant(iface, driver,
+                                                             ctrl_dir)
+    supplicant.driver = driver
+    if ctrl_dir is not None:
+        supplicant.ctrl_dir = ctrl_dir
+    return supplicant
+
+
+def forget():
+    """ Forget every ManagedSupplicant, leaving wpa_supplicant running. """
+    _supplicants.clear()
@@ -18,6 +18,7 @@
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import wicd.errors
 import wicd.utils
+from wicd import runner
 
 import os.path
 import subprocess
@@ -35,29 +36,24 @@ class ExternalCommand(object):
 
         raise wicd.errors.WiCDCommandNotFound(f'Executable not found in {self.path_list}')
 
-    def __call__(self, arg_or_list = [], *args):
+    def __call__(self, arg_or_list = [], *args, timeout = None):
         ''' executes external tool and returns ints output '''
         if isinstance(arg_or_list, str):
             arg_or_list = ( self.path, arg_or_list)  + args
         else:
-            arg_or_list = ( self.path, ) + args
+            arg_or_list = ( self.path, ) + tuple(arg_or_list) + args
 
-        # Run all commands in custom empty env, force english output for parsing
-        env = {}
-        env["LANG"] = env["LC_ALL"] = "C"
-    
+        # The runner's env forces english output for parsing
         try:
-            p = subprocess.Popen(arg_or_list, shell=False, stdout=subprocess.PIPE, stdin=None, stderr=subprocess.PIPE,
-                                 close_fds=True, env=env)
-        except OSError as e:
+            result = runner.run(list(arg_or_list), stderr=subprocess.PIPE,
+                                timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
             raise wicd.errors.WiCDPopenFailure(e)
 
-        out, err = p.communicate()
+        out = result.out.decode()
+        err = result.err.decode()
 
-        out = out.decode()
-        err = err.decode()
-
-        if p.returncode != 0:
-            raise wicd.errors.WiCDCommandFailure(arg_or_list, p.returncode, out ,err)
+        if result.returncode != 0:
+            raise wicd.errors.WiCDCommandFailure(arg_or_list, result.returncode, out ,err)
         else:
             return out,err
@@ -32,19 +32,26 @@ class BaseWirelessInterface() -- Control a wireless network interface.
 #
 import wicd.tools
 
+import io
 import os
 import re
-import random
 import time
 import dbus
 import socket, fcntl
 import shutil
+import ipaddress
 from functools import cmp_to_key
 from shlex import quote
 
 from . import wpath
+from . import cancel
 from . import misc
-from .misc import find_path 
+from . import capabilities
+from . import netlink
+from . import procfs
+from . import supplicant
+from . import wpactrl
+from .accesspoint import AccessPoint, share_bitrates
 
 from wicd import daemon
 
@@ -81,6 +88,15 @@ authmethods_pattern = re.compile('.*Authentication capabilities ' + \
 # Regular expressions for wpa_cli output
 auth_pattern = re.compile('.*wpa_state=(.*?)\n', _re_mode)
 
+# Seconds to wait for wpa_supplicant to authenticate, and to wait
+# while it is disconnected before forcing a rescan.
+MAX_AUTH_TIME = 35
+MAX_DISCONNECTED_TIME = 3
+
+# The events of wpa_supplicant that end or delay authentication.
+AUTH_EVENTS = ('CTRL-EVENT-CONNECTED', 'CTRL-EVENT-DISCONNECTED',
+               'CTRL-EVENT-SSID-TEMP-DISABLED')
+
 RALINK_DRIVER = 'ralink legacy'
 NONE_DRIVER = 'none'
 
@@ -129,22 +145,79 @@ def timedcache(duration=5):
     
     return _timedcache
 
-def GetDefaultGateway():
-    """ Attempts to determine the default gateway by parsing route -n. """
-    route_info = misc.Run("route -n")
-    lines = route_info.split('\n')
-    gateway = None
+# Fields of an iw scan block that IterIwScan() keeps.  The first
+# occurrence wins for most of them, mirroring what a regex search
+# over the whole block used to return.
+_iw_first_fields = frozenset(['SSID', 'DS Parameter set', 'capability',
+                              'signal', 'RSN', 'WPA'])
+_iw_last_fields = frozenset(['freq', 'Supported rates',
+                             'Extended supported rates', 'last seen'])
+
+def IterIwScan(lines):
+    """ Tokenize the output of iw scan in a single pass.
+
+    Walks the given lines once and yields one dict per BSS block.
+    The dict holds the BSSID of the block under 'bssid' and the raw
+    values of the top-level fields wicd is interested in, keyed by
+    their iw field name (e.g. 'SSID', 'freq', 'capability').  Nested
+    lines (information element details) are skipped.
+
+    Keyword arguments:
+    lines -- iterable of lines of iw scan output
+
+    """
+    bss = None
     for line in lines:
-        words = line.split()
-        print(words)
-        if not words:
+        if line.startswith('BSS '):
+            if bss is not None:
+                yield bss
+            bss = {'bssid': line[4:].split('(', 1)[0].strip()}
+            continue
+        if bss is None or line.startswith('\t\t') or not line.startswith('\t'):
+            continue
+        key, sep, value = line[1:].partition(':')
+        if not sep:
+            continue
+        if key in _iw_first_fields:
+            if key in bss:
+                continue
+        elif key not in _iw_last_fields:
             continue
-        if words[0] == '0.0.0.0':
-            gateway = words[1]
-            break
+        # Keep the value verbatim, only drop the separating blank.
+        if value.startswith(' '):
+            value = value[1:]
+        bss[key] = value
+    if bss is not None:
+        yield bss
+
+def _GetBSSAge(bss):
+    """ Returns the seconds since a tokenized BSS was seen, or None. """
+    last_seen = bss.get('last seen', '')
+    if not last_seen.endswith(' ms ago'):
+        return None
+    try:
+        return int(last_seen[:-7]) / 1000.0
+    except ValueError:
+        return None
+
+def GetDefaultGateway():
+    """ Attempts to determine the default gateway.
+
+    Reads /proc/net/route, and parses route -n if it can't be read.
+
+    """
+    gateway = procfs.get_default_gateway()
+    if gateway is None:
+        route_info = misc.Run("route -n")
+        for line in route_info.split('\n'):
+            words = line.split()
+            if words and words[0] == '0.0.0.0':
+                gateway = words[1]
+                break
         
     if not gateway:
-        print('couldn\'t retrieve default gateway from route -n')
+        print('couldn\'t retrieve the default gateway')
+        return None
     return gateway
 
 def isWireless(devname):
@@ -215,23 +288,11 @@ def NeedsExternalCalls():
 
 def GetWpaSupplicantDrivers():
     """ Returns a list of all valid wpa_supplicant drivers. """
-    output = misc.Run(["wpa_supplicant", "-h"])
-    try:
-        output = output.split("drivers:")[1].split("options:")[0].strip()
-    except KeyError:
-        print("Warning: Couldn't get list of valid wpa_supplicant drivers")
-        return [""]
-    patt = re.compile("(\S+)\s+=.*")
-    drivers = patt.findall(output) or [""]
-    # We cannot use the "wired" driver for wireless interfaces.
-    if 'wired' in drivers:
-        drivers.remove('wired')
-    return drivers
+    return list(capabilities.wpa_supplicant_drivers())
+
 def IsValidWpaSuppDriver(driver):
     """ Returns True if given string is a valid wpa_supplicant driver. """
-    output = misc.Run(["wpa_supplicant", "-D%s" % driver, "-iolan19",
-                       "-c/etc/abcd%sdefzz.zconfz" % random.randint(1, 1000)])
-    return not "Unsupported driver" in output
+    return capabilities.valid_wpa_driver(driver)
     
 def neediface(default_response):
     """ A decorator for only running a method if self.iface is defined.
@@ -256,6 +317,13 @@ def neediface(default_response):
 
 class BaseInterface(object):
     """ Control a network interface. """
+    # Backends set this to change addresses and routes over rtnetlink
+    # instead of running ifconfig, ip or route.
+    use_rtnetlink = False
+    # Backends set this to read the state of the interface from procfs
+    # and ioctls instead of running ifconfig and iwconfig.
+    use_procfs = False
+
     def __init__(self, iface, verbose=False):
         """ Initialise the object.
 
@@ -287,6 +355,8 @@ class BaseInterface(object):
         self.gksudo_cmd = None
         self.ktsuss_cmd = None
 
+        self.rtnl = None
+
     def SetDebugMode(self, value):
         """ If True, verbose output is enabled. """
         self.verbose = value
@@ -312,11 +382,46 @@ class BaseInterface(object):
         The full path of the program or None
         
         """
-        path = find_path(program)
+        path = capabilities.find(program)
         if not path and self.verbose:
             print("WARNING: No path found for %s" % program)
         return path
 
+
+    def _rtnetlink(self, method, *args):
+        """ Make a change over rtnetlink, if the backend does.
+
+        Keyword arguments:
+        method -- the name of the netlink.RouteNetlinkSocket method
+        args -- its arguments after the interface index
+
+        Returns:
+        True if the change was made, False if the external tools
+        should make it.
+
+        """
+        if not self.use_rtnetlink:
+            return False
+        if self.rtnl is None:
+            try:
+                self.rtnl = netlink.RouteNetlinkSocket()
+            except OSError as e:
+                print('WARNING: rtnetlink not available, falling back ' +
+                      'to external tools: %s' % e)
+                self.rtnl = False
+        if not self.rtnl:
+            return False
+        if self.verbose:
+            print('rtnetlink %s %s %s' % (method, self.iface,
+                                          ' '.join(map(str, args))))
+        try:
+            getattr(self.rtnl, method)(socket.if_nametoindex(self.iface),
+                                       *args)
+        except OSError as e:
+            print('WARNING: rtnetlink %s on %s failed, falling back ' %
+                  (method, self.iface) + 'to external tools: %s' % e)
+            return False
+        return True
     
     def _get_dhcp_command(self, flavor=None, hostname=None, staticdns=False):
         """ Returns the correct DHCP client command. 
@@ -466,9 +571,7 @@ class BaseInterface(object):
         """
         self.dhclient_cmd = self._find_program_path("dhclient")
         if self.dhclient_cmd != None:
-            output = misc.Run(self.dhclient_cmd + " --version",
-                    include_stderr=True)
-            if '4.' in output:
+            if '4.' in capabilities.dhclient_version():
                 self.dhclient_needs_verbose = True
             else:
                 self.dhclient_needs_verbose = False
@@ -485,7 +588,8 @@ class BaseInterface(object):
         """ Check for the existence of wpa_cli """
         self.wpa_cli_cmd = self._find_program_path("wpa_cli")
         if not self.wpa_cli_cmd:
-            print("wpa_cli not found.  Authentication will not be validated.")
+            print("wpa_cli not found.  Authentication will only be " \
+                "validated over wpa_supplicant's control interface.")
      
     def CheckRouteFlushTool(self):
         """ Check for a route flush tool. """
@@ -544,14 +648,28 @@ class BaseInterface(object):
                 print('WARNING: Invalid IP address found, aborting!')
                 return False
         
+        if ip:
+            if netmask:
+                prefixlen = ipaddress.IPv4Network('0.0.0.0/' +
+                                                  netmask).prefixlen
+            else:
+                # The class of the address, like ifconfig does.
+                first = int(ip.split('.')[0])
+                prefixlen = 8 if first < 128 else 16 if first < 192 else 24
+            if not broadcast:
+                broadcast = str(ipaddress.IPv4Interface(
+                    '%s/%d' % (ip, prefixlen)).network.broadcast_address)
+            if self._rtnetlink('set_address', ip, prefixlen, broadcast):
+                return
+
         args = [self.iface]
 
         if ip:
-            cmd.append(ip)
+            args.append(ip)
         if netmask:
-            cmd.append(netmask)
+            args.extend(['netmask', netmask])
         if broadcast:
-            cmd.extend(['broadcast', broadcast])
+            args.extend(['broadcast', broadcast])
 
         ifconfig_tool(args)
 
@@ -688,7 +806,8 @@ class BaseInterface(object):
         if self.verbose:
             print(cmd)
         self.dhcp_object = misc.Run(cmd, include_stderr=True, return_obj=True)
-        pipe = self.dhcp_object.stdout
+        # Read so that cancelling the connection stops the parsers.
+        pipe = cancel.LineReader(self.dhcp_object.stdout)
         client_dict = { misc.DHCLIENT : self._parse_dhclient,
                         misc.DHCPCD : self._parse_dhcpcd,
                         misc.PUMP : self._parse_pump,
@@ -715,6 +834,9 @@ class BaseInterface(object):
     @neediface(False)
     def DelDefaultRoute(self):
         """ Delete only the default route for a device. """
+        if (self.flush_tool == misc.AUTO and
+            self._rtnetlink('del_default_route')):
+            return
         if self.ip_cmd and self.flush_tool in [misc.AUTO, misc.IP]:
             cmd = '%s route del default dev %s' % (self.ip_cmd, self.iface)
         elif self.route_cmd and self.flush_tool in [misc.AUTO, misc.ROUTE]:
@@ -743,6 +865,8 @@ class BaseInterface(object):
     @neediface(False)
     def FlushRoutes(self):
         """ Flush network routes for this device. """
+        if self.flush_tool == misc.AUTO and self._rtnetlink('flush_routes'):
+            return
         if self.ip_cmd and self.flush_tool in [misc.AUTO, misc.IP]:
             cmds = ['%s route flush dev %s' % (self.ip_cmd, self.iface)]
         elif self.route_cmd and self.flush_tool in [misc.AUTO, misc.ROUTE]:
@@ -766,6 +890,8 @@ class BaseInterface(object):
         if not misc.IsValidIP(gw):
             print('WARNING: Invalid gateway found.  Aborting!')
             return False
+        if self._rtnetlink('add_default_route', gw):
+            return
         cmd = 'route add default gw %s dev %s' % (gw, self.iface)
         if self.verbose:
             print(cmd)
@@ -779,6 +905,8 @@ class BaseInterface(object):
         The IP address of the interface in dotted quad form.
 
         """
+        if not ifconfig and self.use_procfs:
+            return procfs.get_ip(self.iface)
         if not ifconfig:
             output = self.GetIfconfig()
         else:
@@ -798,7 +926,7 @@ class BaseInterface(object):
         trying to ping it.
         
         """
-        if "iputils" in misc.Run(["ping", "-V"]):
+        if capabilities.ping_supports_deadline():
             cmd = "ping -q -w 3 -c 1 %s" % gateway
         else:
             # ping is from inetutils-ping (which doesn't support -w)
@@ -820,18 +948,23 @@ class BaseInterface(object):
         True if the interface is up, False otherwise.
 
         """
-        flags_file = '/sys/class/net/%s/flags' % self.iface
-        try:
-            flags = open(flags_file, "r").read().strip()
-        except IOError:
-            print("Could not open %s, using ifconfig to determine status" \
-                % flags_file)
+        flags = procfs.get_flags(self.iface)
+        if flags is None:
+            print("Could not read the flags of %s, using ifconfig to " \
+                "determine status" % self.iface)
             return self._slow_is_up(ifconfig)
-        return bool(int(flags, 16) & 1)
+        return bool(flags & 1)
     
     @neediface(False)
     def StopWPA(self):
-        """ Terminates wpa using wpa_cli"""
+        """ Terminates wpa_supplicant over its ctrl interface or wpa_cli """
+        ctrl = wpactrl.get_ctrl(self.iface)
+        if ctrl is not None:
+            try:
+                ctrl.request('TERMINATE')
+                return
+            except OSError as e:
+                print('wpa_supplicant control interface failed: %s' % e)
         cmd = 'wpa_cli -i %s terminate' % self.iface
         if self.verbose:
             print(cmd)
@@ -884,30 +1017,21 @@ class BaseWiredInterface(BaseInterface):
         """
         # check for link using /sys/class/net/iface/carrier
         # is usually more accurate
-        sys_device = '/sys/class/net/%s/' % self.iface
-        carrier_path = sys_device + 'carrier'
         if not self.IsUp():
             MAX_TRIES = 3
             tries = 0
             self.Up()
             while True:
                 tries += 1
-                time.sleep(2)
+                cancel.sleep(2)
                 if self.IsUp() or tries > MAX_TRIES:
                     break
       
-        if os.path.exists(carrier_path):
-            carrier = open(carrier_path, 'r')
-            try:
-                link = carrier.read().strip()
-                link = int(link)
-                if link == 1:
-                    return True
-                elif link == 0:
-                    return False
-            except (IOError, ValueError, TypeError):
-                print('Error checking link using /sys/class/net/%s/carrier' \
-                    % self.iface)
+        link = procfs.get_carrier(self.iface)
+        if link == 1:
+            return True
+        elif link == 0:
+            return False
                 
         if self.ethtool_cmd and self.link_detect in [misc.ETHTOOL, misc.AUTO]:
             return self._eth_get_plugged_in()
@@ -929,7 +1053,7 @@ class BaseWiredInterface(BaseInterface):
         if not self.IsUp():
             print('Wired Interface is down, putting it up')
             self.Up()
-            time.sleep(6)
+            cancel.sleep(6)
         if self.verbose:
             print(cmd)
         tool_data = misc.Run(cmd, include_stderr=True)
@@ -956,7 +1080,7 @@ class BaseWiredInterface(BaseInterface):
                          tool_data) is not None:
             print('Wired Interface is down, putting it up')
             self.Up()
-            time.sleep(4)
+            cancel.sleep(4)
             if self.verbose:
                 print(cmd)
             tool_data = misc.Run(cmd, include_stderr=True)
@@ -989,12 +1113,33 @@ class BaseWirelessInterface(BaseInterface):
         """
         BaseInterface.__init__(self, iface, verbose)
         self.wpa_driver = wpa_driver
+        self.keep_supplicant = False
         self.scan_iface = None
         
     def SetWpaDriver(self, driver):
         """ Sets the wpa_driver. """
         self.wpa_driver = _sanitize_string(driver)
 
+    def SetKeepSupplicant(self, value):
+        """ Sets whether wpa_supplicant is kept running between connections. """
+        self.keep_supplicant = bool(value)
+
+    def _GetManagedSupplicant(self):
+        """ Returns the supplicant.ManagedSupplicant of the interface. """
+        if self.wpa_driver == NONE_DRIVER:
+            driver = None
+        else:
+            driver = self.wpa_driver
+        return supplicant.get(self.iface, driver)
+
+    @neediface(False)
+    def StopWPA(self):
+        """ Stops wpa_supplicant, or only disconnects the one kept running. """
+        if self.keep_supplicant and self.wpa_driver != RALINK_DRIVER:
+            if self._GetManagedSupplicant().disconnect():
+                return
+        BaseInterface.StopWPA(self)
+
     @neediface(False)
     def SetEssid(self, essid):
         """ Set the essid of the wireless interface.
@@ -1118,13 +1263,13 @@ class BaseWirelessInterface(BaseInterface):
             print(str(aps))
         return aps
 
-    def _ParseRalinkAccessPoint(self, ap, ralink_info, cell):
+    def _ParseRalinkAccessPoint(self, ap, ralink_info, privacy):
         """ Parse encryption and signal strength info for ralink cards
 
         Keyword arguments:
         ap -- array containing info about the current access point
         ralink_info -- dict containing available network info
-        cell -- string containing cell information
+        privacy -- True if the cell announces the Privacy capability
 
         Returns:
         Updated array containing info about the current access point
@@ -1134,10 +1279,7 @@ class BaseWirelessInterface(BaseInterface):
             info = ralink_info[ap['bssid']]
             for key in list(info.keys()):
                 ap[key] = info[key]
-            if misc.RunRegex(wep_pattern, cell) == 'on':
-                ap['encryption'] = True
-            else:
-                ap['encryption'] = False
+            ap['encryption'] = privacy
         return ap
 
     @neediface(False)
@@ -1230,6 +1372,34 @@ class BaseWirelessInterface(BaseInterface):
                 print(cmd)
             misc.Run(cmd)
         
+    @neediface(False)
+    def Reassociate(self, network):
+        """ Associate again with the network the interface dropped from.
+
+        wpa_supplicant is asked to reassociate if the network is
+        encrypted, so its config doesn't have to be written again.
+
+        Keyword arguments:
+        network -- dictionary containing network info
+
+        Returns:
+        True if reassociating was started, False if wpa_supplicant
+        isn't running to do it.
+
+        """
+        if not network.get('enctype') or self.wpa_driver == RALINK_DRIVER:
+            self.Associate(network['essid'], network.get('channel'),
+                           network.get('bssid'))
+            return True
+        ctrl = wpactrl.get_ctrl(self.iface)
+        if ctrl is None:
+            return False
+        try:
+            return ctrl.request('REASSOCIATE').startswith('OK')
+        except OSError as e:
+            print('wpa_supplicant control interface failed: %s' % e)
+            return False
+
     def GeneratePSK(self, network):
         """ Generate a PSK using wpa_passphrase. 
 
@@ -1237,7 +1407,7 @@ class BaseWirelessInterface(BaseInterface):
         network -- dictionary containing network info
         
         """
-        wpa_pass_path = misc.find_path('wpa_passphrase')
+        wpa_pass_path = capabilities.find('wpa_passphrase')
         if not wpa_pass_path:
             return None
         key_pattern = re.compile('network={.*?\spsk=(.*?)\n}.*',
@@ -1255,6 +1425,11 @@ class BaseWirelessInterface(BaseInterface):
         network -- dictionary containing network info
 
         """
+        if self.keep_supplicant and self.wpa_driver != RALINK_DRIVER:
+            if self._AuthenticateManaged(network):
+                return
+            print('Restarting wpa_supplicant for %s' % self.iface)
+            self._GetManagedSupplicant().stop()
         misc.ParseEncryption(network)
         if self.wpa_driver == RALINK_DRIVER:
             self._AuthenticateRalinkLegacy(network)
@@ -1271,6 +1446,28 @@ class BaseWirelessInterface(BaseInterface):
                 print(cmd)
             misc.Run(cmd)
 
+    def _AuthenticateManaged(self, network):
+        """ Switch the wpa_supplicant kept running to a network.
+
+        The network is added to wpa_supplicant, or updated if it was
+        added before, and selected, without restarting wpa_supplicant.
+
+        Keyword arguments:
+        network -- dictionary containing network info
+
+        Returns:
+        True if wpa_supplicant is connecting to the network, False if
+        it has to be restarted with a config file instead.
+
+        """
+        managed = self._GetManagedSupplicant()
+        key = network['bssid'].replace(':', '').lower()
+        try:
+            return managed.connect(key, misc.RenderEncryption(network))
+        except (OSError, supplicant.SupplicantError) as e:
+            print('Managed wpa_supplicant failed: %s' % e)
+            return False
+
     def _AuthenticateRalinkLegacy(self, network):
         """ Authenticate with the specified wireless network.
 
@@ -1312,15 +1509,13 @@ class BaseWirelessInterface(BaseInterface):
                         print(' '.join(cmd))
                     misc.Run(cmd)
 
-    @neediface([])
-    def GetNetworks(self, essid=None):
-        """ Get a list of available wireless networks.
+    def _GetScanCommand(self, essid=None):
+        """ Returns the iw command scanning for wireless networks.
 
-        Returns:
-        A list containing available wireless networks.
+        Keyword arguments:
+        essid -- the essid of a hidden network to scan for, or None
 
         """
-
         cmd = 'iw ' + self.iface + ' scan'
 
         # If there is a hidden essid then it was set earlier, with iwconfig wlan0 essid,
@@ -1332,12 +1527,17 @@ class BaseWirelessInterface(BaseInterface):
 
         if self.verbose:
             print(cmd)
-        results = misc.Run(cmd)
-        # Split the networks apart, using Cell as our split point
-        # this way we can look at only one network at a time.
-        # The spaces around '   Cell ' are to minimize the chance that someone
-        # has an essid named Cell...
-        networks = results.split( '\nBSS ' )
+        return cmd
+
+    @neediface([])
+    def GetNetworks(self, essid=None):
+        """ Get a list of available wireless networks.
+
+        Returns:
+        A list containing available wireless networks.
+
+        """
+        results = misc.Run(self._GetScanCommand(essid))
 
         # Get available network info from iwpriv get_site_survey
         # if we're using a ralink card (needed to get encryption info)
@@ -1348,23 +1548,101 @@ class BaseWirelessInterface(BaseInterface):
 
         # An array for the access points
         access_points = {}
-        for cell in networks:
-            # Only use sections where there is an ESSID.
-            if 'SSID:' in cell:
-                # Add this network to the list of networks
-                entry = self._ParseAccessPoint(cell, ralink_info)
-                if entry is not None:
-                    # Normally we only get duplicate bssids with hidden
-                    # networks.  If we hit this, we only want the entry
-                    # with the real essid to be in the network list.
-                    if (entry['bssid'] not in access_points 
-                        or not entry['hidden']):
-                        access_points[entry['bssid']] = entry
+        for bss in IterIwScan(results.splitlines()):
+            entry = self._ParseBSS(bss, ralink_info)
+            if entry is not None:
+                # Normally we only get duplicate bssids with hidden
+                # networks.  If we hit this, we only want the entry
+                # with the real essid to be in the network list.
+                if (entry['bssid'] not in access_points 
+                    or not entry['hidden']):
+                    access_points[entry['bssid']] = entry
+
+        return list(access_points.values())
+
+    @neediface(None)
+    def GetCachedNetworks(self, max_age):
+        """ Get the networks the kernel remembers from earlier scans.
+
+        Reads the scan cache of the kernel with iw scan dump, which
+        unlike a scan returns right away and doesn't disturb traffic.
 
+        Keyword arguments:
+        max_age -- seconds the freshest cached network may be old
+
+        Returns:
+        A list of the cached networks, or None if the cache is empty
+        or older than max_age.
+
+        """
+        if self.wpa_driver == RALINK_DRIVER:
+            # The ralink encryption info needs a scan anyway.
+            return None
+        cmd = 'iw ' + self.iface + ' scan dump'
+        if self.verbose:
+            print(cmd)
+        access_points = {}
+        age = None
+        for bss in IterIwScan(misc.Run(cmd).splitlines()):
+            bss_age = _GetBSSAge(bss)
+            if bss_age is not None and (age is None or bss_age < age):
+                age = bss_age
+            entry = self._ParseBSS(bss, None)
+            if entry is not None:
+                if (entry['bssid'] not in access_points
+                    or not entry['hidden']):
+                    access_points[entry['bssid']] = entry
+        if age is None or age > max_age:
+            return None
         return list(access_points.values())
+
+    @neediface([])
+    def IterNetworks(self, essid=None, max_age=None):
+        """ Scan for wireless networks, yielding them as they are found.
+
+        Unlike GetNetworks(), every network is parsed as soon as iw has
+        printed it, while the scan output is still being read.  Hidden
+        networks may be yielded again once their real essid shows up.
+
+        Keyword arguments:
+        essid -- the essid of a hidden network to scan for, or None
+        max_age -- if given, use the kernel's scan cache instead of
+                   scanning, unless it is older than max_age seconds
+
+        Returns:
+        An iterator over the available wireless networks.
+
+        """
+        if max_age is not None and misc.Noneify(essid) is None:
+            cached = self.GetCachedNetworks(max_age)
+            if cached is not None:
+                return iter(cached)
+        if self.wpa_driver == RALINK_DRIVER:
+            # The ralink encryption info is only there after the scan.
+            return iter(self.GetNetworks(essid))
+        return self._StreamNetworks(self._GetScanCommand(essid))
+
+    def _StreamNetworks(self, cmd):
+        """ Run an iw scan command and parse its output while it runs. """
+        proc = misc.Run(cmd, return_obj=True)
+        if not proc:
+            return
+        try:
+            lines = (line.rstrip('\n') for line in
+                     io.TextIOWrapper(proc.stdout, errors='replace'))
+            for bss in IterIwScan(lines):
+                entry = self._ParseBSS(bss, None)
+                if entry is not None:
+                    yield entry
+        finally:
+            # Don't leave iw behind if the caller stopped early.
+            if proc.poll() is None:
+                proc.terminate()
+            proc.stdout.close()
+            proc.wait()
     
     def _ParseAccessPoint(self, cell, ralink_info):
-        """ Parse a single cell from the output of iwlist.
+        """ Parse a single cell from the output of iw scan.
 
         Keyword arguments:
         cell -- string containing the cell information
@@ -1375,10 +1653,30 @@ class BaseWirelessInterface(BaseInterface):
         A dictionary containing the cell networks properties.
 
         """
-        ap = {}
-        ap['essid'] = misc.RunRegex(essid_pattern, cell)
+        for bss in IterIwScan(cell.splitlines()):
+            return self._ParseBSS(bss, ralink_info)
+        return None
+
+    def _ParseBSS(self, bss, ralink_info):
+        """ Build an access point from a tokenized iw scan block.
+
+        Keyword arguments:
+        bss -- dict of BSS fields as returned by IterIwScan()
+        ralink_info -- string contating network information needed
+                       for ralink cards.
+
+        Returns:
+        A dictionary containing the cell networks properties, or None
+        if the block does not describe a usable network.
+
+        """
+        # Only use sections where there is an ESSID.
+        if 'SSID' not in bss:
+            return None
+
+        ap = AccessPoint()
         try:
-            ap['essid'] = misc.to_unicode(ap['essid'])
+            ap['essid'] = misc.to_unicode(bss['SSID'])
         except (UnicodeDecodeError, UnicodeEncodeError):
             print('Unicode problem with current network essid, ignoring!!')
             return None
@@ -1389,7 +1687,6 @@ class BaseWirelessInterface(BaseInterface):
         ap['essid'] = ap['essid'].replace('\x00', '')
 
         if ap['essid'] in ['Hidden', '<hidden>', "", None]:
-            #print('hidden')
             ap['hidden'] = True
             ap['essid'] = "<hidden>"
         else:
@@ -1397,50 +1694,53 @@ class BaseWirelessInterface(BaseInterface):
 
         # Channel - For cards that don't have a channel number,
         # convert the frequency.
-        ap['channel'] = misc.RunRegex(channel_pattern, cell)
-        if ap['channel'] == None:
-            freq = misc.RunRegex(freq_pattern, cell)
+        ap['channel'] = None
+        ds_params = bss.get('DS Parameter set', '')
+        if ds_params.startswith('channel'):
+            channel = ds_params[7:]
+            if channel.startswith(' '):
+                channel = channel[1:]
+            if channel.isdigit():
+                ap['channel'] = channel
+        if ap['channel'] is None:
+            freq = bss.get('freq')
+            if freq is not None and not freq.isdigit():
+                freq = None
             ap['channel'] = self._FreqToChannel(freq)
 
         # Bit Rate
-        bitrates = cell.split('Supported rates: ')[-1].split('\n')[0]
-        bitrates_ext = cell.split('Extended supported rates: ')[-1].split('\n')[0]
         # *** bless O'Reilly for this publication...
         # https://www.oreilly.com/library/view/80211-wireless-networks/0596100523/ch04.html#wireless802dot112-CHP-4-FIG-33
-        m = re.findall(bitrates_pattern, bitrates)
-        m += re.findall(bitrates_pattern, bitrates_ext)
+        m = bitrates_pattern.findall(bss.get('Supported rates', ''))
+        m += bitrates_pattern.findall(bss.get('Extended supported rates', ''))
         if m:
             # numeric sort
-            ap['bitrates'] = sorted(m, key=cmp_to_key(lambda x, y: int(float(x) - float(y))))
+            ap['bitrates'] = share_bitrates(sorted(m, key=cmp_to_key(lambda x, y: int(float(x) - float(y)))))
         else:
             ap['bitrates'] = None
 
         # BSSID
-        ap['bssid'] = misc.RunRegex(ap_mac_pattern, cell)
+        ap['bssid'] = bss['bssid']
 
         # Mode
-        ap['mode'] = misc.RunRegex(mode_pattern, cell)
         # https://www.oreilly.com/library/view/80211-wireless-networks/0596100523/ch04.html#wireless802dot112-CHP-4-FIG-24
-        if ap['mode'] is None:
+        capability = bss.get('capability', '').split(' ', 2)
+        if len(capability) < 2 or capability[0] not in ('ESS', 'IBSS'):
             print('Invalid network mode string, ignoring!')
             return None
+        ap['mode'] = capability[0]
+        privacy = len(capability) == 3 and capability[1] == 'Privacy'
 
         # Break off here if we're using a ralink card
         if self.wpa_driver == RALINK_DRIVER:
-            ap = self._ParseRalinkAccessPoint(ap, ralink_info, cell)
-        elif misc.RunRegex(wep_pattern, cell) != None:
+            ap = self._ParseRalinkAccessPoint(ap, ralink_info, privacy)
+        elif privacy:
             # Encryption - Default to WEP
             ap['encryption'] = True
             ap['encryption_method'] = 'WEP'
 
-            rsn = False
-            wpa = False
-
-            if misc.RunRegex(wpa_pattern, cell) == 'Version: 1':
-                wpa = True
-
-            if misc.RunRegex(rsn_pattern, cell) == 'Version: 1':
-                rsn = True
+            wpa = bss.get('WPA', '').startswith('\t * Version: 1')
+            rsn = bss.get('RSN', '').startswith('\t * Version: 1')
 
             if rsn:
                 if wpa:
@@ -1455,22 +1755,22 @@ class BaseWirelessInterface(BaseInterface):
             ap['encryption'] = False
 
         # Link Quality
-        # Set strength to -1 if the quality is not found
-        ap['quality'] = self._get_link_quality(cell)
-        # FIXME I got no idea what to grab on the "iw scan"
-        if ap['quality'] is None:
-            ap['quality'] = -1
+        # iw scan doesn't report a link quality, so use the value
+        # _get_link_quality() hands out for unknown strengths.
+        ap['quality'] = 101
 
         # Signal Strength (only used if user doesn't want link
         # quality displayed or it isn't found)
-        if misc.RunRegex(signaldbm_pattern, cell):
-            ap['strength'] = misc.RunRegex(signaldbm_pattern, cell)
+        signal = bss.get('signal', '')
+        if signal.startswith('-') and signal.endswith(' dBm') and \
+           not signal[1:-4].strip('0123456789.'):
+            ap['strength'] = signal[:-4]
         elif self.wpa_driver != RALINK_DRIVER:  # This is already set for ralink
             ap['strength'] = -1
 
         return ap
 
-    def ValidateAuthentication(self, auth_time):
+    def ValidateAuthentication(self, auth_time, max_time=None):
         """ Validate WPA authentication.
 
             Validate that the wpa_supplicant authentication
@@ -1482,6 +1782,8 @@ class BaseWirelessInterface(BaseInterface):
             
             Keyword arguments:
             auth_time -- The time at which authentication began.
+            max_time -- Seconds after auth_time to give up,
+                        MAX_AUTH_TIME if None.
             
             Returns:
             True if wpa_supplicant authenticated succesfully,
@@ -1489,11 +1791,100 @@ class BaseWirelessInterface(BaseInterface):
 
         """
         # Right now there's no way to do this for these drivers
-        if self.wpa_driver == RALINK_DRIVER or not self.wpa_cli_cmd:
+        if self.wpa_driver == RALINK_DRIVER:
             return True
 
-        MAX_TIME = 35
-        MAX_DISCONNECTED_TIME = 3
+        if max_time is None:
+            max_time = MAX_AUTH_TIME
+        ctrl = wpactrl.get_ctrl(self.iface)
+        if ctrl is None:
+            if not self.wpa_cli_cmd:
+                return True
+            return self._ValidateAuthenticationWpaCli(auth_time, max_time)
+        try:
+            return self._ValidateAuthenticationEvents(ctrl, auth_time,
+                                                      max_time)
+        except OSError as e:
+            print('wpa_supplicant control interface failed: %s' % e)
+            return False
+        finally:
+            if ctrl.attached:
+                try:
+                    ctrl.detach()
+                except OSError:
+                    pass
+
+    def _ValidateAuthenticationEvents(self, ctrl, auth_time, max_time):
+        """ Wait for wpa_supplicant's events to validate authentication.
+
+        Keyword arguments:
+        ctrl -- the wpactrl.WpaCtrl of the interface
+        auth_time -- The time at which authentication began.
+        max_time -- Seconds after auth_time to give up.
+
+        Returns:
+        True if wpa_supplicant authenticated succesfully,
+        False otherwise.
+
+        """
+        # Attach before asking, so no event is missed in between.
+        ctrl.attach()
+        result = ctrl.status().get('wpa_state')
+        if self.verbose:
+            print('WPA_CTRL RESULT IS', result)
+        if not result:
+            return False
+        if result == "COMPLETED":
+            return True
+
+        deadline = auth_time + max_time
+        forced_rescan = False
+        if result == "DISCONNECTED":
+            rescan_time = time.time() + MAX_DISCONNECTED_TIME
+        else:
+            rescan_time = None
+        while time.time() < deadline:
+            wait = deadline - time.time()
+            if rescan_time is not None:
+                wait = min(wait, rescan_time - time.time())
+            event = ctrl.wait_event(AUTH_EVENTS, wait)
+            if self.verbose and event:
+                print('WPA_CTRL EVENT IS', event)
+            if event is None:
+                if rescan_time is not None and time.time() >= rescan_time:
+                    # Force a rescan to get wpa_supplicant moving again.
+                    print('wpa_supplicant rescan forced...')
+                    ctrl.request('SCAN')
+                    forced_rescan = True
+                    rescan_time = None
+                    deadline += 5
+            elif event.startswith('CTRL-EVENT-CONNECTED'):
+                return True
+            elif event.startswith('CTRL-EVENT-SSID-TEMP-DISABLED'):
+                print('wpa_supplicant authentication failed: %s' % event)
+                return False
+            elif not forced_rescan and rescan_time is None:
+                # Disconnected; rescan if it stays that way.
+                rescan_time = time.time() + MAX_DISCONNECTED_TIME
+
+        print('wpa_supplicant authentication may have failed.')
+        return False
+
+    def _ValidateAuthenticationWpaCli(self, auth_time, max_time):
+        """ Poll wpa_cli status to validate authentication.
+
+        Used when wpa_supplicant's control interface can't be opened.
+
+        Keyword arguments:
+        auth_time -- The time at which authentication began.
+        max_time -- Seconds after auth_time to give up.
+
+        Returns:
+        True if wpa_supplicant authenticated succesfully,
+        False otherwise.
+
+        """
+        MAX_TIME = max_time
         disconnected_time = 0
         forced_rescan = False
         while (time.time() - auth_time) < MAX_TIME:
@@ -1517,7 +1908,7 @@ class BaseWirelessInterface(BaseInterface):
                     MAX_TIME += 5
             else:
                 disconnected_time = 0
-            time.sleep(1)
+            cancel.sleep(1)
 
         print('wpa_supplicant authentication may have failed.')
         return False
@@ -1541,6 +1932,8 @@ class BaseWirelessInterface(BaseInterface):
     @neediface("")
     def GetBSSID(self, iwconfig=None):
         """ Get the MAC address for the interface. """
+        if not iwconfig and self.use_procfs:
+            return procfs.get_bssid(self.iface)
         if not iwconfig:
             output = self.GetIwconfig()
         else:
@@ -1552,6 +1945,8 @@ class BaseWirelessInterface(BaseInterface):
     @neediface("")
     def GetCurrentBitrate(self, iwconfig=None):
         """ Get the current bitrate for the interface. """
+        if not iwconfig and self.use_procfs:
+            return procfs.get_bitrate(self.iface)
         if not iwconfig:
             output = self.GetIwconfig()
         else:
@@ -1634,6 +2029,12 @@ class BaseWirelessInterface(BaseInterface):
         The signal strength.
 
         """
+        if not iwconfig and self.use_procfs:
+            stats = procfs.get_wireless_stats(self.iface)
+            # Like _get_link_quality() without a quality to parse.
+            if stats is None:
+                return 101
+            return stats[0]
         if not iwconfig:
             output = self.GetIwconfig()
         else:
@@ -1648,6 +2049,11 @@ class BaseWirelessInterface(BaseInterface):
         The dBm signal strength.
 
         """
+        if not iwconfig and self.use_procfs:
+            stats = procfs.get_wireless_stats(self.iface)
+            if stats is None or stats[1] >= 0:
+                return None
+            return str(stats[1])
         if not iwconfig:
             output = self.GetIwconfig()
         else:
@@ -1663,6 +2069,8 @@ class BaseWirelessInterface(BaseInterface):
         The current network essid.
 
         """
+        if not iwconfig and self.use_procfs:
+            return procfs.get_essid(self.iface)
         if not iwconfig:
             output = self.GetIwconfig()
         else:
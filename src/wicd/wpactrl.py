@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# vim: set fileencoding=utf8
+#
+#   wicd wpa_supplicant control interface client
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License Version 2 as
+#   published by the Free Software Foundation.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Talks to wpa_supplicant over its control interface socket.
+
+This is what wpa_cli does, without starting a process for every
+command: requests are datagrams on a unix socket, and after ATTACH
+wpa_supplicant sends its events over the socket that attached.  The
+connections are shared by the threads of the daemon, so requests are
+serialized by a lock, and events are received on a socket of their
+own so a request never reads an event or an event waiter a reply.
+
+class WpaCtrl() -- A connection to the control interface of wpa_supplicant.
+get_ctrl() -- The connection kept open for an interface.
+forget() -- Close every connection kept open.
+
+"""
+
+import os
+import re
+import socket
+import threading
+import time
+from collections import deque
+
+from wicd import cancel
+
+CTRL_DIR = '/var/run/wpa_supplicant'
+
+# Seconds to wait for the reply to a request.
+REQUEST_TIMEOUT = 10
+
+RECV_SIZE = 4096
+
+# Events are prefixed by their priority, eg. <3>CTRL-EVENT-CONNECTED.
+_event_pattern = re.compile(r'<\d+>')
+
+_ctrls = {}
+_ctrls_lock = threading.Lock()
+
+
+class WpaCtrl(object):
+    """ A connection to the control interface of wpa_supplicant. """
+    def __init__(self, path):
+        """ Connect to a control interface socket.
+
+        Keyword arguments:
+        path -- the path of the socket, eg. /var/run/wpa_supplicant/wlan0
+
+        Raises OSError if wpa_supplicant doesn't listen there.
+
+        """
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            # An abstract address wpa_supplicant can reply to, without
+            # a file to clean up.
+            self.sock.bind('')
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.events = deque()
+        # The connection attach() opened to receive the events on.
+        self.monitor = None
+        self._lock = threading.Lock()
+        self._event_lock = threading.Lock()
+
+    @property
+    def attached(self):
+        """ True if attach() asked for the events. """
+        return self.monitor is not None
+
+    def fileno(self):
+        """ Return the file descriptor of the socket. """
+        return self.sock.fileno()
+
+    def close(self):
+        """ Detach if attached and close the connection. """
+        if self.attached:
+            try:
+                self.detach()
+            except OSError:
+                pass
+        self.sock.close()
+
+    def _recv(self, timeout):
+        """ Receive one datagram.
+
+        Returns:
+        The datagram as a string, or None if none came in time.
+
+        Raises cancel.Cancelled if the cancel token of the thread is
+        cancelled while waiting.
+
+        """
+        if timeout is not None:
+            timeout = max(0, timeout)
+        if timeout is not None or cancel.current() is not None:
+            if not cancel.wait_readable([self.sock], timeout):
+                return None
+        return self.sock.recv(RECV_SIZE).decode('utf-8', 'replace')
+
+    def request(self, command, timeout=REQUEST_TIMEOUT):
+        """ Send a command and wait for its reply.
+
+        Events that arrive in the meantime are kept for wait_event().
+
+        Keyword arguments:
+        command -- the command, eg. STATUS
+        timeout -- seconds to wait for the reply
+
+        Returns:
+        The reply.
+
+        Raises OSError if wpa_supplicant went away, TimeoutError if it
+        didn't reply in time.
+
+        """
+        with self._lock:
+            # Drop the late reply to a request that timed out.
+            while self._recv(0) is not None:
+                pass
+            self.sock.send(command.encode())
+            deadline = time.monotonic() + timeout
+            while True:
+                reply = self._recv(deadline - time.monotonic())
+                if reply is None:
+                    raise TimeoutError('wpa_supplicant did not reply to %s' %
+                                       command)
+                if _event_pattern.match(reply):
+                    self.events.append(_event_pattern.sub('', reply, 1))
+                    continue
+                return reply
+
+    def attach(self):
+        """ Have wpa_supplicant send its events for wait_event().
+
+        They are sent to a connection of their own.
+
+        """
+        with self._event_lock:
+            if self.monitor is None:
+                monitor = WpaCtrl(self.path)
+                try:
+                    if monitor.request('ATTACH').startswith('OK'):
+                        self.monitor = monitor
+                finally:
+                    if self.monitor is not monitor:
+                        monitor.close()
+            return self.attached
+
+    def detach(self):
+        """ Stop the events attach() asked for. """
+        with self._event_lock:
+            monitor, self.monitor = self.monitor, None
+            if monitor is None:
+                return False
+            try:
+                return monitor.request('DETACH').startswith('OK')
+            finally:
+                monitor.close()
+
+    def status(self):
+        """ Returns the STATUS of the interface as a dict. """
+        status = {}
+        for line in self.request('STATUS').splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                status[key] = value
+        return status
+
+    def wait_event(self, prefixes, timeout):
+        """ Wait for one of the events the connection is attached for.
+
+        Keyword arguments:
+        prefixes -- the events to wait for, eg. CTRL-EVENT-CONNECTED
+        timeout -- seconds to wait at most
+
+        Returns:
+        The first event starting with one of prefixes, or None if
+        there was none in time or the connection isn't attached.
+        Other events are dropped.
+
+        """
+        prefixes = tuple(prefixes)
+        deadline = time.monotonic() + timeout
+        with self._event_lock:
+            monitor = self.monitor
+            if monitor is None:
+                cancel.wait_readable([], timeout)
+                return None
+            while True:
+                while monitor.events:
+                    event = monitor.events.popleft()
+                    if event.startswith(prefixes):
+                        return event
+                message = monitor._recv(deadline - time.monotonic())
+                if message is None:
+                    return None
+                if _event_pattern.match(message):
+                    monitor.events.append(_event_pattern.sub('', message, 1))
+
+
+def get_ctrl(iface, ctrl_dir=None):
+    """ Returns the connection to wpa_supplicant kept open for an interface.
+
+    A connection whose wpa_supplicant went away is replaced by a new
+    one.
+
+    Keyword arguments:
+    iface -- the name of the interface
+    ctrl_dir -- the directory of the control interface sockets,
+                CTRL_DIR if None
+
+    Returns:
+    A WpaCtrl, or None if wpa_supplicant isn't running on iface.
+
+    """
+    path = os.path.join(ctrl_dir or CTRL_DIR, iface)
+    with _ctrls_lock:
+        ctrl = _ctrls.get(path)
+        if ctrl is not None:
+            try:
+                if ctrl.request('PING', timeout=1).startswith('PONG'):
+                    return ctrl
+            except OSError:
+                pass
+            ctrl.close()
+            del _ctrls[path]
+        try:
+            ctrl = _ctrls[path] = WpaCtrl(path)
+        except OSError:
+            return None
+        return ctrl
+
+
+def forget():
+    """ Close every connection kept open. """
+    with _ctrls_lock:
+        for ctrl in _ctrls.values():
+            ctrl.close()
+        _ctrls.clear()
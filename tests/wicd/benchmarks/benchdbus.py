@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark fetching the network list over D-Bus.
+
+Serves 100 and 500 scanned networks on the session bus with the
+daemon's own GetNumberOfNetworks, GetWirelessProperty and
+GetNetworksBulk methods, and compares the D-Bus messages and the time
+one refresh of the GTK network list takes with both.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchdbus
+
+Needs dbus-python and a session bus.
+
+"""
+import os
+import signal
+import time
+from unittest import mock
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from wicd import wnettools
+from wicd.daemon.__main__ import WirelessDaemon
+from wicd.frontends.gtk.netentry import NETWORK_PROPS
+
+from .benchscan import best_of, synthetic_scan
+
+BUS_NAME = 'org.wicd.benchmark'
+OBJECT_PATH = '/org/wicd/daemon/wireless'
+
+
+class BenchWireless(dbus.service.Object):
+    """ Serves a fixed scan with the daemon's methods. """
+    GetNumberOfNetworks = WirelessDaemon.GetNumberOfNetworks
+    GetWirelessProperty = WirelessDaemon.GetWirelessProperty
+    GetNetworksBulk = WirelessDaemon.GetNetworksBulk
+
+    def __init__(self, bus_name, networks):
+        dbus.service.Object.__init__(self, bus_name=bus_name,
+                                     object_path=OBJECT_PATH)
+        self.LastScan = networks
+
+
+class CountingProxy(object):
+    """ Counts the method calls made through a D-Bus interface. """
+    def __init__(self, interface):
+        self.interface = interface
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.interface, name)
+
+        def call(*args):
+            self.calls += 1
+            return method(*args)
+        return call
+
+
+def serve(count):
+    """ Fork a process serving count networks, returns its pid. """
+    pid = os.fork()
+    if pid:
+        return pid
+    iface = wnettools.BaseWirelessInterface('wlan0')
+    with mock.patch('builtins.print'):
+        networks = [iface._ParseBSS(bss, None) for bss in
+                    wnettools.IterIwScan(synthetic_scan(count).splitlines())]
+    DBusGMainLoop(set_as_default=True)
+    bus_name = dbus.service.BusName(BUS_NAME, dbus.SessionBus())
+    service = BenchWireless(bus_name, networks)
+    GLib.MainLoop().run()
+    os._exit(0)
+
+
+def refresh_per_property(wireless):
+    """ Fetch the list the way refresh_networks() used to. """
+    return [[wireless.GetWirelessProperty(x, prop) for prop in NETWORK_PROPS]
+            for x in range(wireless.GetNumberOfNetworks())]
+
+
+def refresh_bulk(wireless):
+    """ Fetch the list the way refresh_networks() does now. """
+    return wireless.GetNetworksBulk(NETWORK_PROPS)
+
+
+def main():
+    bus = dbus.SessionBus()
+    print('%8s %16s %12s %16s %12s' % ('networks', 'per prop [msgs]',
+                                      'per prop [s]', 'bulk [msgs]',
+                                      'bulk [s]'))
+    for count in (100, 500):
+        pid = serve(count)
+        try:
+            while not bus.name_has_owner(BUS_NAME):
+                time.sleep(0.05)
+            wireless = dbus.Interface(bus.get_object(BUS_NAME, OBJECT_PATH),
+                                      'org.wicd.daemon.wireless')
+            row = [count]
+            for refresh in (refresh_per_property, refresh_bulk):
+                proxy = CountingProxy(wireless)
+                refresh(proxy)
+                # Every call is a method call and a reply message.
+                row.append(proxy.calls * 2)
+                row.append(best_of(lambda: refresh(wireless)))
+        finally:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        print('%8d %16d %12.4f %16d %12.4f' % tuple(row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark the memory held by a 5k network scan.
+
+Parses a synthetic iw scan of 5000 BSSes and measures with tracemalloc
+how much memory LastScan takes when every network is a plain dict with
+its own bitrates list, as scans used to return, and when it is an
+AccessPoint sharing its bitrates with the other networks.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchmemory
+
+"""
+import tracemalloc
+from unittest import mock
+
+from wicd import wnettools
+
+from .benchscan import synthetic_scan
+
+COUNT = 5000
+
+
+def measure(build):
+    """ Returns the memory in bytes still held by what build() returns. """
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    iface = wnettools.BaseWirelessInterface('wlan0')
+    scan = synthetic_scan(COUNT)
+    with mock.patch('builtins.print'):
+        def access_points():
+            return [iface._ParseBSS(bss, None)
+                    for bss in wnettools.IterIwScan(scan.splitlines())]
+
+        def dicts():
+            # Scans used to give every network its own bitrates list.
+            with mock.patch('wicd.wnettools.share_bitrates',
+                            side_effect=lambda bitrates: bitrates):
+                return [dict(ap.items()) for ap in access_points()]
+
+        before = measure(dicts)
+        after = measure(access_points)
+    print('%8s %14s %14s' % ('BSSes', 'dict [KiB]', 'slots [KiB]'))
+    print('%8d %14.1f %14.1f' % (COUNT, before / 1024.0, after / 1024.0))
+    print('%8s %14.1f %14.1f' % ('per BSS', before / float(COUNT),
+                                 after / float(COUNT)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark a tick of the connection monitor over D-Bus.
+
+Serves a daemon connected to a wireless network on the session bus and
+compares the D-Bus messages and the latency of one monitor tick when
+every value is fetched with its own call, as the monitor used to do,
+and when it is read with GetMonitorSnapshot().
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchmonitor
+
+Needs dbus-python and a session bus.
+
+"""
+import os
+import signal
+import time
+from unittest import mock
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from wicd.daemon.__main__ import WicdDaemon
+from wicd.daemon import monitor
+from wicd.daemon.signalfilter import SignalFilter
+from wicd.daemon.timings import PhaseTimings
+
+from .benchdbus import CountingProxy
+from .benchscan import best_of
+
+BUS_NAME = 'org.wicd.benchmark'
+DAEMON_PATH = '/org/wicd/daemon'
+WIRED_PATH = '/org/wicd/daemon/wired'
+WIRELESS_PATH = '/org/wicd/daemon/wireless'
+
+
+class BenchWifi(object):
+    """ A wireless link that needs no external calls. """
+    def GetIwconfig(self):
+        return ''
+
+    def GetBSSID(self, iwconfig=None):
+        return '02:00:00:00:00:01'
+
+
+class BenchWired(dbus.service.Object):
+    """ An unplugged wired interface. """
+    @dbus.service.method('org.wicd.daemon.wired')
+    def CheckIfWiredConnecting(self):
+        return False
+
+    @dbus.service.method('org.wicd.daemon.wired')
+    def GetWiredIP(self, ifconfig=""):
+        return ''
+
+    @dbus.service.method('org.wicd.daemon.wired')
+    def CheckPluggedIn(self):
+        return False
+
+
+class BenchWireless(dbus.service.Object):
+    """ A wireless interface connected to a network. """
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def CheckIfWirelessConnecting(self):
+        return False
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetWirelessIP(self, ifconfig=""):
+        return '192.168.1.23'
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetIwconfig(self):
+        return ''
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetApBssid(self):
+        return '02:00:00:00:00:01'
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetCurrentSignalStrength(self, iwconfig=None):
+        return 67
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetCurrentDBMStrength(self, iwconfig=None):
+        return -58
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetCurrentNetwork(self, iwconfig=None):
+        return 'benchmark'
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetCurrentNetworkID(self, iwconfig=None):
+        return 0
+
+    @dbus.service.method('org.wicd.daemon.wireless')
+    def GetCurrentBitrate(self, iwconfig):
+        return '144.4 Mb/s'
+
+
+class BenchDaemon(dbus.service.Object):
+    """ Serves the daemon's GetMonitorSnapshot() and plain getters. """
+    GetMonitorSnapshot = WicdDaemon.GetMonitorSnapshot
+    _probe_connecting = WicdDaemon._probe_connecting
+    _probe_wired = WicdDaemon._probe_wired
+    _probe_wireless = WicdDaemon._probe_wireless
+
+    def __init__(self, bus_name):
+        dbus.service.Object.__init__(self, bus_name=bus_name,
+                                     object_path=DAEMON_PATH)
+        self.wired_bus = BenchWired(bus_name=bus_name, object_path=WIRED_PATH)
+        self.wireless_bus = BenchWireless(bus_name=bus_name,
+                                          object_path=WIRELESS_PATH)
+        self.wifi = BenchWifi()
+        self.suspended = False
+        self.prefer_wired = False
+        self.forced_disconnect = False
+        self.auto_reconnect = True
+        self.gui_open = False
+        self.signal_display_type = 0
+        self.signal_filter = SignalFilter()
+        self.monitor_poll_min = 2
+        self.monitor_poll_max = 30
+        self.monitor_poll_backoff = 2.0
+        self.monitor_timings = PhaseTimings()
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetSuspend(self):
+        return self.suspended
+
+    @dbus.service.method('org.wicd.daemon')
+    def CheckIfConnecting(self):
+        return False
+
+    @dbus.service.method('org.wicd.daemon')
+    def SendConnectResultsIfAvail(self):
+        pass
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetPreferWiredNetwork(self):
+        return self.prefer_wired
+
+    @dbus.service.method('org.wicd.daemon')
+    def NeedsExternalCalls(self):
+        return False
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetSignalDisplayType(self):
+        return self.signal_display_type
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetWiredInterface(self):
+        return 'eth0'
+
+    @dbus.service.method('org.wicd.daemon')
+    def GetWirelessInterface(self):
+        return 'wlan0'
+
+    @dbus.service.method('org.wicd.daemon')
+    def SetCurrentInterface(self, iface):
+        pass
+
+    @dbus.service.method('org.wicd.daemon', in_signature='uav')
+    def SetConnectionStatus(self, state, info):
+        pass
+
+    @dbus.service.method('org.wicd.daemon', in_signature='uav')
+    def EmitStatusChanged(self, state, info):
+        pass
+
+
+def serve():
+    """ Fork a process serving the daemon, returns its pid. """
+    pid = os.fork()
+    if pid:
+        return pid
+    DBusGMainLoop(set_as_default=True)
+    bus_name = dbus.service.BusName(BUS_NAME, dbus.SessionBus())
+    service = BenchDaemon(bus_name)
+    GLib.MainLoop().run()
+    os._exit(0)
+
+
+def tick_per_value(daemon, wired, wireless):
+    """ The calls a tick connected to wireless used to make. """
+    daemon.GetSuspend()
+    daemon.CheckIfConnecting()
+    daemon.SendConnectResultsIfAvail()
+    wired.GetWiredIP("")
+    daemon.GetPreferWiredNetwork()
+    wifi_ip = wireless.GetWirelessIP("")
+    daemon.NeedsExternalCalls()
+    wireless.GetApBssid()
+    daemon.GetSignalDisplayType()
+    wireless.GetCurrentSignalStrength('')
+    # update_state() read the signal strength a second time.
+    daemon.GetSignalDisplayType()
+    info = [str(wifi_ip), wireless.GetCurrentNetwork(''),
+            str(wireless.GetCurrentSignalStrength('')),
+            str(wireless.GetCurrentNetworkID('')),
+            wireless.GetCurrentBitrate('')]
+    daemon.SetConnectionStatus(2, info)
+
+
+def main():
+    bus = dbus.SessionBus()
+    pid = serve()
+    try:
+        while not bus.name_has_owner(BUS_NAME):
+            time.sleep(0.05)
+        ifaces = [dbus.Interface(bus.get_object(BUS_NAME, path), name)
+                  for path, name in ((DAEMON_PATH, 'org.wicd.daemon'),
+                                     (WIRED_PATH, 'org.wicd.daemon.wired'),
+                                     (WIRELESS_PATH,
+                                      'org.wicd.daemon.wireless'))]
+        with mock.patch('wicd.dbus.dbus_manager'), \
+             mock.patch('wicd.daemon.monitor.LinkWatcher'):
+            status = monitor.ConnectionStatus(*ifaces)
+        # Let the first tick announce the new state.
+        status.update_connection_status()
+
+        rows = []
+        proxies = [CountingProxy(iface) for iface in ifaces]
+        tick_per_value(*proxies)
+        rows.append(('per value', sum(p.calls for p in proxies) * 2,
+                     best_of(lambda: tick_per_value(*ifaces))))
+
+        proxies = [CountingProxy(iface) for iface in ifaces]
+        status.daemon, status.wired, status.wireless = proxies
+        status.update_connection_status()
+        status.daemon, status.wired, status.wireless = ifaces
+        rows.append(('snapshot', sum(p.calls for p in proxies) * 2,
+                     best_of(status.update_connection_status)))
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    print('%10s %8s %12s' % ('tick', 'msgs', 'latency [s]'))
+    for row in rows:
+        print('%10s %8d %12.5f' % row)
+
+
+if __name__ == '__main__':
+    main()
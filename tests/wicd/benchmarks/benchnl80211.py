@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark the nl80211 scan decoder on recorded netlink messages.
+
+Replays the BSSes of tests/nl80211_scan.bin with unique addresses as
+1k and 10k BSS dumps and compares decoding them with parsing iw scan
+text of the same size.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchnl80211
+
+"""
+import os
+import struct
+from unittest import mock
+
+from wicd import netlink
+from wicd.backends import nl80211
+
+from .benchscan import best_of, single_pass_parse, synthetic_scan
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                      'nl80211_scan.bin')
+
+
+def synthetic_dump(count):
+    """ Build an nl80211 scan dump with count BSSes out of the sample. """
+    with open(SAMPLE, 'rb') as f:
+        messages = [payload for msg_type, _, _, payload in
+                    netlink.iter_messages(f.read())
+                    if msg_type != netlink.NLMSG_DONE]
+    out = []
+    for i in range(count):
+        payload = messages[i % len(messages)]
+        attrs = netlink.parse_attrs(payload, netlink.genlmsghdr.size)
+        bss = netlink.parse_attrs(attrs[nl80211.NL80211_ATTR_BSS])
+        bss[nl80211.NL80211_BSS_BSSID] = struct.pack('>HL', 0x0200, i)
+        bss = netlink.pack_nested(nl80211.NL80211_ATTR_BSS,
+            [netlink.pack_attr(t, v) for t, v in sorted(bss.items())])
+        payload = payload[:netlink.genlmsghdr.size] + bss
+        out.append(netlink.nlmsghdr.pack(netlink.nlmsghdr.size + len(payload),
+                                         0x1c, netlink.NLM_F_MULTI, 3, 0)
+                   + payload)
+    return b''.join(out)
+
+
+def nl80211_parse(iface, dump):
+    """ Decode a dump the way WirelessInterface.GetNetworks() does. """
+    aps = []
+    for _, _, _, payload in netlink.iter_messages(dump):
+        attrs = netlink.parse_attrs(payload, netlink.genlmsghdr.size)
+        aps.append(iface._parse_bss(attrs[nl80211.NL80211_ATTR_BSS]))
+    return aps
+
+
+def main():
+    iface = nl80211.WirelessInterface('wlan0')
+    print('%8s %12s %12s %10s' % ('BSSes', 'iw text [s]', 'nl80211 [s]',
+                                  'us/BSS'))
+    # _FreqToChannel() complains about every 5GHz network, keep quiet.
+    with mock.patch('builtins.print'):
+        rows = []
+        for count in (1000, 10000):
+            scan = synthetic_scan(count)
+            dump = synthetic_dump(count)
+            text = best_of(lambda: single_pass_parse(iface, scan))
+            binary = best_of(lambda: nl80211_parse(iface, dump))
+            rows.append((count, text, binary))
+    for count, text, binary in rows:
+        print('%8d %12.4f %12.4f %10.1f' % (count, text, binary,
+                                            binary / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
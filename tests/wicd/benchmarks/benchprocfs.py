@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark the interface queries of a connection monitor tick.
+
+Compares what a tick of the monitor asks about one interface -- its
+address, whether it is up, its carrier and the signal and access
+point of the wireless link -- done by running ifconfig and iwconfig
+against the procfs, sysfs and ioctl readers.  The interface defaults
+to lo; iwconfig is only run if it is installed.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchprocfs [iface]
+
+"""
+import sys
+
+from wicd import misc
+from wicd import procfs
+from wicd import runner
+from wicd import wnettools
+
+from .benchscan import best_of
+
+TICKS = 200
+
+
+def forking_tick(iface):
+    """ A tick as the external backend does it. """
+    output = misc.Run(['ifconfig', iface])
+    for pat in (wnettools.ip_pattern, wnettools.ip_pattern1):
+        if misc.RunRegex(pat, output):
+            break
+    for name in ('flags', 'carrier'):
+        try:
+            with open('/sys/class/net/%s/%s' % (iface, name)) as f:
+                f.read()
+        except OSError:
+            pass
+    if runner.which('iwconfig'):
+        output = misc.Run(['iwconfig', iface])
+        for pat in (wnettools.bssid_pattern, wnettools.bitrate_pattern,
+                    wnettools.strength_pattern, wnettools.signaldbm_pattern):
+            misc.RunRegex(pat, output)
+
+
+def native_tick(iface):
+    """ A tick reading procfs, sysfs and ioctls. """
+    procfs.get_ip(iface)
+    procfs.get_flags(iface)
+    procfs.get_carrier(iface)
+    procfs.get_wireless_stats(iface)
+    procfs.get_bssid(iface)
+    procfs.get_essid(iface)
+    procfs.get_bitrate(iface)
+
+
+def main():
+    iface = sys.argv[1] if len(sys.argv) > 1 else 'lo'
+    forking = best_of(lambda: [forking_tick(iface) for _ in range(TICKS)])
+    native = best_of(lambda: [native_tick(iface) for _ in range(TICKS)])
+    print('%-10s %14s %14s %8s' % ('iface', 'fork [us]', 'native [us]',
+                                   'speedup'))
+    print('%-10s %14.1f %14.1f %7.0fx' % (iface, forking * 1e6 / TICKS,
+                                         native * 1e6 / TICKS,
+                                         forking / native))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark running short external commands.
+
+Compares misc.Run() on the shared posix_spawn runner against the former
+implementation, which copied os.environ and went through Popen on every
+call, for commands that finish right away.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchrun
+
+"""
+import os
+from subprocess import Popen, PIPE
+
+from wicd import misc
+
+from .benchscan import best_of
+
+CALLS = 500
+COMMANDS = ('true', 'echo wlan0', 'uname -r')
+
+
+def legacy_run(cmd):
+    """ The Popen based misc.Run() of before. """
+    cmd = cmd.split()
+    tmpenv = os.environ.copy()
+    tmpenv["LC_ALL"] = "C"
+    tmpenv["LANG"] = "C"
+    f = Popen(cmd, shell=False, stdout=PIPE, stdin=None, stderr=None,
+              close_fds=False, cwd='/', env=tmpenv)
+    return f.communicate()[0].decode()
+
+
+def main():
+    print('%-12s %14s %14s %8s' % ('command', 'Popen [ms]', 'runner [ms]',
+                                   'speedup'))
+    for cmd in COMMANDS:
+        legacy = best_of(lambda: [legacy_run(cmd) for _ in range(CALLS)])
+        spawn = best_of(lambda: [misc.Run(cmd) for _ in range(CALLS)])
+        print('%-12s %14.3f %14.3f %7.1fx' % (
+            cmd, legacy * 1000 / CALLS, spawn * 1000 / CALLS, legacy / spawn))
+
+
+if __name__ == '__main__':
+    main()
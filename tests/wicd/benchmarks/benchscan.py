@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark the iw scan parser on synthetic scans.
+
+Compares the single pass tokenizer used by GetNetworks() against the
+former per-cell regex parser on scans with 1k and 10k BSSes built from
+tests/crazy.wifi.  The regex parser needs about a fifth of a second per
+BSS, so it is timed on LEGACY_SAMPLE BSSes and scaled up linearly.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchscan
+
+"""
+import os
+import re
+import time
+from functools import cmp_to_key
+from unittest import mock
+
+from wicd import misc
+from wicd import wnettools
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'tests', 'crazy.wifi')
+LEGACY_SAMPLE = 100
+
+
+def synthetic_scan(count):
+    """ Build iw scan output with count BSSes out of the sample file. """
+    with open(SAMPLE, 'r') as f:
+        blocks = f.read().split('\nBSS ')
+    blocks = [blocks[0][4:]] + blocks[1:]
+    out = []
+    for i in range(count):
+        block = blocks[i % len(blocks)].split('(', 1)[1]
+        mac = ':'.join('%02x' % b for b in (0x02, 0, 0, i >> 16 & 0xff,
+                                            i >> 8 & 0xff, i & 0xff))
+        out.append('BSS %s(%s' % (mac, block.rstrip('\n')))
+    return '\n'.join(out) + '\n'
+
+
+def legacy_parse(iface, results):
+    """ The per-cell regex parser GetNetworks() used before. """
+    aps = []
+    cells = results.split('\nBSS ')
+    cells = [cells[0]] + ['BSS ' + c for c in cells[1:]]
+    for cell in cells:
+        if 'SSID:' not in cell:
+            continue
+        ap = {}
+        ap['essid'] = misc.RunRegex(wnettools.essid_pattern, cell)
+        ap['channel'] = misc.RunRegex(wnettools.channel_pattern, cell)
+        if ap['channel'] is None:
+            ap['channel'] = iface._FreqToChannel(
+                misc.RunRegex(wnettools.freq_pattern, cell))
+        bitrates = cell.split('Supported rates: ')[-1].split('\n')[0]
+        bitrates_ext = cell.split('Extended supported rates: ')[-1] \
+            .split('\n')[0]
+        m = re.findall(wnettools.bitrates_pattern, bitrates)
+        m += re.findall(wnettools.bitrates_pattern, bitrates_ext)
+        ap['bitrates'] = sorted(m, key=cmp_to_key(
+            lambda x, y: int(float(x) - float(y)))) or None
+        ap['bssid'] = misc.RunRegex(wnettools.ap_mac_pattern, cell)
+        ap['mode'] = misc.RunRegex(wnettools.mode_pattern, cell)
+        if misc.RunRegex(wnettools.wep_pattern, cell) is not None:
+            misc.RunRegex(wnettools.wpa_pattern, cell)
+            misc.RunRegex(wnettools.rsn_pattern, cell)
+        ap['quality'] = iface._get_link_quality(cell)
+        if misc.RunRegex(wnettools.signaldbm_pattern, cell):
+            ap['strength'] = misc.RunRegex(wnettools.signaldbm_pattern, cell)
+        aps.append(ap)
+    return aps
+
+
+def single_pass_parse(iface, results):
+    """ The tokenizer based parser GetNetworks() uses now. """
+    return [iface._ParseBSS(bss, None)
+            for bss in wnettools.IterIwScan(results.splitlines())]
+
+
+def best_of(func, repeat=3):
+    """ Returns the fastest of repeat runs of func in seconds. """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    iface = wnettools.BaseWirelessInterface('wlan0')
+    print('%8s %12s %12s %8s' % ('BSSes', 'regex [s]', 'single [s]',
+                                 'speedup'))
+    # _FreqToChannel() complains about every 5GHz network, keep quiet.
+    with mock.patch('builtins.print'):
+        rows = []
+        for count in (1000, 10000):
+            scan = synthetic_scan(count)
+            sample = synthetic_scan(min(count, LEGACY_SAMPLE))
+            legacy = best_of(lambda: legacy_parse(iface, sample), repeat=1)
+            legacy *= count / min(count, LEGACY_SAMPLE)
+            single = best_of(lambda: single_pass_parse(iface, scan))
+            rows.append((count, legacy, single))
+    for count, legacy, single in rows:
+        print('%8d %12.4f %12.4f %7.1fx' % (count, legacy, single,
+                                           legacy / single))
+
+
+if __name__ == '__main__':
+    main()
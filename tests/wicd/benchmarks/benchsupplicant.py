@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Benchmark the time to connect with a restarted or kept wpa_supplicant.
+
+Compares switching networks by terminating wpa_supplicant and starting
+it again, as Authenticate() does by default, against adding the network
+to the wpa_supplicant kept running and selecting it.  wpa_supplicant is
+played by a fake process answering on a control socket in a temporary
+directory; it reports COMPLETED as soon as a network is selected, plus
+the given scan delay in milliseconds after it was started, standing in
+for the driver initialization and first scan of a real one.
+
+    /wicd/tests/wicd$ PYTHONPATH=../../src python3 -m benchmarks.benchsupplicant [scan delay]
+
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from wicd import supplicant
+from wicd import wpactrl
+
+from .benchscan import best_of
+
+SWITCHES = 20
+CONFIG = '''ap_scan=1
+ctrl_interface=/var/run/wpa_supplicant
+network={
+       ssid="%s"
+       scan_ssid=1
+       key_mgmt=WPA-PSK
+       psk="secret"
+}
+'''
+
+
+def fake_supplicant(path, scan_delay):
+    """ Answer control interface requests until TERMINATE. """
+    started = time.monotonic()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    next_id = 0
+    completed_at = None
+    try:
+        while True:
+            data, client = sock.recvfrom(4096)
+            command = data.decode()
+            if command == 'PING':
+                reply = 'PONG\n'
+            elif command == 'ADD_NETWORK':
+                reply = '%d\n' % next_id
+                next_id += 1
+            elif command == 'STATUS':
+                if completed_at is not None and \
+                   time.monotonic() >= completed_at:
+                    reply = 'wpa_state=COMPLETED\n'
+                else:
+                    reply = 'wpa_state=SCANNING\n'
+            else:
+                reply = 'OK\n'
+                if command == 'REASSOCIATE':
+                    completed_at = max(time.monotonic(),
+                                       started + scan_delay)
+            sock.sendto(reply.encode(), client)
+            if command == 'TERMINATE':
+                return
+    finally:
+        sock.close()
+        os.unlink(path)
+
+
+class RestartedSupplicant(supplicant.ManagedSupplicant):
+    """ Starts the fake instead of wpa_supplicant. """
+    def __init__(self, iface, ctrl_dir, scan_delay):
+        supplicant.ManagedSupplicant.__init__(self, iface, None, ctrl_dir)
+        self.scan_delay = scan_delay
+        self.process = None
+
+    def _spawn(self):
+        self.process = subprocess.Popen([sys.executable, '-m', __spec__.name,
+                                         '--fake', os.path.join(self.ctrl_dir,
+                                                                self.iface),
+                                         str(self.scan_delay)])
+
+    def stop(self):
+        supplicant.ManagedSupplicant.stop(self)
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+
+
+def wait_completed(managed):
+    """ Poll the STATUS until the fake reports COMPLETED. """
+    while managed.ctrl.status().get('wpa_state') != 'COMPLETED':
+        time.sleep(0.0005)
+
+
+def switch(managed, restart):
+    """ Switch between two networks SWITCHES times. """
+    for i in range(SWITCHES):
+        if restart:
+            managed.stop()
+        managed.connect('net%d' % (i % 2), CONFIG % ('net%d' % (i % 2)))
+        wait_completed(managed)
+
+
+def main():
+    if sys.argv[1:2] == ['--fake']:
+        fake_supplicant(sys.argv[2], float(sys.argv[3]))
+        return
+    scan_delay = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0
+    with tempfile.TemporaryDirectory() as ctrl_dir:
+        managed = RestartedSupplicant('wlan0', ctrl_dir, scan_delay)
+        try:
+            restarted = best_of(lambda: switch(managed, True))
+            kept = best_of(lambda: switch(managed, False))
+        finally:
+            managed.stop()
+            wpactrl.forget()
+    print('%-12s %14s %14s %8s' % ('scan delay', 'restart [ms]', 'kept [ms]',
+                                   'speedup'))
+    print('%-12s %14.1f %14.1f %7.0fx' % ('%g ms' % (scan_delay * 1000),
+                                         restarted * 1e3 / SWITCHES,
+                                         kept * 1e3 / SWITCHES,
+                                         restarted / kept))
+
+
+if __name__ == '__main__':
+    main()
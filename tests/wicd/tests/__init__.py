@@ -11,4 +11,64 @@ def run_tests():
     from . import testmisc
     test_suite.addTest(testmisc.suite())
 
+    from . import testnl80211
+    test_suite.addTest(testnl80211.suite())
+
+    from . import testbsstable
+    test_suite.addTest(testbsstable.suite())
+
+    from . import testaccesspoint
+    test_suite.addTest(testaccesspoint.suite())
+
+    from . import testscancoordinator
+    test_suite.addTest(testscancoordinator.suite())
+
+    from . import testprofileindex
+    test_suite.addTest(testprofileindex.suite())
+
+    from . import testscansnapshot
+    test_suite.addTest(testscansnapshot.suite())
+
+    from . import testlinkwatch
+    test_suite.addTest(testlinkwatch.suite())
+
+    from . import testsignalfilter
+    test_suite.addTest(testsignalfilter.suite())
+
+    from . import testpollbackoff
+    test_suite.addTest(testpollbackoff.suite())
+
+    from . import testtimings
+    test_suite.addTest(testtimings.suite())
+
+    from . import testrunner
+    test_suite.addTest(testrunner.suite())
+
+    from . import testcapabilities
+    test_suite.addTest(testcapabilities.suite())
+
+    from . import testrtnetlink
+    test_suite.addTest(testrtnetlink.suite())
+
+    from . import testprocfs
+    test_suite.addTest(testprocfs.suite())
+
+    from . import testwpactrl
+    test_suite.addTest(testwpactrl.suite())
+
+    from . import testsupplicant
+    test_suite.addTest(testsupplicant.suite())
+
+    from . import testconnectthread
+    test_suite.addTest(testconnectthread.suite())
+
+    from . import testtimeline
+    test_suite.addTest(testtimeline.suite())
+
+    from . import testcancel
+    test_suite.addTest(testcancel.suite())
+
+    from . import testmonitor
+    test_suite.addTest(testmonitor.suite())
+
     unittest.TextTestRunner(verbosity=2).run(test_suite)
@@ -0,0 +1,113 @@
+import unittest
+from wicd.accesspoint import AccessPoint, signal_key, strongest_first
+
+class TestAccessPoint(unittest.TestCase):
+	def setUp(self):
+		self.ap = AccessPoint({'bssid' : '00:11:22:33:44:55', 'essid' : 'Network',
+			'hidden' : False, 'quality' : 80, 'encryption' : False})
+		self.loads = 0
+
+	def load_profile(self, ap):
+		self.loads += 1
+		for key, value in (('automatic', True), ('essid', 'Stored'),
+				('encryption_method', 'WPA')):
+			if key not in ap:
+				ap[key] = value
+
+	def test_dict_access(self):
+		self.assertEqual(self.ap['essid'], 'Network')
+		self.assertEqual(self.ap.get('strength'), None)
+		self.assertEqual(self.ap.get('strength', -1), -1)
+		self.assertRaises(KeyError, lambda: self.ap['strength'])
+		self.assertNotIn('strength', self.ap)
+		self.ap['strength'] = '-50.00'
+		self.ap['beforescript'] = None
+		self.assertIn('strength', self.ap)
+		self.assertIn('beforescript', self.ap)
+		del self.ap['beforescript']
+		self.assertNotIn('beforescript', self.ap)
+
+	def test_iteration(self):
+		self.ap['key'] = 'secret'
+		self.assertEqual(set(self.ap), set(['bssid', 'essid', 'hidden',
+			'quality', 'encryption', 'key']))
+		self.assertEqual(dict(self.ap.items())['key'], 'secret')
+		self.assertEqual(len(self.ap), 6)
+
+	def test_scan_fields_dont_load_profile(self):
+		self.ap.defer_profile(self.load_profile)
+		self.assertEqual(self.ap['essid'], 'Network')
+		self.assertEqual(self.ap.get('quality'), 80)
+		self.assertEqual(self.loads, 0)
+
+	def test_profile_loaded_on_demand(self):
+		self.ap.defer_profile(self.load_profile)
+		self.assertTrue(self.ap.get('automatic'))
+		self.assertEqual(self.ap['encryption_method'], 'WPA')
+		self.assertEqual(self.ap['essid'], 'Network')
+		self.assertEqual(self.loads, 1)
+
+	def test_profile_loaded_before_setting(self):
+		self.ap.defer_profile(self.load_profile)
+		self.ap['automatic'] = False
+		self.assertFalse(self.ap['automatic'])
+		self.assertEqual(self.loads, 1)
+
+	def test_profile_loaded_by_iteration(self):
+		self.ap.defer_profile(self.load_profile)
+		self.assertIn('automatic', list(self.ap))
+
+	def test_hidden_essid_from_profile(self):
+		self.ap['hidden'] = True
+		self.ap['essid'] = '<hidden>'
+		self.ap.defer_profile(self.load_profile)
+		self.assertIn('essid', self.ap)
+		self.assertEqual(self.loads, 1)
+
+class TestStrongestFirst(unittest.TestCase):
+	def network(self, bssid, quality, strength, profile=True):
+		ap = AccessPoint({'bssid' : bssid, 'essid' : bssid,
+			'quality' : quality, 'strength' : strength})
+		if profile:
+			ap.defer_profile(self.load_profile)
+		return ap
+
+	def load_profile(self, ap):
+		ap['automatic'] = True
+
+	def test_by_strength(self):
+		# iw and nl80211 scans report the same quality for every network.
+		networks = [self.network('weak', 101, '-80.00'),
+			self.network('strong', 101, '-45.00')]
+		self.assertEqual([(x, n['bssid']) for x, n in
+			strongest_first(networks)], [(1, 'strong'), (0, 'weak')])
+		self.assertTrue(networks[1]['automatic'])
+
+	def test_quality_without_strength(self):
+		networks = [self.network('low', 30, -1, False),
+			self.network('high', 70, None, False),
+			self.network('dbm', 101, '-60.00', False)]
+		self.assertEqual([n['bssid'] for _, n in strongest_first(networks)],
+			['dbm', 'high', 'low'])
+
+	def test_bulk_values(self):
+		# The frontends sort the strings GetNetworksBulk returns.
+		networks = [{'essid': 'weak', 'quality': '101', 'strength': '-80.00'},
+			{'essid': 'none', 'quality': '', 'strength': ''},
+			{'essid': 'strong', 'quality': '101', 'strength': '-45.00'},
+			{'essid': 'quality', 'quality': '60', 'strength': '-1'}]
+		networks.sort(key=signal_key, reverse=True)
+		self.assertEqual([n['essid'] for n in networks],
+			['strong', 'weak', 'quality', 'none'])
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestAccessPoint, TestStrongestFirst):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,124 @@
+import threading
+import unittest
+from wicd.daemon.bsstable import BssTable
+
+def network(bssid, essid='Network', quality=50, strength=-1):
+	return {'bssid' : bssid, 'essid' : essid, 'hidden' : False,
+		'channel' : '1', 'bitrates' : ['1.0'], 'mode' : 'ESS',
+		'encryption' : False, 'quality' : quality, 'strength' : strength}
+
+class TestBssTable(unittest.TestCase):
+	def setUp(self):
+		self.table = BssTable(max_age=30)
+		self.table.update([network('aa'), network('bb')], now=100)
+
+	def test_first_scan_adds_everything(self):
+		table = BssTable()
+		delta = table.update([network('aa'), network('bb')], now=100)
+		self.assertEqual(delta, (['aa', 'bb'], [], []))
+
+	def test_unchanged_scan_is_empty_delta(self):
+		delta = self.table.update([network('aa'), network('bb')], now=110)
+		self.assertEqual(delta, ([], [], []))
+
+	def test_changed_scan_fields(self):
+		delta = self.table.update([network('aa', quality=70), network('bb')], now=110)
+		self.assertEqual(delta, ([], [], ['aa']))
+
+	def test_signal_jitter_is_not_a_change(self):
+		delta = self.table.update([network('aa', quality=45),
+			network('bb', quality=101, strength='-65.00')], now=110)
+		self.assertEqual(delta, ([], [], ['bb']))
+		delta = self.table.update([network('aa', quality=45),
+			network('bb', quality=101, strength='-62.00')], now=120)
+		self.assertEqual(delta, ([], [], []))
+		delta = self.table.update([network('aa', quality=45),
+			network('bb', quality=101, strength='-55.00')], now=130)
+		self.assertEqual(delta, ([], [], ['bb']))
+		self.assertEqual(self.table.networks()[1]['strength'], '-55.00')
+
+	def test_clear_drops_older_scans(self):
+		generation = self.table.generation
+		self.table.clear()
+		self.assertEqual(self.table.merge([network('cc')], now=110,
+			generation=generation), ([], []))
+		self.assertEqual(len(self.table), 0)
+		self.assertEqual(self.table.merge([network('cc')], now=110,
+			generation=self.table.generation), (['cc'], []))
+
+	def test_cleared_while_scanning(self):
+		done = threading.Event()
+		def scan():
+			i = 0
+			while not done.is_set():
+				self.table.merge([network('%d' % (i % 500))], now=110)
+				self.table.expire(now=111)
+				i += 1
+		thread = threading.Thread(target=scan)
+		thread.start()
+		try:
+			for i in range(2000):
+				self.table.networks()
+				if i % 10 == 0:
+					self.table.clear()
+		finally:
+			done.set()
+			thread.join()
+
+	def test_profile_settings_are_not_changes(self):
+		self.table.networks()[0]['automatic'] = True
+		self.table.networks()[1]['essid'] = 'Stored essid'
+		delta = self.table.update([network('aa'), network('bb')], now=110)
+		self.assertEqual(delta, ([], [], []))
+
+	def test_seen_times(self):
+		self.table.update([network('bb'), network('cc')], now=110)
+		aa, bb, cc = self.table.networks()
+		self.assertEqual((aa['first_seen'], aa['last_seen']), (100, 100))
+		self.assertEqual((bb['first_seen'], bb['last_seen']), (100, 110))
+		self.assertEqual((cc['first_seen'], cc['last_seen']), (110, 110))
+
+	def test_missing_networks_age_out(self):
+		delta = self.table.update([network('bb')], now=120)
+		self.assertEqual(delta, ([], [], []))
+		self.assertIn('aa', self.table)
+		delta = self.table.update([network('bb')], now=131)
+		self.assertEqual(delta, ([], ['aa'], []))
+		self.assertEqual([n['bssid'] for n in self.table.networks()], ['bb'])
+
+	def test_network_ids_stay_stable(self):
+		self.table.update([network('cc'), network('bb'), network('aa')], now=110)
+		self.assertEqual([n['bssid'] for n in self.table.networks()], ['aa', 'bb', 'cc'])
+
+	def test_merge_keeps_missing_networks(self):
+		self.table.max_age = 0
+		self.assertEqual(self.table.merge([network('cc')], now=110), (['cc'], []))
+		self.assertIn('aa', self.table)
+		self.assertEqual(self.table.expire(now=110), ['aa', 'bb'])
+
+	def test_restore_keeps_seen_times(self):
+		table = BssTable(max_age=30)
+		old = network('aa')
+		old['first_seen'], old['last_seen'] = 50, 60
+		table.restore([old])
+		self.assertEqual(table.update([network('bb')], now=100), (['bb'], ['aa'], []))
+		table.restore([old])
+		table.update([network('aa')], now=100)
+		self.assertEqual(table.networks()[-1]['first_seen'], 50)
+
+	def test_no_max_age(self):
+		table = BssTable()
+		table.update([network('aa'), network('bb')], now=100)
+		delta = table.update([network('bb')], now=100.5)
+		self.assertEqual(delta, ([], ['aa'], []))
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestBssTable) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestBssTable(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,214 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from wicd import cancel
+from wicd import misc
+from wicd import networking
+from wicd import runner
+from wicd import wnettools
+from wicd import wpactrl
+from wicd.daemon.timeline import TimelineRing
+from wicd.daemon.timings import PhaseTimings
+from .testwpactrl import FakeSupplicant
+
+# Seconds a cancelled wait may take to end.
+LATENCY = 0.2
+
+def cancel_later(token, delay=0.05):
+	timer = threading.Timer(delay, token.cancel)
+	timer.start()
+	return timer
+
+class TestCancelToken(unittest.TestCase):
+	def setUp(self):
+		self.token = cancel.CancelToken()
+		self.addCleanup(self.token.close)
+
+	def assertCancelledQuickly(self, func, *args):
+		cancel_later(self.token)
+		start = time.monotonic()
+		with cancel.scope(self.token):
+			with self.assertRaises(cancel.Cancelled):
+				func(*args)
+		self.assertLess(time.monotonic() - start, 0.05 + LATENCY)
+
+	def test_scope(self):
+		self.assertIsNone(cancel.current())
+		with cancel.scope(self.token):
+			self.assertIs(cancel.current(), self.token)
+		self.assertIsNone(cancel.current())
+
+	def test_sleep(self):
+		cancel.sleep(0)
+		with cancel.scope(self.token):
+			cancel.sleep(0.01)
+		self.assertCancelledQuickly(cancel.sleep, 5)
+
+	def test_cancelled_before(self):
+		self.token.cancel()
+		with cancel.scope(self.token):
+			self.assertRaises(cancel.Cancelled, cancel.sleep, 5)
+			self.assertRaises(cancel.Cancelled, cancel.wait_readable, [], 5)
+			self.assertRaises(cancel.Cancelled, runner.run, ['true'])
+
+	def test_wait_readable(self):
+		a, b = socket.socketpair()
+		self.addCleanup(a.close)
+		self.addCleanup(b.close)
+		with cancel.scope(self.token):
+			self.assertEqual(cancel.wait_readable([a], 0.01), [])
+			b.send(b'x')
+			self.assertEqual(cancel.wait_readable([a], 0.01), [a])
+			a.recv(1)
+		self.assertCancelledQuickly(cancel.wait_readable, [a])
+
+	def test_line_reader(self):
+		r, w = os.pipe()
+		self.addCleanup(os.close, r)
+		os.write(w, b'bound to 10.0.0.2\nrenewal')
+		os.close(w)
+		reader = cancel.LineReader(r)
+		self.assertEqual(reader.readline(), 'bound to 10.0.0.2\n')
+		self.assertEqual(reader.readline(), 'renewal')
+		self.assertEqual(reader.readline(), '')
+
+	def test_line_reader_cancelled(self):
+		r, w = os.pipe()
+		self.addCleanup(os.close, r)
+		self.addCleanup(os.close, w)
+		self.assertCancelledQuickly(cancel.LineReader(r).readline)
+
+	def test_run(self):
+		seen = []
+		with runner.observe(lambda *args: seen.append(args)):
+			self.assertCancelledQuickly(runner.run, ['sleep', '5'])
+		self.assertEqual(seen[0][:2], (['sleep', '5'], None))
+
+	def test_popen(self):
+		with cancel.scope(self.token):
+			process = misc.Run(['sleep', '5'], return_obj=True)
+		self.addCleanup(process.stdout.close)
+		cancel_later(self.token)
+		process.wait(0.05 + LATENCY)
+
+	def test_wait_event(self):
+		with tempfile.TemporaryDirectory() as ctrl_dir:
+			path = os.path.join(ctrl_dir, 'wlan0')
+			fake = FakeSupplicant(path)
+			self.addCleanup(fake.close)
+			ctrl = wpactrl.WpaCtrl(path)
+			self.addCleanup(ctrl.close)
+			self.assertTrue(ctrl.attach())
+			self.assertCancelledQuickly(ctrl.wait_event,
+				['CTRL-EVENT-CONNECTED'], 5)
+
+class TestCancelConnect(unittest.TestCase):
+	""" Cancels a connection while each kind of step is waiting. """
+	def setUp(self):
+		self.entered = threading.Event()
+		self.wiface = mock.Mock()
+		self.wiface.IsUp.return_value = True
+		self.wiface.StartDHCP.return_value = 'success'
+		self.wiface.VerifyAPAssociation.return_value = 0
+		self.network = {'essid': 'home', 'bssid': '00:11:22:33:44:55',
+			'channel': '6', 'mode': 'Managed', 'enctype': 'wpa',
+			'gateway': '192.168.1.1'}
+		for target in ('wicd.networking.misc.ExecuteScripts',
+				'builtins.print'):
+			patcher = mock.patch(target)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		patcher = mock.patch('wicd.networking.timings', PhaseTimings())
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		patcher = mock.patch('wicd.networking.timelines', TimelineRing())
+		self.timelines = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def skip_sleeps(self):
+		""" Only check the token where the steps before would sleep. """
+		patcher = mock.patch('wicd.networking.cancel.sleep',
+			lambda seconds: cancel.current().check())
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def blocking(self, func, *args):
+		""" Returns a side effect that blocks in func(*args). """
+		def side_effect(*__args):
+			self.entered.set()
+			return func(*args)
+		return side_effect
+
+	def assertCancelledAt(self, step):
+		thread = networking.WirelessConnectThread(self.network, 'wlan0',
+			'nl80211', None, None, None, None, None, None, None, None, None,
+			self.wiface, True, 'auto', True)
+		thread.start()
+		self.assertTrue(self.entered.wait(5))
+		start = time.monotonic()
+		thread.cancel()
+		thread.join(5)
+		self.assertLess(time.monotonic() - start, LATENCY)
+		self.assertFalse(thread.is_alive())
+		self.assertEqual(thread.connect_result, 'aborted')
+		info = self.timelines.last().as_dict()
+		self.assertEqual(info['steps'][-1]['step'], step)
+		self.assertEqual(info['steps'][-1]['result'], 'aborted')
+
+	def test_sleep(self):
+		self.wiface.IsUp.return_value = False
+		self.wiface.Up.side_effect = self.blocking(lambda: None)
+		self.assertCancelledAt('put_iface_up')
+
+	def test_command(self):
+		self.skip_sleeps()
+		self.wiface.Associate.side_effect = self.blocking(runner.run,
+			['sleep', '5'])
+		self.assertCancelledAt('associate')
+
+	def test_control_socket(self):
+		self.skip_sleeps()
+		ctrl_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(ctrl_dir.cleanup)
+		self.addCleanup(wpactrl.forget)
+		patcher = mock.patch('wicd.wpactrl.CTRL_DIR', ctrl_dir.name)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		fake = FakeSupplicant(os.path.join(ctrl_dir.name, 'wlan0'))
+		self.addCleanup(fake.close)
+		wiface = wnettools.BaseWirelessInterface('wlan0')
+		self.wiface.ValidateAuthentication.side_effect = self.blocking(
+			wiface.ValidateAuthentication, time.time())
+		self.assertCancelledAt('validate_authentication')
+
+	def test_dhcp_output(self):
+		self.skip_sleeps()
+		def start_dhcp():
+			process = misc.Run(['sleep', '5'], return_obj=True)
+			self.addCleanup(process.wait)
+			self.addCleanup(process.stdout.close)
+			return cancel.LineReader(process.stdout).readline()
+		self.wiface.StartDHCP.side_effect = self.blocking(start_dhcp)
+		self.assertCancelledAt('set_ip_address')
+
+	def test_ping(self):
+		self.skip_sleeps()
+		self.wiface.VerifyAPAssociation.side_effect = self.blocking(
+			misc.Run, ['sleep', '5'])
+		self.assertCancelledAt('verify_association')
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestCancelToken, TestCancelConnect):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
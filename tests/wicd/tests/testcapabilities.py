@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+from wicd import capabilities
+from wicd import wnettools
+
+WPA_HELP = '''wpa_supplicant v2.9
+usage:
+drivers:
+  nl80211 = Linux nl80211/cfg80211
+  wext = Linux wireless extensions (generic)
+  wired = Wired Ethernet driver
+options:
+  -b = optional bridge interface name
+'''
+
+def fake_run(cmd, include_stderr=False, **kwargs):
+	if cmd == ['ping', '-V']:
+		return 'ping utility, iputils-s20180629\n'
+	if cmd == ['wpa_supplicant', '-h']:
+		return WPA_HELP
+	if cmd[0] == 'wpa_supplicant':
+		if cmd[1] == '-Dbogus':
+			return 'Unsupported driver \'bogus\'.\n'
+		return 'Failed to open config file\n'
+	if cmd[1:] == ['--version']:
+		return 'isc-dhclient-4.4.1\n'
+	return ''
+
+class TestCapabilities(unittest.TestCase):
+	def setUp(self):
+		capabilities.forget()
+		patcher = mock.patch('wicd.capabilities.misc.Run', side_effect=fake_run)
+		self.run = patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(capabilities.forget)
+
+	def test_ping_probed_once(self):
+		self.assertTrue(capabilities.ping_supports_deadline())
+		self.assertTrue(capabilities.ping_supports_deadline())
+		self.assertEqual(self.run.call_count, 1)
+
+	def test_wpa_drivers(self):
+		self.assertEqual(wnettools.GetWpaSupplicantDrivers(), ['nl80211', 'wext'])
+		wnettools.GetWpaSupplicantDrivers()
+		self.assertEqual(self.run.call_count, 1)
+
+	def test_valid_driver(self):
+		self.assertTrue(wnettools.IsValidWpaSuppDriver('nl80211'))
+		self.assertFalse(wnettools.IsValidWpaSuppDriver('bogus'))
+		self.assertTrue(wnettools.IsValidWpaSuppDriver('nl80211'))
+		self.assertEqual(self.run.call_count, 2)
+
+	def test_dhclient_version(self):
+		with mock.patch('wicd.runner.which', return_value='/sbin/dhclient'):
+			self.assertEqual(capabilities.dhclient_version(), 'isc-dhclient-4.4.1')
+		with mock.patch('wicd.runner.which', return_value=None):
+			capabilities.forget()
+			self.assertEqual(capabilities.dhclient_version(), '')
+
+	def test_probe_all(self):
+		with mock.patch('wicd.runner.which',
+				side_effect=lambda program: '/sbin/' + program
+				if program in ('ip', 'dhclient') else None):
+			found = capabilities.probe_all(('ip', 'pump'))
+		self.assertEqual(found['path:ip'], '/sbin/ip')
+		self.assertEqual(found['path:pump'], '')
+		self.assertEqual(found['wpa_drivers'], ['nl80211', 'wext'])
+		self.assertTrue(found['ping_deadline'])
+		self.assertEqual(found['dhclient_version'], 'isc-dhclient-4.4.1')
+
+	def test_forget(self):
+		capabilities.ping_supports_deadline()
+		capabilities.forget()
+		self.assertEqual(capabilities.snapshot(), {})
+		capabilities.ping_supports_deadline()
+		self.assertEqual(self.run.call_count, 2)
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestCapabilities) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestCapabilities(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from unittest import mock
+from wicd import networking
+from wicd.daemon.timeline import TimelineRing
+from wicd.daemon.timings import PhaseTimings
+
+class TestResume(unittest.TestCase):
+	def setUp(self):
+		self.wiface = mock.Mock()
+		self.wiface.Reassociate.return_value = True
+		self.wiface.ValidateAuthentication.return_value = True
+		self.wiface.StartDHCP.return_value = 'success'
+		self.wiface.IsUp.return_value = True
+		self.network = {'essid': 'home', 'bssid': '00:11:22:33:44:55',
+			'channel': '6', 'mode': 'Managed', 'enctype': 'wpa'}
+		for target in ('wicd.networking.misc.ExecuteScripts',
+				'wicd.networking.cancel.sleep', 'builtins.print'):
+			patcher = mock.patch(target)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		patcher = mock.patch('wicd.networking.timings', PhaseTimings())
+		self.timings = patcher.start()
+		self.addCleanup(patcher.stop)
+		patcher = mock.patch('wicd.networking.timelines', TimelineRing())
+		self.timelines = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def connect(self, resume=True):
+		thread = networking.WirelessConnectThread(self.network, 'wlan0',
+			'nl80211', None, None, None, None, None, None, None, None, None,
+			self.wiface, True, 'auto', True, resume=resume)
+		thread.run()
+		return thread
+
+	def test_resumed(self):
+		thread = self.connect()
+		self.assertEqual(thread.connect_result, 'success')
+		self.wiface.Reassociate.assert_called_once_with(self.network)
+		self.wiface.StartDHCP.assert_called_once_with(None, False)
+		self.wiface.Down.assert_not_called()
+		self.wiface.ReleaseDHCP.assert_not_called()
+		self.wiface.FlushRoutes.assert_not_called()
+		self.assertIn('resume:reassociate', self.timings.histograms)
+		self.assertIn('resume', self.timings.histograms)
+		self.assertNotIn('full', self.timings.histograms)
+
+	def test_static_address_kept(self):
+		self.network['ip'] = '192.168.1.5'
+		self.wiface.GetIP.return_value = '192.168.1.5'
+		thread = self.connect()
+		self.assertEqual(thread.connect_result, 'success')
+		self.wiface.StartDHCP.assert_not_called()
+		self.wiface.SetAddress.assert_not_called()
+
+	def test_fallback(self):
+		self.wiface.ValidateAuthentication.side_effect = [False, True]
+		thread = self.connect()
+		self.assertEqual(thread.connect_result, 'success')
+		self.wiface.Down.assert_called_once_with()
+		self.wiface.ReleaseDHCP.assert_called_once_with()
+		self.wiface.Authenticate.assert_called_once_with(self.network)
+		self.assertIn('resume:revalidate_authentication',
+			self.timings.histograms)
+		self.assertIn('full:put_iface_down', self.timings.histograms)
+		self.assertIn('full', self.timings.histograms)
+
+	def test_deadline(self):
+		with mock.patch('wicd.networking.RESUME_TIMEOUT', 0):
+			self.connect()
+		self.wiface.StartDHCP.assert_called_once_with(None, False)
+		self.wiface.Down.assert_called_once_with()
+
+	def test_full_connect(self):
+		self.connect(resume=False)
+		self.wiface.Reassociate.assert_not_called()
+		self.assertNotIn('resume', self.timings.histograms)
+		self.assertIn('full:set_ip_address', self.timings.histograms)
+
+	def test_timeline(self):
+		self.wiface.StartDHCP.side_effect = lambda *args: \
+			networking.runner.notify(['dhclient', 'wlan0'], 0, 0.5) or 'success'
+		self.connect(resume=False)
+		info = self.timelines.last().as_dict()
+		self.assertEqual((info['type'], info['name'], info['result']),
+			('wireless', 'home', 'success'))
+		steps = dict((step['step'], step) for step in info['steps'])
+		for name in ('generate_psk_and_authenticate', 'associate',
+				'validate_authentication', 'set_ip_address',
+				'verify_association'):
+			self.assertEqual(steps[name]['result'], 'ok')
+		self.assertEqual(steps['set_ip_address']['commands'],
+			[('dhclient', 0, 0.5)])
+		self.assertIn('running_dhcp',
+			[status for _, status in info['statuses']])
+
+	def test_timeline_aborted(self):
+		self.wiface.ValidateAuthentication.return_value = False
+		# The thread ends with SystemExit at the step after aborting.
+		with self.assertRaises(SystemExit):
+			self.connect(resume=False)
+		info = self.timelines.last().as_dict()
+		self.assertEqual(info['result'], 'bad_pass')
+		self.assertEqual(info['steps'][-1]['step'], 'validate_authentication')
+		self.assertEqual(info['steps'][-1]['result'], 'bad_pass')
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestResume) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestResume(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
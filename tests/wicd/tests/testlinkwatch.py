@@ -0,0 +1,77 @@
+import errno
+import socket
+import unittest
+from unittest import mock
+from wicd import netlink
+from wicd.daemon.linkwatch import LinkWatcher
+
+def message(msg_type, payload=b'\0' * 16):
+	""" Returns a packed rtnetlink message as the kernel sends it. """
+	return netlink.nlmsghdr.pack(netlink.nlmsghdr.size + len(payload),
+		msg_type, 0, 0, 0) + payload
+
+class TestLinkWatcher(unittest.TestCase):
+	def setUp(self):
+		self.kernel, end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+		sock = netlink.NetlinkSocket.__new__(netlink.NetlinkSocket)
+		sock.sock = end
+		sock.seq = 0
+		self.callback = mock.Mock()
+		self.watcher = LinkWatcher(self.callback, sock)
+
+	def tearDown(self):
+		self.watcher.close()
+		self.kernel.close()
+
+	def test_no_events(self):
+		self.assertFalse(self.watcher.handle_events())
+
+	def test_link_down(self):
+		self.kernel.send(message(netlink.RTM_NEWLINK))
+		self.assertTrue(self.watcher.handle_events())
+		self.assertFalse(self.watcher.handle_events())
+
+	def test_address_and_route_events(self):
+		for msg_type in (netlink.RTM_DELADDR, netlink.RTM_NEWROUTE):
+			self.kernel.send(message(msg_type))
+			self.assertTrue(self.watcher.handle_events())
+
+	def test_unrelated_messages(self):
+		self.kernel.send(message(netlink.NLMSG_DONE))
+		self.kernel.send(message(netlink.NLMSG_ERROR))
+		self.assertFalse(self.watcher.handle_events())
+
+	def test_batched_messages(self):
+		self.kernel.send(message(netlink.NLMSG_DONE) +
+			message(netlink.RTM_DELLINK))
+		self.kernel.send(message(netlink.RTM_DELROUTE))
+		self.assertTrue(self.watcher.handle_events())
+		self.assertFalse(self.watcher.handle_events())
+
+	def test_overrun(self):
+		self.watcher.sock.recv = mock.Mock(side_effect=[
+			OSError(errno.ENOBUFS, 'No buffer space available'),
+			BlockingIOError()])
+		self.assertTrue(self.watcher.handle_events())
+
+	def test_burst_calls_back_once(self):
+		with mock.patch('wicd.daemon.linkwatch.gobject') as gobject:
+			gobject.timeout_add.return_value = 7
+			for x in range(3):
+				self.kernel.send(message(netlink.RTM_NEWADDR))
+				self.assertTrue(self.watcher._on_readable(None, None))
+			self.assertEqual(gobject.timeout_add.call_count, 1)
+			settled = gobject.timeout_add.call_args[0][1]
+			self.assertFalse(settled())
+		self.callback.assert_called_once_with()
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestLinkWatcher) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestLinkWatcher(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+from wicd import misc
+from wicd.daemon import monitor
+
+def snapshot(**values):
+	snapshot = {'suspended': False, 'connecting': False,
+		'wired_connecting': False, 'prefer_wired': False,
+		'forced_disconnect': False, 'auto_reconnect': True, 'gui_open': False,
+		'signal_display_type': 0, 'poll_min': 1, 'poll_max': 30,
+		'poll_backoff': 2, 'wired_interface': 'eth0',
+		'wireless_interface': 'wlan0', 'wired_ip': '', 'plugged_in': False,
+		'wireless_ip': '', 'bssid': '', 'essid': '', 'quality': 0, 'dbm': 0,
+		'signal': 0, 'network_id': -1, 'bitrate': ''}
+	snapshot.update(values)
+	return snapshot
+
+CONNECTED = snapshot(wireless_ip='192.168.1.5', bssid='00:11:22:33:44:55',
+	essid='home', quality=70, signal=70, network_id=3, bitrate='54 Mb/s')
+
+class MonitorTestCase(unittest.TestCase):
+	def setUp(self):
+		self.daemon = mock.Mock()
+		self.daemon.GetBackendUpdateInterval.return_value = 2
+		self.daemon.GetForcedDisconnect.return_value = False
+		self.daemon.ShouldAutoReconnect.return_value = True
+		self.wireless = mock.Mock()
+		self.wireless.GetNetworkIDForBSSID.return_value = 5
+		for target in ('wicd.daemon.monitor.LinkWatcher',
+				'wicd.daemon.monitor.misc.timeout_add',
+				'wicd.daemon.monitor.gobject', 'wicd.dbus.dbus_manager',
+				'builtins.print'):
+			patcher = mock.patch(target)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		self.status = monitor.ConnectionStatus(self.daemon, mock.Mock(),
+			self.wireless, in_process=True)
+
+	def tick(self, snapshot):
+		self.daemon.GetMonitorSnapshot.return_value = snapshot
+		self.status.update_connection_status()
+
+class TestReconnect(MonitorTestCase):
+	def test_lost_wireless_is_resumed(self):
+		self.tick(CONNECTED)
+		self.assertEqual(self.status.last_state, misc.WIRELESS)
+		self.tick(snapshot())
+		self.wireless.GetNetworkIDForBSSID.assert_called_once_with(
+			'00:11:22:33:44:55')
+		self.wireless.ResumeWireless.assert_called_once_with(5)
+		self.daemon.Disconnect.assert_not_called()
+		self.daemon.AutoConnect.assert_not_called()
+		self.assertEqual(self.status.last_state, misc.NOT_CONNECTED)
+
+	def test_recorded_id_without_bssid_match(self):
+		self.wireless.GetNetworkIDForBSSID.return_value = -1
+		self.tick(CONNECTED)
+		self.tick(snapshot())
+		self.wireless.ResumeWireless.assert_called_once_with(3)
+
+	def test_torn_down_without_auto_reconnect(self):
+		self.daemon.ShouldAutoReconnect.return_value = False
+		self.tick(CONNECTED)
+		self.tick(snapshot())
+		self.wireless.ResumeWireless.assert_not_called()
+		self.daemon.Disconnect.assert_called_once_with()
+
+	def test_not_resumed_when_not_wireless(self):
+		self.tick(snapshot())
+		self.tick(snapshot())
+		self.wireless.ResumeWireless.assert_not_called()
+
+class TestForcedUpdate(MonitorTestCase):
+	def test_polling_survives_errors(self):
+		self.daemon.GetMonitorSnapshot.side_effect = RuntimeError('gone')
+		monitor.misc.timeout_add.reset_mock()
+		self.status._force_update_connection_status()
+		monitor.misc.timeout_add.assert_called_once_with(2000,
+			self.status._poll, milli=True)
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestReconnect, TestForcedUpdate):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,171 @@
+import errno
+import struct
+import unittest
+from unittest import mock
+from wicd import netlink
+from wicd.backends import nl80211
+
+def read_fixture(name):
+	with open('tests/' + name, 'rb') as fixture:
+		return fixture.read()
+
+def with_seq(data, seq):
+	""" Returns recorded netlink messages renumbered to seq. """
+	out = []
+	for msg_type, flags, _, payload in netlink.iter_messages(data):
+		out.append(netlink.nlmsghdr.pack(netlink.nlmsghdr.size + len(payload),
+			msg_type, flags, seq, 0) + payload)
+	return b''.join(out)
+
+class FakeNetlinkSocket(object):
+	""" Answers nl80211 requests with the recorded replies. """
+	trigger_error = 0
+	triggers = 0
+
+	def __init__(self, family, type, proto):
+		self.replies = []
+
+	def bind(self, address):
+		pass
+
+	def close(self):
+		pass
+
+	def fileno(self):
+		return -1
+
+	def setsockopt(self, level, option, group):
+		# The scan finishes right after joining the scan group.
+		self.replies.append(read_fixture('nl80211_event.bin'))
+
+	def send(self, data):
+		msg_type, seq = struct.unpack_from('=4xH2xL', data)
+		cmd = data[netlink.nlmsghdr.size]
+		if msg_type == netlink.GENL_ID_CTRL:
+			self.replies.append(read_fixture('nl80211_family.bin'))
+		elif cmd == nl80211.NL80211_CMD_TRIGGER_SCAN:
+			FakeNetlinkSocket.triggers += 1
+			error = struct.pack('=i', -self.trigger_error) + data[:16]
+			self.replies.append(netlink.nlmsghdr.pack(16 + len(error),
+				netlink.NLMSG_ERROR, 0, seq, 0) + error)
+		elif cmd == nl80211.NL80211_CMD_GET_SCAN:
+			self.replies.append(with_seq(read_fixture('nl80211_scan.bin'), seq))
+
+	def recv(self, bufsize):
+		return self.replies.pop(0)
+
+@mock.patch('wicd.backends.nl80211.select.select',
+	side_effect=lambda r, w, x, timeout: (r, w, x))
+@mock.patch('wicd.backends.nl80211.socket.if_nametoindex', return_value=3)
+@mock.patch('wicd.wnettools.os.path.exists', return_value=True)
+@mock.patch('wicd.netlink.socket.socket', FakeNetlinkSocket)
+class TestNl80211(unittest.TestCase):
+	def setUp(self):
+		FakeNetlinkSocket.trigger_error = 0
+		FakeNetlinkSocket.triggers = 0
+		self.interface = nl80211.WirelessInterface('wlan0')
+
+	def parse_fixture(self):
+		aps = {}
+		for _, _, _, payload in netlink.iter_messages(read_fixture('nl80211_scan.bin')):
+			attrs = netlink.parse_attrs(payload, netlink.genlmsghdr.size)
+			if nl80211.NL80211_ATTR_BSS in attrs:
+				ap = self.interface._parse_bss(attrs[nl80211.NL80211_ATTR_BSS])
+				if ap is not None:
+					aps[(ap['bssid'], ap['essid'])] = ap
+		return aps
+
+	def test_parse_wpa2(self, *mocks):
+		ap = self.parse_fixture()[('00:1a:2b:3c:4d:01', 'Network 1')]
+		self.assertEqual(ap['channel'], '1')
+		self.assertEqual(ap['mode'], 'ESS')
+		self.assertTrue(ap['encryption'])
+		self.assertEqual(ap['encryption_method'], 'WPA2')
+		self.assertEqual(ap['strength'], '-65.00')
+		self.assertEqual(ap['bitrates'], ['1.0', '2.0', '5.5', '6.0', '9.0',
+			'11.0', '12.0', '18.0', '24.0', '36.0', '48.0', '54.0'])
+
+	def test_parse_encryption_methods(self, *mocks):
+		aps = self.parse_fixture()
+		self.assertEqual(aps[('00:1a:2b:3c:4d:02', 'Mixed WPA')]['encryption_method'], 'WPA')
+		self.assertEqual(aps[('00:1a:2b:3c:4d:03', 'Old WEP')]['encryption_method'], 'WEP')
+		self.assertFalse(aps[('02:1a:2b:3c:4d:04', 'adhoc')]['encryption'])
+		self.assertEqual(aps[('02:1a:2b:3c:4d:04', 'adhoc')]['mode'], 'IBSS')
+
+	def test_parse_signal(self, *mocks):
+		aps = self.parse_fixture()
+		self.assertEqual(aps[('02:1a:2b:3c:4d:04', 'adhoc')]['strength'], '-55.50')
+		cafe = aps[('00:1a:2b:3c:4d:07', 'Caf\xe9')]
+		self.assertEqual(cafe['quality'], 55)
+		self.assertEqual(cafe['strength'], -1)
+
+	def test_parse_without_ds_params(self, *mocks):
+		ap = self.parse_fixture()[('00:1a:2b:3c:4d:06', 'Five GHz')]
+		self.assertEqual(ap['channel'], None)
+		self.assertEqual(ap['bitrates'], ['6.0', '9.0', '12.0', '18.0',
+			'24.0', '36.0', '48.0', '54.0'])
+
+	def test_parse_hidden(self, *mocks):
+		aps = self.parse_fixture()
+		self.assertTrue(aps[('00:1a:2b:3c:4d:05', '<hidden>')]['hidden'])
+		self.assertTrue(aps[('00:1a:2b:3c:4d:09', '<hidden>')]['hidden'])
+		self.assertNotIn('00:1a:2b:3c:4d:08', [bssid for bssid, essid in aps])
+
+	def test_get_networks(self, *mocks):
+		networks = self.interface.GetNetworks()
+		bssids = sorted(ap['bssid'] for ap in networks)
+		self.assertEqual(len(bssids), 8)
+		self.assertEqual(len(set(bssids)), 8)
+		hidden_real = [ap for ap in networks if ap['bssid'] == '00:1a:2b:3c:4d:05']
+		self.assertEqual(hidden_real[0]['essid'], 'Hidden Real')
+
+	def test_get_networks_while_busy(self, *mocks):
+		FakeNetlinkSocket.trigger_error = errno.EBUSY
+		self.assertEqual(len(self.interface.GetNetworks()), 8)
+
+	def test_get_networks_trigger_failure(self, *mocks):
+		FakeNetlinkSocket.trigger_error = errno.EPERM
+		self.assertEqual(self.interface.GetNetworks(), [])
+
+	def test_cached_networks(self, *mocks):
+		# The recorded BSSes were seen 40ms before the dump.
+		networks = list(self.interface.IterNetworks(max_age=1))
+		self.assertEqual(len(networks), 8)
+		self.assertEqual(FakeNetlinkSocket.triggers, 0)
+
+	def test_stale_cache_scans(self, *mocks):
+		self.assertEqual(self.interface.GetCachedNetworks(0.01), None)
+		networks = list(self.interface.IterNetworks(max_age=0.01))
+		self.assertEqual(len(set(ap['bssid'] for ap in networks)), 8)
+		self.assertEqual(FakeNetlinkSocket.triggers, 1)
+
+	@mock.patch('wicd.misc.Run')
+	def test_fallback_to_iw(self, mock_syscall, *mocks):
+		with open('tests/freq.wifi', 'r') as content_file:
+			mock_syscall.return_value = content_file.read()
+		with mock.patch('wicd.netlink.socket.socket', side_effect=OSError(errno.EAFNOSUPPORT, 'nope')):
+			networks = self.interface.GetNetworks()
+		self.assertGreater(len(networks), 0)
+		self.assertFalse(self.interface.nl)
+
+	def test_netlink_error(self, *mocks):
+		error = struct.pack('=i', -errno.ENODEV) + b'\0' * 16
+		self.assertRaises(OSError, netlink.check_error, error)
+
+	def test_netlink_attrs(self, *mocks):
+		data = netlink.pack_attr(1, b'abc') + netlink.pack_nested(2,
+			[netlink.pack_attr(3, b'\x01\x02\x03\x04')])
+		attrs = netlink.parse_attrs(data)
+		self.assertEqual(attrs[1], b'abc')
+		self.assertEqual(netlink.parse_attrs(attrs[2]), {3 : b'\x01\x02\x03\x04'})
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestNl80211) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestNl80211(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from wicd.daemon.pollbackoff import PollBackoff
+
+class TestPollBackoff(unittest.TestCase):
+	def setUp(self):
+		self.poll = PollBackoff(2, 30, 2.0)
+
+	def test_starts_at_minimum(self):
+		self.assertEqual(self.poll.interval, 2)
+
+	def test_backs_off_to_maximum(self):
+		intervals = [self.poll.stable() for x in range(6)]
+		self.assertEqual(intervals, [4, 8, 16, 30, 30, 30])
+
+	def test_reset(self):
+		self.poll.stable()
+		self.poll.stable()
+		self.assertEqual(self.poll.reset(), 2)
+		self.assertEqual(self.poll.stable(), 4)
+
+	def test_configure_clamps_interval(self):
+		for x in range(4):
+			self.poll.stable()
+		self.poll.configure(2, 5, 2.0)
+		self.assertEqual(self.poll.interval, 5)
+		self.poll.configure(10, 60, 1.5)
+		self.assertEqual(self.poll.interval, 10)
+		self.assertEqual(self.poll.stable(), 15)
+
+	def test_configure_rejects_bad_bounds(self):
+		self.poll.configure(10, 4, 0.5)
+		self.assertEqual(self.poll.maximum, 10)
+		self.assertEqual(self.poll.stable(), 10)
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestPollBackoff) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestPollBackoff(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from wicd import procfs
+from wicd import wnettools
+
+ROUTE = '''Iface	Destination	Gateway 	Flags	RefCnt	Use	Metric	Mask		MTU	Window	IRTT
+wlan0	0001A8C0	00000000	0001	0	0	0	00FFFFFF	0	0	0
+wlan0	00000000	0101A8C0	0003	0	0	600	00000000	0	0	0
+'''
+
+WIRELESS = '''Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE
+ face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22
+ wlan0: 0000   54.  -56.  -256        0      0      0      0     15        0
+ wlan1: 0000   80.   80.     0        0      0      0      0      0        0
+'''
+
+class TestProcfs(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.dir.cleanup)
+		self.addCleanup(procfs.forget)
+
+	def write(self, name, contents):
+		path = os.path.join(self.dir.name, name)
+		with open(path, 'w') as f:
+			f.write(contents)
+		return path
+
+	def test_persistent_file_rereads(self):
+		path = self.write('flags', '0x1003\n')
+		persistent = procfs.PersistentFile(path)
+		self.assertEqual(persistent.read(), '0x1003\n')
+		fd = persistent.fd
+		self.write('flags', '0x1002\n')
+		self.assertEqual(persistent.read(), '0x1002\n')
+		self.assertEqual(persistent.fd, fd)
+		persistent.close()
+
+	def test_persistent_file_reopens(self):
+		path = self.write('carrier', '1\n')
+		persistent = procfs.PersistentFile(path)
+		persistent.read()
+		with mock.patch('wicd.procfs.os.pread',
+				side_effect=[OSError(19, 'No such device'), b'0\n']):
+			self.assertEqual(persistent.read(), '0\n')
+		persistent.close()
+
+	def test_missing_file(self):
+		self.assertIsNone(procfs.read(os.path.join(self.dir.name, 'none')))
+		self.assertIsNone(procfs.get_flags('wicd-no-such-iface'))
+
+	def test_default_gateway(self):
+		with mock.patch('wicd.procfs.ROUTE', self.write('route', ROUTE)):
+			self.assertEqual(procfs.get_default_gateway(), '192.168.1.1')
+		with mock.patch('wicd.procfs.ROUTE',
+				self.write('route2', ROUTE.splitlines()[0])):
+			self.assertEqual(procfs.get_default_gateway(), '')
+
+	def test_wireless_stats(self):
+		with mock.patch('wicd.procfs.WIRELESS',
+				self.write('wireless', WIRELESS)):
+			self.assertEqual(procfs.get_wireless_stats('wlan0'), (77, -56))
+			self.assertEqual(procfs.get_wireless_stats('wlan1'), (80, 80))
+			self.assertIsNone(procfs.get_wireless_stats('wlan2'))
+
+	def test_loopback(self):
+		self.assertEqual(procfs.get_ip('lo'), '127.0.0.1')
+		self.assertTrue(procfs.get_flags('lo') & 1)
+		self.assertIsNone(procfs.get_ip('wicd-no-such-iface'))
+
+class TestInterfaceProcfs(unittest.TestCase):
+	def setUp(self):
+		self.iface = wnettools.BaseWirelessInterface('wlan0')
+		self.iface.use_procfs = True
+		patchers = [mock.patch('os.path.exists', return_value=True),
+			mock.patch('wicd.wnettools.misc.Run')]
+		for patcher in patchers:
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def test_no_fork(self):
+		with mock.patch.multiple('wicd.wnettools.procfs',
+				get_ip=mock.Mock(return_value='192.168.1.10'),
+				get_bssid=mock.Mock(return_value='00:11:22:33:44:55'),
+				get_essid=mock.Mock(return_value='home'),
+				get_bitrate=mock.Mock(return_value='54 Mb/s'),
+				get_wireless_stats=mock.Mock(return_value=(77, -56))):
+			self.assertEqual(self.iface.GetIP(), '192.168.1.10')
+			self.assertEqual(self.iface.GetBSSID(), '00:11:22:33:44:55')
+			self.assertEqual(self.iface.GetCurrentNetwork(), 'home')
+			self.assertEqual(self.iface.GetCurrentBitrate(), '54 Mb/s')
+			self.assertEqual(self.iface.GetSignalStrength(), 77)
+			self.assertEqual(self.iface.GetDBMStrength(), '-56')
+		wnettools.misc.Run.assert_not_called()
+
+	def test_not_associated(self):
+		with mock.patch('wicd.wnettools.procfs.get_wireless_stats',
+				return_value=None):
+			self.assertEqual(self.iface.GetSignalStrength(), 101)
+			self.assertIsNone(self.iface.GetDBMStrength())
+
+	def test_iwconfig_given(self):
+		iwconfig = 'wlan0     IEEE 802.11\n          Bit Rate=54 Mb/s\n'
+		self.assertEqual(self.iface.GetCurrentBitrate(iwconfig), '54 Mb/s')
+
+	def test_default_gateway_fallback(self):
+		wnettools.misc.Run.return_value = ('Kernel IP routing table\n'
+			'Destination     Gateway         Genmask\n'
+			'0.0.0.0         10.0.0.1        0.0.0.0\n')
+		with mock.patch('wicd.wnettools.procfs.get_default_gateway',
+				return_value=None):
+			self.assertEqual(wnettools.GetDefaultGateway(), '10.0.0.1')
+		with mock.patch('wicd.wnettools.procfs.get_default_gateway',
+				return_value='192.168.1.1'):
+			self.assertEqual(wnettools.GetDefaultGateway(), '192.168.1.1')
+		self.assertEqual(wnettools.misc.Run.call_count, 1)
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestProcfs, TestInterfaceProcfs):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+from wicd.configmanager import ConfigManager
+from wicd.daemon.profileindex import ProfileIndex
+
+class TestProfileIndex(unittest.TestCase):
+	def setUp(self):
+		self.config = ConfigManager('')
+		self.config.set('00:11:22:33:44:55', 'essid', 'Home')
+		self.config.set('00:11:22:33:44:55', 'automatic', 'True')
+		self.config.set('00:11:22:33:44:55', 'dns1', 'None')
+		self.config.set('essid:Office', 'use_settings_globally', '1')
+		self.config.set('essid:Office', 'key', '0123')
+		self.config.set('essid:Cafe', 'use_settings_globally', 'False')
+		self.index = ProfileIndex(self.config)
+
+	def test_bssid_profile(self):
+		profile = self.index.lookup('Home', '00:11:22:33:44:55')
+		self.assertEqual(profile, {'essid' : 'Home', 'automatic' : True,
+			'dns1' : None})
+		self.assertEqual(self.index.lookup('Home', '66:77:88:99:AA:BB'), None)
+
+	def test_global_essid_profile(self):
+		profile = self.index.lookup('Office', '66:77:88:99:AA:BB')
+		self.assertEqual(profile['key'], '0123')
+		self.assertEqual(self.index.lookup('Cafe', '66:77:88:99:AA:BB'), None)
+
+	def test_essid_profile_wins(self):
+		self.config.set('66:77:88:99:AA:BB', 'essid', 'Office')
+		profile = self.index.lookup('Office', '66:77:88:99:AA:BB')
+		self.assertEqual(profile['use_settings_globally'], 1)
+
+	def test_decoded_once(self):
+		self.index.lookup('Home', '00:11:22:33:44:55')
+		with mock.patch.object(self.config, 'get_option') as get_option:
+			for x in range(10):
+				self.index.lookup('Home', '00:11:22:33:44:55')
+			self.assertFalse(get_option.called)
+
+	def test_rebuilt_on_change(self):
+		self.index.lookup('Home', '00:11:22:33:44:55')
+		self.config.set('00:11:22:33:44:55', 'automatic', 'False')
+		self.assertFalse(self.index.lookup('Home', '00:11:22:33:44:55')['automatic'])
+		self.config.remove_section('00:11:22:33:44:55')
+		self.assertEqual(self.index.lookup('Home', '00:11:22:33:44:55'), None)
+		self.config.remove_option('essid:Office', 'key')
+		self.assertNotIn('key', self.index.lookup('Office', ''))
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestProfileIndex) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestProfileIndex(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
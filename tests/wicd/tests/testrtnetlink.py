@@ -0,0 +1,175 @@
+import errno
+import socket
+import struct
+import unittest
+from unittest import mock
+from wicd import misc
+from wicd import netlink
+from wicd import wnettools
+
+def reply(msg_type, seq, payload, flags=0):
+	return netlink.nlmsghdr.pack(netlink.nlmsghdr.size + len(payload),
+		msg_type, flags, seq, 0) + payload
+
+def route(table, dst_len, oif):
+	return netlink.rtmsg.pack(socket.AF_INET, dst_len, 0, 0, table, 3, 0, 1,
+		0) + netlink.pack_attr(netlink.RTA_OIF, netlink.u32.pack(oif))
+
+def address(ifindex, ip):
+	return netlink.ifaddrmsg.pack(socket.AF_INET, 24, 0, 0, ifindex) + \
+		netlink.pack_attr(netlink.IFA_LOCAL, socket.inet_aton(ip))
+
+class FakeKernel(object):
+	""" Stands in for the socket, answering dumps and acking changes. """
+	def __init__(self, routes=(), addresses=(), error=0):
+		self.routes = list(routes)
+		self.addresses = list(addresses)
+		self.error = error
+		self.changes = []
+		self.pending = []
+
+	def send(self, data):
+		(msg_type, flags, seq, payload), = netlink.iter_messages(data)
+		dumps = {netlink.RTM_GETROUTE: self.routes,
+			netlink.RTM_GETADDR: self.addresses}
+		if msg_type in dumps:
+			dump = dumps[msg_type]
+			self.pending.append(b''.join(reply(msg_type - 2, seq, entry,
+				netlink.NLM_F_MULTI) for entry in dump))
+			self.pending.append(reply(netlink.NLMSG_DONE, seq, b'\0' * 4))
+		else:
+			self.changes.append((msg_type, flags, payload))
+			self.pending.append(reply(netlink.NLMSG_ERROR, seq,
+				netlink.nlmsgerr.pack(-self.error) + data[:16]))
+
+	def recv(self, size):
+		return self.pending.pop(0)
+
+def rtnl(kernel):
+	sock = netlink.RouteNetlinkSocket.__new__(netlink.RouteNetlinkSocket)
+	sock.sock = kernel
+	sock.seq = 0
+	return sock
+
+class TestRouteNetlinkSocket(unittest.TestCase):
+	def test_flush_routes(self):
+		kernel = FakeKernel([route(254, 0, 2), route(254, 24, 2),
+			route(254, 0, 3), route(255, 32, 2)])
+		rtnl(kernel).flush_routes(2)
+		self.assertEqual(kernel.changes, [
+			(netlink.RTM_DELROUTE, netlink.NLM_F_REQUEST | netlink.NLM_F_ACK,
+				route(254, 0, 2)),
+			(netlink.RTM_DELROUTE, netlink.NLM_F_REQUEST | netlink.NLM_F_ACK,
+				route(254, 24, 2))])
+
+	def test_del_default_route(self):
+		kernel = FakeKernel([route(254, 24, 2), route(254, 0, 2)])
+		rtnl(kernel).del_default_route(2)
+		self.assertEqual([change[2] for change in kernel.changes],
+			[route(254, 0, 2)])
+
+	def test_add_default_route(self):
+		kernel = FakeKernel()
+		rtnl(kernel).add_default_route(2, '192.168.1.1')
+		(msg_type, flags, payload), = kernel.changes
+		self.assertEqual(msg_type, netlink.RTM_NEWROUTE)
+		self.assertTrue(flags & netlink.NLM_F_CREATE)
+		fields = netlink.rtmsg.unpack_from(payload)
+		self.assertEqual(fields[1], 0)
+		self.assertEqual(fields[4], netlink.RT_TABLE_MAIN)
+		attrs = netlink.parse_attrs(payload, netlink.rtmsg.size)
+		self.assertEqual(attrs[netlink.RTA_GATEWAY],
+			socket.inet_aton('192.168.1.1'))
+		self.assertEqual(attrs[netlink.RTA_OIF], netlink.u32.pack(2))
+
+	def test_set_address(self):
+		kernel = FakeKernel(addresses=[address(2, '10.0.0.5'),
+			address(3, '10.0.1.5')])
+		rtnl(kernel).set_address(2, '192.168.1.10', 24, '192.168.1.255')
+		(del_type, _, old), (new_type, _, payload) = kernel.changes
+		self.assertEqual(del_type, netlink.RTM_DELADDR)
+		self.assertEqual(old, address(2, '10.0.0.5'))
+		self.assertEqual(new_type, netlink.RTM_NEWADDR)
+		self.assertEqual(netlink.ifaddrmsg.unpack_from(payload)[1], 24)
+		attrs = netlink.parse_attrs(payload, netlink.ifaddrmsg.size)
+		self.assertEqual(attrs[netlink.IFA_LOCAL],
+			socket.inet_aton('192.168.1.10'))
+		self.assertEqual(attrs[netlink.IFA_BROADCAST],
+			socket.inet_aton('192.168.1.255'))
+
+	def test_error(self):
+		kernel = FakeKernel(error=errno.EPERM)
+		with self.assertRaises(OSError) as cm:
+			rtnl(kernel).add_default_route(2, '192.168.1.1')
+		self.assertEqual(cm.exception.errno, errno.EPERM)
+
+class TestInterfaceRtnetlink(unittest.TestCase):
+	def setUp(self):
+		self.iface = wnettools.BaseInterface('eth0')
+		self.iface.use_rtnetlink = True
+		self.iface.flush_tool = misc.AUTO
+		self.iface.rtnl = mock.Mock()
+		patchers = [mock.patch('wicd.wnettools.socket.if_nametoindex',
+				return_value=2),
+			mock.patch('os.path.exists', return_value=True),
+			mock.patch('wicd.wnettools.misc.Run'),
+			mock.patch('wicd.wnettools.ifconfig_tool')]
+		mocks = [patcher.start() for patcher in patchers]
+		self.run, self.ifconfig = mocks[2:]
+		for patcher in patchers:
+			self.addCleanup(patcher.stop)
+
+	def test_set_address(self):
+		self.iface.SetAddress('192.168.1.10', '255.255.255.0')
+		self.iface.rtnl.set_address.assert_called_once_with(2,
+			'192.168.1.10', 24, '192.168.1.255')
+		self.ifconfig.assert_not_called()
+
+	def test_set_address_classful(self):
+		self.iface.SetAddress('10.1.2.3')
+		self.iface.rtnl.set_address.assert_called_once_with(2,
+			'10.1.2.3', 8, '10.255.255.255')
+
+	def test_routes(self):
+		self.iface.FlushRoutes()
+		self.iface.DelDefaultRoute()
+		self.iface.SetDefaultRoute('192.168.1.1')
+		self.iface.rtnl.flush_routes.assert_called_once_with(2)
+		self.iface.rtnl.del_default_route.assert_called_once_with(2)
+		self.iface.rtnl.add_default_route.assert_called_once_with(2,
+			'192.168.1.1')
+		self.run.assert_not_called()
+
+	def test_failure_falls_back(self):
+		self.iface.rtnl.set_address.side_effect = OSError(errno.EPERM,
+			'Operation not permitted')
+		with mock.patch('builtins.print'):
+			self.iface.SetAddress('192.168.1.10', '255.255.255.0')
+		self.ifconfig.assert_called_once_with(['eth0', '192.168.1.10',
+			'netmask', '255.255.255.0', 'broadcast', '192.168.1.255'])
+
+	def test_tools_without_flag(self):
+		self.iface.use_rtnetlink = False
+		self.iface.SetDefaultRoute('192.168.1.1')
+		self.iface.rtnl.add_default_route.assert_not_called()
+		self.run.assert_called_once_with(
+			'route add default gw 192.168.1.1 dev eth0')
+
+	def test_chosen_tool(self):
+		self.iface.flush_tool = misc.IP
+		self.iface.ip_cmd = '/sbin/ip'
+		self.iface.FlushRoutes()
+		self.iface.rtnl.flush_routes.assert_not_called()
+		self.run.assert_called_once_with('/sbin/ip route flush dev eth0')
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestRouteNetlinkSocket, TestInterfaceRtnetlink):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,112 @@
+import os
+import re
+import signal
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+from wicd import misc
+from wicd import runner
+from wicd import tools
+from wicd import errors
+
+class TestRunner(unittest.TestCase):
+	def setUp(self):
+		runner.forget_paths()
+
+	def test_run(self):
+		result = runner.run(['echo', 'hi'])
+		self.assertEqual(result.returncode, 0)
+		self.assertEqual(result.out, b'hi\n')
+		self.assertEqual(result.err, b'')
+
+	def test_c_locale(self):
+		result = runner.run(['sh', '-c', 'echo $LANG $LC_ALL'])
+		self.assertEqual(result.out, b'C C\n')
+
+	def test_stderr_merged(self):
+		result = runner.run(['sh', '-c', 'echo out; echo err >&2'],
+			stderr=subprocess.STDOUT)
+		self.assertEqual(result.out, b'out\nerr\n')
+
+	def test_stderr_pipe(self):
+		result = runner.run(['sh', '-c', 'echo out; echo err >&2; exit 3'],
+			stderr=subprocess.PIPE)
+		self.assertEqual(result.returncode, 3)
+		self.assertEqual(result.out, b'out\n')
+		self.assertEqual(result.err, b'err\n')
+
+	def in_directory(self, directory):
+		cwd = os.getcwd()
+		self.addCleanup(os.chdir, cwd)
+		os.chdir(directory)
+
+	def test_child_setup(self):
+		# posix_spawn() runs the command from the root directory, the
+		# subprocess fallback from anywhere else.
+		for directory in ('/', tempfile.gettempdir()):
+			self.in_directory(directory)
+			with mock.patch('wicd.runner.Popen', wraps=subprocess.Popen) \
+					as popen:
+				self.assertEqual(runner.run(['pwd']).out, b'/\n')
+				status = runner.run(['cat', '/proc/self/status']).out
+			self.assertEqual(popen.called, directory != '/')
+			ignored = int(re.search(rb'SigIgn:\s*([0-9a-f]+)', status)
+				.group(1), 16)
+			for sig in (signal.SIGPIPE, signal.SIGXFSZ):
+				self.assertFalse(ignored & (1 << (sig - 1)), sig)
+
+	def test_timeout(self):
+		with self.assertRaises(subprocess.TimeoutExpired):
+			runner.run(['sleep', '5'], timeout=0.2)
+		self.assertLess(runner.timings.histograms['sleep'].max, 1.0)
+
+	def test_which_cached(self):
+		with mock.patch('wicd.runner.shutil.which',
+				return_value='/bin/true') as which:
+			self.assertEqual(runner.which('true'), '/bin/true')
+			self.assertEqual(runner.which('true'), '/bin/true')
+		self.assertEqual(which.call_count, 1)
+
+	def test_missing_program(self):
+		with self.assertRaises(FileNotFoundError):
+			runner.run(['wicd-no-such-program'])
+
+	def test_timings(self):
+		runner.run(['true'])
+		self.assertIn('true', runner.timings.histograms)
+
+	def test_observe(self):
+		seen = []
+		with runner.observe(lambda *args: seen.append(args)):
+			runner.run(['sh', '-c', 'exit 2'])
+			misc.Run(['true'], return_obj=True).communicate()
+		runner.run(['true'])
+		self.assertEqual([(args, returncode) for args, returncode, _ in seen],
+			[(['sh', '-c', 'exit 2'], 2), (['true'], None)])
+
+	def test_misc_run_missing(self):
+		with mock.patch('builtins.print'):
+			self.assertEqual(misc.Run(['wicd-no-such-program']), '')
+
+	def test_misc_run_timeout(self):
+		with mock.patch('builtins.print'):
+			self.assertEqual(misc.Run('sleep 5', timeout=0.2), '')
+
+	def test_external_command(self):
+		command = tools.ExternalCommand([runner.which('sh')])
+		out, err = command(['-c', 'echo $0'], 'x')
+		self.assertEqual(out, 'x\n')
+		with self.assertRaises(errors.WiCDCommandFailure):
+			command('-c', 'exit 1')
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestRunner) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestRunner(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from wicd.daemon.scancoordinator import ScanCoordinator, START, JOIN, CACHED, BUSY
+
+class TestScanCoordinator(unittest.TestCase):
+	def setUp(self):
+		self.scans = ScanCoordinator(freshness=5, client_interval=10)
+
+	def test_concurrent_requests_share_one_scan(self):
+		actions = [self.scans.request(client=':1.%d' % x, now=100) for x in range(4)]
+		self.assertEqual(actions, [START, JOIN, JOIN, JOIN])
+		self.assertFalse(self.scans.wait(0))
+		self.scans.finish(now=103)
+		self.assertTrue(self.scans.wait(0))
+
+	def test_fresh_results_are_cached(self):
+		self.assertEqual(self.scans.request(now=100), START)
+		self.scans.finish(now=103)
+		self.assertEqual(self.scans.request(client=':1.2', now=107), CACHED)
+		self.assertEqual(self.scans.request(client=':1.2', now=108), START)
+
+	def test_client_rate_limit(self):
+		self.scans.freshness = 0
+		self.assertEqual(self.scans.request(client=':1.1', now=100), START)
+		self.scans.finish(now=101)
+		self.assertEqual(self.scans.request(client=':1.2', now=102), START)
+		self.scans.finish(now=103)
+		self.assertEqual(self.scans.request(client=':1.1', now=109), CACHED)
+		self.assertEqual(self.scans.request(client=':1.1', now=110), START)
+
+	def test_daemon_is_not_rate_limited(self):
+		self.scans.freshness = 0
+		for now in (100, 101, 102):
+			self.assertEqual(self.scans.request(now=now), START)
+			self.scans.finish(now=now)
+
+	def test_other_essid(self):
+		self.assertEqual(self.scans.request('None', now=100), START)
+		self.assertEqual(self.scans.request('hidden', now=101), BUSY)
+		self.scans.finish(now=102)
+		self.assertEqual(self.scans.request('hidden', now=103), START)
+
+	def test_invalidate(self):
+		self.assertEqual(self.scans.request(client=':1.1', now=100), START)
+		self.scans.finish(now=101)
+		self.scans.invalidate()
+		self.assertEqual(self.scans.request(client=':1.1', now=102), START)
+
+	def test_forgets_old_clients(self):
+		self.scans.freshness = 0
+		for x in range(5):
+			self.scans.request(client=':1.%d' % x, now=100)
+			self.scans.finish(now=100)
+		self.scans.request(client=':1.9', now=200)
+		self.assertEqual(list(self.scans.clients), [':1.9'])
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestScanCoordinator) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestScanCoordinator(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+from wicd.accesspoint import AccessPoint
+from wicd.daemon.scansnapshot import save_snapshot, load_snapshot
+
+class TestScanSnapshot(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'scan-snapshot.json')
+		self.networks = [AccessPoint({'bssid' : '00:11:22:33:44:55',
+			'essid' : 'Network', 'hidden' : False, 'channel' : '6',
+			'bitrates' : ['1.0', '2.0'], 'mode' : 'ESS', 'encryption' : True,
+			'encryption_method' : 'WPA2', 'quality' : 80,
+			'strength' : '-50.00', 'first_seen' : 100.0,
+			'last_seen' : 110.0}),
+			AccessPoint({'bssid' : '66:77:88:99:AA:BB', 'essid' : '<hidden>',
+			'hidden' : True, 'mode' : 'ESS', 'quality' : 40})]
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_round_trip(self):
+		save_snapshot(self.path, 'wlan0', self.networks)
+		networks = load_snapshot(self.path, 'wlan0')
+		self.assertEqual([dict(n.items()) for n in networks],
+			[dict(n.items()) for n in self.networks])
+		self.assertEqual(os.listdir(self.dir), ['scan-snapshot.json'])
+
+	def test_profile_settings_not_saved(self):
+		self.networks[0]['key'] = 'secret'
+		save_snapshot(self.path, 'wlan0', self.networks)
+		with open(self.path) as f:
+			self.assertNotIn('secret', f.read())
+		self.assertNotIn('key', load_snapshot(self.path, 'wlan0')[0])
+
+	def test_hidden_profile_not_saved(self):
+		loads = []
+		def load_profile(ap):
+			loads.append(ap['bssid'])
+			ap['essid'] = 'Stored'
+			ap['key'] = 'secret'
+		hidden = self.networks[1]
+		hidden.defer_profile(load_profile)
+		save_snapshot(self.path, 'wlan0', self.networks)
+		self.assertEqual(loads, [])
+		self.assertEqual(hidden['essid'], 'Stored')
+		save_snapshot(self.path, 'wlan0', self.networks)
+		with open(self.path) as f:
+			data = f.read()
+		self.assertNotIn('Stored', data)
+		self.assertNotIn('secret', data)
+		network = load_snapshot(self.path, 'wlan0')[1]
+		self.assertEqual(network['essid'], '<hidden>')
+		self.assertTrue(network['hidden'])
+		self.assertNotIn('key', network)
+
+	def test_other_interface(self):
+		save_snapshot(self.path, 'wlan0', self.networks)
+		self.assertEqual(load_snapshot(self.path, 'wlan1'), [])
+
+	def test_missing_or_broken_snapshot(self):
+		self.assertEqual(load_snapshot(self.path, 'wlan0'), [])
+		with open(self.path, 'w') as f:
+			f.write('{"version":1,"interface":"wl')
+		self.assertEqual(load_snapshot(self.path, 'wlan0'), [])
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestScanSnapshot) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestScanSnapshot(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
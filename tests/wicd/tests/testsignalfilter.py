@@ -0,0 +1,66 @@
+import unittest
+from wicd.daemon import signalfilter
+from wicd.daemon.signalfilter import SignalFilter, QUALITY_BUCKETS, DBM_BUCKETS
+
+class TestSignalFilter(unittest.TestCase):
+	def setUp(self):
+		self.filter = SignalFilter(window=5, delta=5)
+
+	def feed(self, samples, bssid='00:11:22:33:44:55', buckets=QUALITY_BUCKETS):
+		return [self.filter.update(bssid, x, buckets) for x in samples]
+
+	def test_first_sample_is_published(self):
+		self.assertEqual(self.feed([62]), [62])
+		self.assertEqual(self.filter.emitted, 1)
+
+	def test_noise_is_suppressed(self):
+		published = self.feed([62, 64, 60, 63, 61, 64, 60, 62])
+		self.assertEqual(set(published), set([62]))
+		self.assertEqual(self.filter.emitted, 1)
+		self.assertTrue(self.filter.suppressed > 0)
+
+	def test_spike_is_ignored(self):
+		self.assertEqual(self.feed([62, 62, 20, 62, 62]), [62] * 5)
+
+	def test_real_change_is_published(self):
+		published = self.feed([62, 62, 62, 40, 40, 40])
+		self.assertEqual(published[-1], 40)
+		self.assertEqual(self.filter.emitted, 2)
+
+	def test_bucket_boundary(self):
+		self.feed([53, 53, 53])
+		self.assertEqual(self.feed([50, 50, 50]), [53, 53, 50])
+		self.assertEqual(self.filter.suppressed, 0)
+
+	def test_dbm_buckets(self):
+		self.filter.window = 1
+		self.feed([-58], buckets=DBM_BUCKETS)
+		self.assertEqual(self.feed([-60], buckets=DBM_BUCKETS), [-58])
+		self.assertEqual(self.feed([-61], buckets=DBM_BUCKETS), [-61])
+
+	def test_bssids_are_separate(self):
+		self.feed([70, 70], bssid='a')
+		self.assertEqual(self.feed([30], bssid='b'), [30])
+		self.assertEqual(self.feed([71], bssid='a'), [70])
+
+	def test_forgets_old_bssids(self):
+		for x in range(signalfilter.MAX_BSSIDS + 4):
+			self.feed([50], bssid=x)
+		self.assertEqual(len(self.filter.samples), signalfilter.MAX_BSSIDS)
+		self.assertNotIn(0, self.filter.published)
+
+	def test_window_change(self):
+		self.feed([10, 80, 80])
+		self.filter.window = 1
+		self.assertEqual(self.feed([30]), [30])
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestSignalFilter) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestSignalFilter(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,175 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from wicd import supplicant
+from wicd import wnettools
+from wicd import wpactrl
+from .testwpactrl import FakeSupplicant
+
+CONFIG = '''ap_scan=1
+ctrl_interface=/var/run/wpa_supplicant
+network={
+       ssid="home"
+       scan_ssid=1
+       key_mgmt=WPA-PSK
+       psk=%s
+}
+'''
+
+class NetworkSupplicant(FakeSupplicant):
+	""" Adds networks like wpa_supplicant does. """
+	def __init__(self, path, **kwargs):
+		self.next_id = 0
+		self.fail = ()
+		FakeSupplicant.__init__(self, path, **kwargs)
+
+	def reply(self, command):
+		if command.split(' ')[0] in self.fail:
+			return 'FAIL\n'
+		if command == 'ADD_NETWORK':
+			self.next_id += 1
+			return '%d\n' % (self.next_id - 1)
+		return FakeSupplicant.reply(self, command)
+
+	def configuring(self):
+		return [request for request in self.requests if request != 'PING']
+
+class TestParseConfig(unittest.TestCase):
+	def test_parse(self):
+		settings, networks = supplicant.parse_config(CONFIG % '"secret"')
+		self.assertEqual(settings, [('ap_scan', '1'),
+			('ctrl_interface', '/var/run/wpa_supplicant')])
+		self.assertEqual(networks, [[('ssid', '"home"'), ('scan_ssid', '1'),
+			('key_mgmt', 'WPA-PSK'), ('psk', '"secret"')]])
+
+	def test_comments(self):
+		settings, networks = supplicant.parse_config(
+			'# comment\n\nnetwork = {\n  ssid="a=b"\n}\n')
+		self.assertEqual(settings, [])
+		self.assertEqual(networks, [[('ssid', '"a=b"')]])
+
+class TestManagedSupplicant(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.dir.cleanup)
+		self.addCleanup(wpactrl.forget)
+		self.addCleanup(supplicant.forget)
+		self.path = os.path.join(self.dir.name, 'wlan0')
+		self.managed = supplicant.get('wlan0', 'nl80211', self.dir.name)
+
+	def supplicant(self):
+		fake = NetworkSupplicant(self.path)
+		self.addCleanup(fake.close)
+		return fake
+
+	def test_add_network(self):
+		fake = self.supplicant()
+		self.assertTrue(self.managed.connect('001122334455',
+			CONFIG % '"secret"'))
+		self.assertEqual(fake.configuring(), ['AP_SCAN 1', 'ADD_NETWORK',
+			'SET_NETWORK 0 ssid "home"', 'SET_NETWORK 0 scan_ssid 1',
+			'SET_NETWORK 0 key_mgmt WPA-PSK', 'SET_NETWORK 0 psk "secret"',
+			'SELECT_NETWORK 0', 'REASSOCIATE'])
+
+	def test_reuse_network(self):
+		fake = self.supplicant()
+		self.managed.connect('001122334455', CONFIG % '"secret"')
+		del fake.requests[:]
+		self.managed.connect('001122334455', CONFIG % '"secret"')
+		self.assertEqual(fake.configuring(), ['AP_SCAN 1', 'SELECT_NETWORK 0',
+			'REASSOCIATE'])
+		del fake.requests[:]
+		self.managed.connect('001122334455', CONFIG % '"changed"')
+		self.assertEqual(fake.configuring(), ['AP_SCAN 1',
+			'SET_NETWORK 0 psk "changed"', 'SELECT_NETWORK 0', 'REASSOCIATE'])
+
+	def test_other_encryption(self):
+		fake = self.supplicant()
+		self.managed.connect('001122334455', CONFIG % '"secret"')
+		del fake.requests[:]
+		self.managed.connect('001122334455',
+			'network={\n ssid="home"\n key_mgmt=NONE\n}\n')
+		self.assertEqual(fake.configuring(), ['REMOVE_NETWORK 0',
+			'ADD_NETWORK', 'SET_NETWORK 1 ssid "home"',
+			'SET_NETWORK 1 key_mgmt NONE', 'SELECT_NETWORK 1', 'REASSOCIATE'])
+
+	def test_start(self):
+		started = []
+		def run(cmd):
+			started.append(cmd)
+			self.addCleanup(NetworkSupplicant(self.path).close)
+		with mock.patch('wicd.supplicant.misc.Run', side_effect=run):
+			self.assertTrue(self.managed.connect('001122334455',
+				CONFIG % '"secret"'))
+		self.assertEqual(started, [['wpa_supplicant', '-B', '-i', 'wlan0',
+			'-C', self.dir.name, '-Dnl80211']])
+
+	def test_refused(self):
+		fake = self.supplicant()
+		fake.fail = ('SET_NETWORK',)
+		with self.assertRaises(supplicant.SupplicantError):
+			self.managed.connect('001122334455', CONFIG % '"secret"')
+		fake.fail = ()
+		del fake.requests[:]
+		self.managed.connect('001122334455', CONFIG % '"secret"')
+		self.assertIn('ADD_NETWORK', fake.requests)
+
+class TestKeepSupplicant(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.dir.cleanup)
+		self.addCleanup(wpactrl.forget)
+		self.addCleanup(supplicant.forget)
+		patcher = mock.patch('wicd.wpactrl.CTRL_DIR', self.dir.name)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		# StopWPA and Authenticate need an interface that exists.
+		self.iface = wnettools.BaseWirelessInterface('lo',
+			wpa_driver='nl80211')
+		self.iface.SetKeepSupplicant(True)
+		self.fake = NetworkSupplicant(os.path.join(self.dir.name, 'lo'))
+		self.addCleanup(self.fake.close)
+		self.network = {'bssid': '00:11:22:33:44:55', 'essid': 'home',
+			'enctype': 'wpa'}
+
+	def test_authenticate(self):
+		with mock.patch('wicd.wnettools.misc.RenderEncryption',
+				return_value=CONFIG % '"secret"'):
+			with mock.patch('wicd.wnettools.misc.Run') as run:
+				self.iface.Authenticate(self.network)
+		run.assert_not_called()
+		self.assertEqual(self.fake.requests[-2:],
+			['SELECT_NETWORK 0', 'REASSOCIATE'])
+
+	def test_restart_fallback(self):
+		self.fake.fail = ('SELECT_NETWORK',)
+		with mock.patch('wicd.wnettools.misc.RenderEncryption',
+				return_value=CONFIG % '"secret"'):
+			with mock.patch('wicd.wnettools.misc.ParseEncryption'):
+				with mock.patch('wicd.wnettools.misc.Run') as run:
+					with mock.patch('builtins.print'):
+						self.iface.Authenticate(self.network)
+		self.assertIn('TERMINATE', self.fake.requests)
+		cmd = run.call_args[0][0]
+		self.assertEqual(cmd[:5], ['wpa_supplicant', '-B', '-i', 'lo',
+			'-c'])
+
+	def test_stop_disconnects(self):
+		with mock.patch('wicd.wnettools.misc.Run') as run:
+			self.iface.StopWPA()
+		run.assert_not_called()
+		self.assertEqual(self.fake.requests[-1], 'DISCONNECT')
+		self.assertNotIn('TERMINATE', self.fake.requests)
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestParseConfig, TestManagedSupplicant, TestKeepSupplicant):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+from wicd import runner
+from wicd import wnettools
+from wicd.daemon import timeline
+
+class TestTimeline(unittest.TestCase):
+	def test_steps(self):
+		line = timeline.Timeline('wireless', 'home', '00:11:22:33:44:55')
+		outer = line.start_step('set_ip_address', 'full')
+		line.command(['dhclient', 'wlan0'], 0, 1.5)
+		inner = line.start_step('run_script_if_needed', 'full')
+		line.command(['/etc/wicd/scripts/script'], 1, None)
+		line.end_step(inner, 'ok')
+		line.command(['ip', 'route'], 0, 0.01)
+		line.end_step(outer, 'dhcp_failed')
+		line.command(['ignored'], 0, 0.0)
+		line.status('running_dhcp')
+		line.finish('dhcp_failed')
+		info = line.as_dict()
+		self.assertEqual(info['result'], 'dhcp_failed')
+		self.assertEqual([step['step'] for step in info['steps']],
+			['set_ip_address', 'run_script_if_needed'])
+		self.assertEqual(info['steps'][0]['commands'],
+			[('dhclient', 0, 1.5), ('ip', 0, 0.01)])
+		self.assertEqual(info['steps'][1]['commands'], [('script', 1, None)])
+		self.assertEqual(info['steps'][0]['result'], 'dhcp_failed')
+		self.assertGreaterEqual(info['steps'][0]['end'],
+			info['steps'][0]['start'])
+		self.assertEqual([status for _, status in info['statuses']],
+			['running_dhcp'])
+
+	def test_bounded(self):
+		line = timeline.Timeline('wired', 'wired', 'wired')
+		with mock.patch('wicd.daemon.timeline.MAX_STEPS', 3):
+			with mock.patch('wicd.daemon.timeline.MAX_COMMANDS', 2):
+				for i in range(5):
+					step = line.start_step('step%d' % i, 'full')
+					for j in range(3):
+						line.command(['cmd'], 0, 0.0)
+					line.end_step(step, 'ok')
+		info = line.as_dict()
+		self.assertEqual(len(info['steps']), 3)
+		self.assertEqual(info['dropped_steps'], 2)
+		self.assertEqual(info['dropped_commands'], 3)
+		self.assertEqual(info['finished'], 0.0)
+
+	def test_no_key(self):
+		line = timeline.Timeline('wireless', 'home', '00:11:22:33:44:55')
+		step = line.start_step('generate_psk_and_authenticate', 'full')
+		iface = wnettools.BaseWirelessInterface('lo')
+		with mock.patch('wicd.wnettools.capabilities.find',
+				return_value=runner.which('echo')):
+			with runner.observe(line.command):
+				iface.GeneratePSK({'essid': 'home',
+					'key': 'SuperSecretPassphrase'})
+		line.end_step(step, 'ok')
+		info = line.as_dict()
+		self.assertEqual([command for command, _, _ in
+			info['steps'][0]['commands']], ['echo'])
+		self.assertNotIn('SuperSecretPassphrase', repr(info))
+
+	def test_ring(self):
+		ring = timeline.TimelineRing(2)
+		self.assertIsNone(ring.last())
+		for name in ('a', 'b', 'c'):
+			ring.start('wireless', name, name)
+		self.assertEqual([line.name for line in ring.all()], ['b', 'c'])
+		self.assertEqual(ring.last().name, 'c')
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestTimeline) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestTimeline(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
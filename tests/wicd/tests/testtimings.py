@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+from wicd.daemon.timings import Histogram, PhaseTimings
+
+class TestTimings(unittest.TestCase):
+	def test_buckets(self):
+		histogram = Histogram((0.001, 0.01, 1.0))
+		for seconds in (0.0005, 0.001, 0.002, 0.5, 3.0):
+			histogram.add(seconds)
+		self.assertEqual(histogram.buckets(), [('<=1ms', 2), ('<=10ms', 1),
+			('<=1s', 1), ('>1s', 1)])
+		self.assertEqual(histogram.count(), 5)
+		self.assertEqual(histogram.max, 3.0)
+
+	def test_phases(self):
+		timings = PhaseTimings((0.1,))
+		timings.record('wired', 0.05)
+		timings.record('wireless', 0.2)
+		timings.record('wired', 0.3)
+		self.assertEqual(timings.buckets(), {
+			'wired': [('<=100ms', 1), ('>100ms', 1)],
+			'wireless': [('<=100ms', 0), ('>100ms', 1)]})
+
+	def test_time(self):
+		timings = PhaseTimings()
+		with mock.patch('wicd.daemon.timings.time.perf_counter',
+				side_effect=[10.0, 10.02]):
+			with timings.time('tick'):
+				pass
+		self.assertAlmostEqual(timings.histograms['tick'].total, 0.02)
+
+	def test_time_records_on_error(self):
+		timings = PhaseTimings()
+		with self.assertRaises(ValueError):
+			with timings.time('tick'):
+				raise ValueError()
+		self.assertEqual(timings.histograms['tick'].count(), 1)
+
+	def test_format(self):
+		timings = PhaseTimings((0.01, 1.0))
+		timings.record('publish', 0.004)
+		timings.record('publish', 0.006)
+		timings.record('wireless', 2.5)
+		self.assertEqual(timings.format().splitlines(), [
+			'publish: n=2 mean=5ms max=6ms <=10ms:2',
+			'wireless: n=1 mean=2.5s max=2.5s >1s:1'])
+
+def suite():
+	suite = unittest.TestSuite()
+	tests = []
+	[ tests.append(test) for test in dir(TestTimings) if test.startswith('test') ]
+	for test in tests:
+		suite.addTest(TestTimings(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,3 +1,5 @@
+import io
+import re
 import unittest
 from unittest import mock
 from wicd import wnettools
@@ -20,6 +22,67 @@ class TestWnettools(unittest.TestCase):
 		cells = wnettools.BaseWirelessInterface('wlan0').GetNetworks()
 		self.assertGreater(len(cells), 0)
 	
+	@mock.patch('wicd.wnettools.os.path.exists', return_value=True)
+	@mock.patch('wicd.misc.Run')
+	def test_parse_every_bss(self, mock_syscall, mock_exists):
+		with open('tests/crazy.wifi', 'r') as content_file:
+			iw_scan = content_file.read()
+		mock_syscall.return_value = iw_scan
+		cells = wnettools.BaseWirelessInterface('wlan0').GetNetworks()
+		bssids = set(cell['bssid'] for cell in cells)
+		expected = set(line.split('(')[0][4:] for line in iw_scan.splitlines()
+			if line.startswith('BSS '))
+		self.assertEqual(bssids, expected)
+
+	def test_iw_scan_tokenizer(self):
+		lines = ['BSS 00:11:22:33:44:55(on wlan0)',
+			'\tfreq: 2412',
+			'\tSSID: some: network',
+			'\tSSID: ignored',
+			'\t\t * nested: ignored',
+			'BSS 66:77:88:99:aa:bb(on wlan0) -- associated',
+			'\tfreq: 5180']
+		bsses = list(wnettools.IterIwScan(lines))
+		self.assertEqual(len(bsses), 2)
+		self.assertEqual(bsses[0]['bssid'], '00:11:22:33:44:55')
+		self.assertEqual(bsses[0]['SSID'], 'some: network')
+		self.assertEqual(bsses[0]['freq'], '2412')
+		self.assertEqual(bsses[1]['bssid'], '66:77:88:99:aa:bb')
+		self.assertNotIn('SSID', bsses[1])
+
+	@mock.patch('wicd.wnettools.os.path.exists', return_value=True)
+	@mock.patch('wicd.misc.Run')
+	def test_stream_networks(self, mock_syscall, mock_exists):
+		with open('tests/crazy.wifi', 'rb') as content_file:
+			iw_scan = content_file.read()
+		proc = mock_syscall.return_value
+		proc.stdout = io.BytesIO(iw_scan)
+		proc.poll.return_value = None
+		networks = wnettools.BaseWirelessInterface('wlan0').IterNetworks()
+		first = next(networks)
+		# The first network is there before all of the output is read.
+		self.assertLess(proc.stdout.tell(), len(iw_scan))
+		self.assertEqual(first['bssid'], iw_scan[4:21].decode())
+		rest = list(networks)
+		self.assertEqual(len(rest) + 1, iw_scan.count(b'\nBSS ') + 1)
+		proc.terminate.assert_called_once_with()
+
+	@mock.patch('wicd.wnettools.os.path.exists', return_value=True)
+	@mock.patch('wicd.misc.Run')
+	def test_cached_networks(self, mock_syscall, mock_exists):
+		with open('tests/crazy.wifi', 'r') as content_file:
+			iw_scan = content_file.read()
+		mock_syscall.return_value = iw_scan
+		interface = wnettools.BaseWirelessInterface('wlan0')
+		networks = list(interface.IterNetworks(max_age=30))
+		mock_syscall.assert_called_once_with('iw wlan0 scan dump')
+		self.assertEqual(len(networks), len(set(ap['bssid'] for ap in networks)))
+		self.assertGreater(len(networks), 0)
+		# Only networks seen a minute ago, the cache is too old.
+		mock_syscall.return_value = re.sub(r'last seen: \d+ ms ago',
+			'last seen: 60000 ms ago', iw_scan)
+		self.assertEqual(interface.GetCachedNetworks(30), None)
+
 	@mock.patch('wicd.misc.Run')
 	def test_parse_frequencies(self, mock_syscall):
 		with open('tests/freq.wifi', 'r') as content_file:
@@ -0,0 +1,194 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from wicd import wpactrl
+from wicd import wnettools
+
+class FakeSupplicant(object):
+	""" Answers control interface requests on a unix socket. """
+	def __init__(self, path, state='SCANNING', events=()):
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+		self.sock.bind(path)
+		self.state = state
+		self.events = list(events)
+		self.requests = []
+		self.thread = threading.Thread(target=self.serve, daemon=True)
+		self.thread.start()
+
+	def serve(self):
+		while True:
+			try:
+				data, client = self.sock.recvfrom(4096)
+			except OSError:
+				return
+			command = data.decode()
+			self.requests.append(command)
+			reply = self.reply(command)
+			try:
+				self.sock.sendto(reply.encode(), client)
+			except OSError:
+				return
+			if command == 'ATTACH':
+				threading.Thread(target=self.send_events, args=(client,),
+					daemon=True).start()
+
+	def reply(self, command):
+		if command == 'STATUS':
+			return 'bssid=00:11:22:33:44:55\nwpa_state=%s\n' % self.state
+		elif command == 'PING':
+			return 'PONG\n'
+		return 'OK\n'
+
+	def send_events(self, client):
+		for delay, event in self.events:
+			time.sleep(delay)
+			try:
+				self.sock.sendto(('<3>' + event).encode(), client)
+			except OSError:
+				return
+
+	def close(self):
+		self.sock.close()
+
+class TestWpaCtrl(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.dir.cleanup)
+		self.addCleanup(wpactrl.forget)
+		self.path = os.path.join(self.dir.name, 'wlan0')
+
+	def supplicant(self, **kwargs):
+		supplicant = FakeSupplicant(self.path, **kwargs)
+		self.addCleanup(supplicant.close)
+		return supplicant
+
+	def test_status(self):
+		self.supplicant(state='COMPLETED')
+		ctrl = wpactrl.WpaCtrl(self.path)
+		self.addCleanup(ctrl.close)
+		self.assertEqual(ctrl.status()['wpa_state'], 'COMPLETED')
+
+	def test_events(self):
+		self.supplicant(events=[(0, 'CTRL-EVENT-SCAN-RESULTS '),
+			(0.05, 'CTRL-EVENT-CONNECTED - Connection to 00:11:22:33:44:55')])
+		ctrl = wpactrl.WpaCtrl(self.path)
+		self.addCleanup(ctrl.close)
+		self.assertTrue(ctrl.attach())
+		event = ctrl.wait_event(['CTRL-EVENT-CONNECTED'], 2)
+		self.assertTrue(event.startswith('CTRL-EVENT-CONNECTED'))
+		self.assertIsNone(ctrl.wait_event(['CTRL-EVENT-CONNECTED'], 0.05))
+
+	def test_shared_between_threads(self):
+		self.supplicant(state='COMPLETED',
+			events=[(0.05, 'CTRL-EVENT-CONNECTED - Connection to x')])
+		ctrl = wpactrl.WpaCtrl(self.path)
+		self.addCleanup(ctrl.close)
+		self.assertTrue(ctrl.attach())
+		replies = []
+		def requests():
+			for i in range(50):
+				replies.append(ctrl.request('PING' if i % 2 else 'STATUS'))
+		threads = [threading.Thread(target=requests) for i in range(3)]
+		for thread in threads:
+			thread.start()
+		event = ctrl.wait_event(['CTRL-EVENT-CONNECTED'], 2)
+		for thread in threads:
+			thread.join()
+		self.assertTrue(event.startswith('CTRL-EVENT-CONNECTED'))
+		self.assertEqual(replies.count('PONG\n'), 75)
+		self.assertEqual(len([reply for reply in replies
+			if 'wpa_state=COMPLETED' in reply]), 75)
+
+	def test_late_reply_dropped(self):
+		supplicant = self.supplicant()
+		ctrl = wpactrl.WpaCtrl(self.path)
+		self.addCleanup(ctrl.close)
+		supplicant.reply = lambda command: \
+			time.sleep(0.1) or FakeSupplicant.reply(supplicant, command)
+		with self.assertRaises(TimeoutError):
+			ctrl.request('PING', timeout=0.01)
+		time.sleep(0.15)
+		self.assertIn('wpa_state', ctrl.request('STATUS'))
+
+	def test_no_supplicant(self):
+		self.assertIsNone(wpactrl.get_ctrl('wlan0', self.dir.name))
+
+	def test_kept_open(self):
+		supplicant = self.supplicant()
+		ctrl = wpactrl.get_ctrl('wlan0', self.dir.name)
+		self.assertIs(wpactrl.get_ctrl('wlan0', self.dir.name), ctrl)
+		supplicant.close()
+		os.unlink(self.path)
+		self.assertIsNone(wpactrl.get_ctrl('wlan0', self.dir.name))
+
+class TestValidateAuthentication(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.dir.cleanup)
+		self.addCleanup(wpactrl.forget)
+		patcher = mock.patch('wicd.wpactrl.CTRL_DIR', self.dir.name)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.iface = wnettools.BaseWirelessInterface('wlan0')
+		self.iface.wpa_cli_cmd = '/sbin/wpa_cli'
+
+	def supplicant(self, **kwargs):
+		supplicant = FakeSupplicant(os.path.join(self.dir.name, 'wlan0'),
+			**kwargs)
+		self.addCleanup(supplicant.close)
+		return supplicant
+
+	def validate(self):
+		with mock.patch('wicd.wnettools.misc.Run') as run:
+			with mock.patch('builtins.print'):
+				result = self.iface.ValidateAuthentication(time.time())
+		run.assert_not_called()
+		return result
+
+	def test_completed(self):
+		self.supplicant(state='COMPLETED')
+		self.assertTrue(self.validate())
+
+	def test_connected_event(self):
+		supplicant = self.supplicant(events=[(0.1,
+			'CTRL-EVENT-CONNECTED - Connection to 00:11:22:33:44:55')])
+		start = time.time()
+		self.assertTrue(self.validate())
+		self.assertLess(time.time() - start, 1)
+		self.assertEqual(supplicant.requests[-1], 'DETACH')
+
+	def test_temp_disabled(self):
+		self.supplicant(events=[(0.05, 'CTRL-EVENT-DISCONNECTED bssid=' +
+				'00:11:22:33:44:55 reason=15'),
+			(0.05, 'CTRL-EVENT-SSID-TEMP-DISABLED id=0 ssid="home" ' +
+				'auth_failures=1 duration=10 reason=WRONG_KEY')])
+		self.assertFalse(self.validate())
+
+	def test_rescan_when_disconnected(self):
+		supplicant = self.supplicant(state='DISCONNECTED', events=[(0.3,
+			'CTRL-EVENT-CONNECTED - Connection to 00:11:22:33:44:55')])
+		with mock.patch('wicd.wnettools.MAX_DISCONNECTED_TIME', 0.1):
+			self.assertTrue(self.validate())
+		self.assertIn('SCAN', supplicant.requests)
+
+	def test_wpa_cli_fallback(self):
+		with mock.patch('wicd.wnettools.misc.Run',
+				return_value='wpa_state=COMPLETED\n') as run:
+			self.assertTrue(self.iface.ValidateAuthentication(time.time()))
+		self.assertEqual(run.call_count, 1)
+
+def suite():
+	suite = unittest.TestSuite()
+	for case in (TestWpaCtrl, TestValidateAuthentication):
+		tests = []
+		[ tests.append(test) for test in dir(case) if test.startswith('test') ]
+		for test in tests:
+			suite.addTest(case(test))
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()